@@ -1,19 +1,45 @@
 from __future__ import annotations
 
 import base64
-import datetime as dt
+import collections
+import functools
 import hashlib
 import hmac
-import json
+import ssl
+import threading
+import time
+import types
+from collections.abc import Mapping
 from dataclasses import dataclass
 from typing import Any
 
 from fastapi import Depends, HTTPException, Request
+import orjson
 
 from onekey_rag_service.config import Settings, get_settings
 from onekey_rag_service.models import DEFAULT_WORKSPACE_ID
 
 
+# 以字符串名传给 hmac.digest，走 OpenSSL EVP 实现（CPU 支持时自动使用 SHA-NI 指令）
+_HMAC_DIGEST = "sha256"
+
+# 各签名算法对应 header 的 base64url 编码（常量，无需每次签发时序列化）：
+# - HS256：{"alg":"HS256","typ":"JWT"}（默认，标准 JWT）
+# - BLAKE2b：{"alg":"BLAKE2b","typ":"JWT"}（仅供本服务内部使用的 keyed BLAKE2b MAC，更快但非标准）
+_HEADERS_B64 = {
+    "HS256": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9",
+    "BLAKE2b": "eyJhbGciOiJCTEFLRTJiIiwidHlwIjoiSldUIn0",
+}
+_B64URL_TRANS = bytes.maketrans(b"+/", b"-_")
+
+# 已验签 token 的短期缓存：同一会话内 token 会被反复使用，命中后只需复核 iss/exp
+# payload 以只读视图缓存并返回：多个请求共享同一对象，调用方不能改写缓存里的 claims
+_VERIFIED_CACHE_MAX_SIZE = 4096
+_VERIFIED_CACHE_TTL_S = 30.0
+_verified_cache: collections.OrderedDict[bytes, tuple[float, tuple[str, str], Mapping[str, Any]]] = collections.OrderedDict()
+_verified_lock = threading.Lock()
+
+
 @dataclass(frozen=True)
 class AdminPrincipal:
     username: str
@@ -22,65 +48,167 @@ class AdminPrincipal:
 
 
 def _b64url_encode(raw: bytes) -> str:
-    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+    # 一次 translate 同时完成 +/ -> -_ 替换与去掉 "=" 填充
+    return base64.b64encode(raw).translate(_B64URL_TRANS, b"=").decode("ascii")
+
+
+def _b64url_decode(b: bytes) -> bytes:
+    b += b"=" * (-len(b) % 4)
+    # validate=True 只拒绝字母表外的字符；它仍接受 +/ 与非零尾部填充位，解码结果不唯一，
+    # 因此不能用“解码后比较”来判定 token 写法唯一（签名校验比较的是规范编码串，见 verify_jwt）
+    return base64.b64decode(b, altchars=b"-_", validate=True)
+
+
+@functools.lru_cache(maxsize=8)
+def _secret_bytes(secret: str) -> bytes:
+    return secret.encode("utf-8")
+
+
+@functools.lru_cache(maxsize=8)
+def _hmac_template(key: bytes) -> hmac.HMAC:
+    # 密钥固定时 ipad/opad 处理后的内外层 SHA-256 状态不变，预先计算一次，之后只做 copy()
+    return hmac.new(key, digestmod=_HMAC_DIGEST)
+
+
+def _hmac_sha256_bytes(key: bytes, msg: bytes) -> bytes:
+    h = _hmac_template(key).copy()
+    h.update(msg)
+    return h.digest()
+
+
+@functools.lru_cache(maxsize=8)
+def _blake2b_key(key: bytes) -> bytes:
+    # blake2b 的 key 最长 64 字节，超长密钥先压缩（与 HMAC 对超长 key 的处理方式一致）
+    if len(key) <= hashlib.blake2b.MAX_KEY_SIZE:
+        return key
+    return hashlib.blake2b(key).digest()
+
+
+def _mac(alg: str, key: bytes, msg: bytes) -> bytes:
+    if alg == "BLAKE2b":
+        return hashlib.blake2b(msg, key=_blake2b_key(key), digest_size=32).digest()
+    return _hmac_sha256_bytes(key, msg)
 
 
-def _b64url_decode(s: str) -> bytes:
-    padded = s + "=" * ((4 - (len(s) % 4)) % 4)
-    return base64.urlsafe_b64decode(padded.encode("ascii"))
+def describe_hmac_backend() -> str:
+    """返回 HMAC-SHA256 所用实现的描述（OpenSSL 版本 / CPU 是否支持 SHA-NI），用于启动日志排查性能。"""
+    try:
+        backend = type(hashlib.new(_HMAC_DIGEST)).__module__ or "unknown"
+    except Exception:
+        backend = "unknown"
 
+    sha_ni = "unknown"
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    sha_ni = "yes" if "sha_ni" in line.split() else "no"
+                    break
+    except Exception:
+        pass
 
-def _hmac_sha256(key: str, msg: str) -> bytes:
-    return hmac.new(key.encode("utf-8"), msg.encode("utf-8"), hashlib.sha256).digest()
+    return f"{ssl.OPENSSL_VERSION} backend={backend} sha_ni={sha_ni}"
 
 
 def _utcnow_ts() -> int:
-    return int(dt.datetime.utcnow().timestamp())
+    return int(time.time())
 
 
-def create_jwt(payload: dict[str, Any], *, secret: str) -> str:
-    header = {"alg": "HS256", "typ": "JWT"}
-    header_b64 = _b64url_encode(json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
-    payload_b64 = _b64url_encode(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+def create_jwt(payload: dict[str, Any], *, secret: str, alg: str = "HS256") -> str:
+    header_b64 = _HEADERS_B64[alg]
+    payload_b64 = _b64url_encode(orjson.dumps(payload))
     signing_input = f"{header_b64}.{payload_b64}"
-    sig_b64 = _b64url_encode(_hmac_sha256(secret, signing_input))
+    sig_b64 = _b64url_encode(_mac(alg, _secret_bytes(secret), signing_input.encode("ascii")))
     return f"{signing_input}.{sig_b64}"
 
 
-def verify_jwt(token: str, *, secret: str, issuer: str) -> dict[str, Any]:
+def _check_claims(payload: Mapping[str, Any], *, issuer: str) -> int:
+    # 与 PyJWT 的 options={"require": ["exp", "iss"]} 语义一致：缺少 exp/iss 的 token 一律拒绝
+    iss = str(payload.get("iss") or "")
+    if not iss or (issuer and iss != issuer):
+        raise HTTPException(status_code=401, detail="无效 token")
+
     try:
-        header_b64, payload_b64, sig_b64 = token.split(".", 2)
-    except ValueError as e:
+        exp = int(payload.get("exp") or 0)
+    except (TypeError, ValueError) as e:
         raise HTTPException(status_code=401, detail="无效 token") from e
-
-    signing_input = f"{header_b64}.{payload_b64}"
-    expected = _b64url_encode(_hmac_sha256(secret, signing_input))
-    if not hmac.compare_digest(expected, sig_b64):
+    if not exp:
+        raise HTTPException(status_code=401, detail="无效 token")
+    if _utcnow_ts() >= exp:
+        raise HTTPException(status_code=401, detail="token 已过期")
+    return exp
+
+
+def verify_jwt(token: str, *, secret: str, issuer: str, alg: str = "HS256") -> Mapping[str, Any]:
+    mac_key = (alg, secret)
+    raw = token.encode("utf-8")
+    # 缓存键只用于查找（命中后仍比对 secret 并复核 claims），128-bit blake2b 足够且比 SHA-256 更快
+    key = hashlib.blake2b(raw, digest_size=16).digest()
+    now = time.monotonic()
+    with _verified_lock:
+        item = _verified_cache.get(key)
+        if item:
+            expires_at, cached_mac_key, cached_payload = item
+            if now < expires_at and cached_mac_key == mac_key:
+                _verified_cache.move_to_end(key)
+            else:
+                _verified_cache.pop(key, None)
+                item = None
+    if item:
+        _check_claims(cached_payload, issuer=issuer)
+        return cached_payload
+
+    # 直接在已编码的 bytes 上按 "." 位置切片，避免 split 后再拼回/重复 encode signing_input
+    first_dot = raw.find(b".")
+    dot = raw.rfind(b".")
+    if first_dot < 0 or first_dot == dot:
+        raise HTTPException(status_code=401, detail="无效 token")
+    # 只接受当前配置算法签发的 header，避免算法混用
+    if raw[:first_dot] != _HEADERS_B64[alg].encode("ascii"):
+        raise HTTPException(status_code=401, detail="无效 token")
+    signing_input = raw[:dot]
+    payload_b64 = raw[first_dot + 1 : dot]
+    sig_b64 = raw[dot + 1 :]
+
+    # 比较规范的 base64url 签名串而不是解码后的 MAC：解码会接受 +/ 与非零尾部填充位，
+    # 同一签名存在多种可通过校验的写法（且各自占一个验签缓存项）
+    expected = _mac(alg, _secret_bytes(secret), signing_input)
+    if not hmac.compare_digest(_b64url_encode(expected).encode("ascii"), sig_b64):
         raise HTTPException(status_code=401, detail="无效 token")
 
     try:
-        payload = json.loads(_b64url_decode(payload_b64))
+        payload = orjson.loads(_b64url_decode(payload_b64))
     except Exception as e:
         raise HTTPException(status_code=401, detail="无效 token") from e
 
     if not isinstance(payload, dict):
         raise HTTPException(status_code=401, detail="无效 token")
 
-    iss = str(payload.get("iss") or "")
-    if issuer and iss != issuer:
-        raise HTTPException(status_code=401, detail="无效 token")
+    exp = _check_claims(payload, issuer=issuer)
+    # 刚解码的 dict 没有其它引用，包成只读视图即可；缓存命中与未命中返回同一种不可变对象
+    payload = types.MappingProxyType(payload)
 
-    exp = int(payload.get("exp") or 0)
-    if exp and _utcnow_ts() >= exp:
-        raise HTTPException(status_code=401, detail="token 已过期")
+    # 只缓存验证成功的 token；缓存有效期不超过 token 自身的剩余有效期
+    ttl_s = min(_VERIFIED_CACHE_TTL_S, float(exp - _utcnow_ts()))
+    if ttl_s > 0:
+        with _verified_lock:
+            _verified_cache[key] = (now + ttl_s, mac_key, payload)
+            _verified_cache.move_to_end(key)
+            while len(_verified_cache) > _VERIFIED_CACHE_MAX_SIZE:
+                _verified_cache.popitem(last=False)
 
     return payload
 
 
+@functools.lru_cache(maxsize=8)
+def _admin_credentials_bytes(username: str, password: str) -> bytes:
+    # username\x00password：配置来自环境变量，不可能包含 \x00，因此拼接后的比较无歧义
+    return (username or "").strip().encode("utf-8") + b"\x00" + (password or "").encode("utf-8")
+
+
 def authenticate_admin(*, username: str, password: str, settings: Settings) -> AdminPrincipal:
-    u_ok = hmac.compare_digest((username or "").strip(), (settings.admin_username or "").strip())
-    p_ok = hmac.compare_digest(password or "", settings.admin_password or "")
-    if not (u_ok and p_ok):
+    combined = (username or "").strip().encode("utf-8") + b"\x00" + (password or "").encode("utf-8")
+    if not hmac.compare_digest(combined, _admin_credentials_bytes(settings.admin_username, settings.admin_password)):
         raise HTTPException(status_code=401, detail="用户名或密码错误", headers={"WWW-Authenticate": "Bearer"})
     return AdminPrincipal(username=settings.admin_username, role="owner", workspace_id=DEFAULT_WORKSPACE_ID)
 
@@ -96,15 +224,21 @@ def issue_admin_access_token(principal: AdminPrincipal, *, settings: Settings) -
         "iat": now,
         "exp": exp,
     }
-    return create_jwt(payload, secret=settings.admin_jwt_secret), exp - now
+    return create_jwt(payload, secret=settings.admin_jwt_secret, alg=settings.admin_jwt_alg), exp - now
 
 
 def require_admin(request: Request, settings: Settings = Depends(get_settings)) -> AdminPrincipal:
-    auth = request.headers.get("Authorization") or ""
-    if not auth.lower().startswith("bearer "):
+    auth = request.headers.get("Authorization")
+    # 只比较前 7 个字符的 scheme，避免对整个 header（含 token）做 lower/split
+    if not auth or len(auth) < 8 or auth[0] not in "Bb" or auth[:7].lower() != "bearer ":
         raise HTTPException(status_code=401, detail="缺少 Authorization: Bearer token", headers={"WWW-Authenticate": "Bearer"})
-    token = auth.split(" ", 1)[1].strip()
-    payload = verify_jwt(token, secret=settings.admin_jwt_secret, issuer="onekey-rag-admin")
+    token = auth[7:].strip()
+    payload = verify_jwt(
+        token,
+        secret=settings.admin_jwt_secret,
+        issuer="onekey-rag-admin",
+        alg=settings.admin_jwt_alg,
+    )
 
     sub = str(payload.get("sub") or "")
     role = str(payload.get("role") or "")
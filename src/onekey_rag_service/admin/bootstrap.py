@@ -1,11 +1,10 @@
 from __future__ import annotations
 
 import datetime as dt
+from typing import TYPE_CHECKING, Any
 
 from sqlalchemy import select
-from sqlalchemy.orm import Session
 
-from onekey_rag_service.config import Settings
 from onekey_rag_service.models import (
     DEFAULT_KB_ID,
     DEFAULT_WORKSPACE_ID,
@@ -16,6 +15,15 @@ from onekey_rag_service.models import (
     Workspace,
 )
 
+if TYPE_CHECKING:
+    from sqlalchemy import Table
+    from sqlalchemy.orm import Session
+
+    from onekey_rag_service.config import Settings
+
+_DEFAULT_SOURCE_ID = "source_default"
+_DEFAULT_APP_ID = "app_default"
+
 
 def ensure_default_entities(session: Session, *, settings: Settings) -> None:
     """
@@ -24,91 +32,102 @@ def ensure_default_entities(session: Session, *, settings: Settings) -> None:
     - 兼容旧接口（未传 workspace/kb/app）
     """
 
-    now = dt.datetime.utcnow()
+    # 稳态下默认绑定已存在（其依赖的 workspace/kb/app 也必然存在），直接返回
+    bound = session.execute(
+        select(RagAppKnowledgeBase.id)
+        .where(RagAppKnowledgeBase.app_id == _DEFAULT_APP_ID, RagAppKnowledgeBase.kb_id == DEFAULT_KB_ID)
+        .limit(1)
+    ).first()
+    if bound:
+        session.rollback()
+        return
 
-    # 不依赖 ORM relationship 的插入顺序：显式 flush，避免外键约束下出现“子表先插入”的问题
-    with session.no_autoflush:
-        ws = session.get(Workspace, DEFAULT_WORKSPACE_ID)
-        if not ws:
-            ws = Workspace(id=DEFAULT_WORKSPACE_ID, name="默认工作区", created_at=now)
-            session.add(ws)
-            session.flush()
+    # 仅首次初始化才需要 Postgres 方言的 insert，稳态启动不加载
+    from sqlalchemy.dialects.postgresql import insert
 
-        kb = session.get(KnowledgeBase, DEFAULT_KB_ID)
-        if not kb:
-            kb = KnowledgeBase(
-                id=DEFAULT_KB_ID,
-                workspace_id=DEFAULT_WORKSPACE_ID,
-                name="默认知识库",
-                description="系统自动创建的默认知识库",
-                status="active",
-                config={},
-                created_at=now,
-                updated_at=now,
-            )
-            session.add(kb)
-            session.flush()
-
-        # 默认数据源（crawler）
-        default_source_id = "source_default"
-        ds = session.get(DataSource, default_source_id)
-        if not ds:
-            ds = DataSource(
-                id=default_source_id,
-                workspace_id=DEFAULT_WORKSPACE_ID,
-                kb_id=DEFAULT_KB_ID,
-                type="crawler_site",
-                name="默认爬虫源",
-                config={
-                    "base_url": str(settings.crawl_base_url),
-                    "sitemap_url": str(settings.crawl_sitemap_url),
-                    "seed_urls": [str(settings.crawl_base_url)],
-                    "include_patterns": [],
-                    "exclude_patterns": [],
-                    "max_pages": int(settings.crawl_max_pages),
-                },
-                status="active",
-                created_at=now,
-                updated_at=now,
-            )
-            session.add(ds)
-            session.flush()
+    # 数据是静态的：直接用 Core Table 插入（绕过 identity map / unit-of-work），
+    # 按外键依赖顺序逐表执行；ON CONFLICT DO NOTHING 保证幂等，已存在的记录不会被覆盖
+    conn = session.connection()
+    for table, rows in _default_rows(settings, now=dt.datetime.utcnow()):
+        conn.execute(insert(table).on_conflict_do_nothing(), rows)
 
-        # 默认 App：对外 model_id 与现有服务保持一致
-        default_app_id = "app_default"
-        app = session.get(RagApp, default_app_id)
-        if not app:
-            app = RagApp(
-                id=default_app_id,
-                workspace_id=DEFAULT_WORKSPACE_ID,
-                name="默认 RagApp",
-                public_model_id="onekey-docs",
-                status="published",
-                config={},
-                created_at=now,
-                updated_at=now,
-            )
-            session.add(app)
-            session.flush()
+    session.commit()
 
-        # 默认绑定：App -> 默认 KB（weight=1, priority=0）
-        exists = session.execute(
-            select(RagAppKnowledgeBase).where(
-                RagAppKnowledgeBase.app_id == default_app_id,
-                RagAppKnowledgeBase.kb_id == DEFAULT_KB_ID,
-            )
-        ).scalar_one_or_none()
-        if not exists:
-            session.add(
-                RagAppKnowledgeBase(
-                    workspace_id=DEFAULT_WORKSPACE_ID,
-                    app_id=default_app_id,
-                    kb_id=DEFAULT_KB_ID,
-                    priority=0,
-                    weight=1.0,
-                    enabled=True,
-                    created_at=now,
-                )
-            )
 
-    session.commit()
+def _default_rows(settings: Settings, *, now: dt.datetime) -> list[tuple[Table, list[dict[str, Any]]]]:
+    return [
+        (
+            Workspace.__table__,
+            [{"id": DEFAULT_WORKSPACE_ID, "name": "默认工作区", "created_at": now}],
+        ),
+        (
+            KnowledgeBase.__table__,
+            [
+                {
+                    "id": DEFAULT_KB_ID,
+                    "workspace_id": DEFAULT_WORKSPACE_ID,
+                    "name": "默认知识库",
+                    "description": "系统自动创建的默认知识库",
+                    "status": "active",
+                    "config": {},
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            ],
+        ),
+        # 默认数据源（crawler）
+        (
+            DataSource.__table__,
+            [
+                {
+                    "id": _DEFAULT_SOURCE_ID,
+                    "workspace_id": DEFAULT_WORKSPACE_ID,
+                    "kb_id": DEFAULT_KB_ID,
+                    "type": "crawler_site",
+                    "name": "默认爬虫源",
+                    "config": {
+                        "base_url": str(settings.crawl_base_url),
+                        "sitemap_url": str(settings.crawl_sitemap_url),
+                        "seed_urls": [str(settings.crawl_base_url)],
+                        "include_patterns": [],
+                        "exclude_patterns": [],
+                        "max_pages": int(settings.crawl_max_pages),
+                    },
+                    "status": "active",
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            ],
+        ),
+        # 默认 App：对外 model_id 与现有服务保持一致
+        (
+            RagApp.__table__,
+            [
+                {
+                    "id": _DEFAULT_APP_ID,
+                    "workspace_id": DEFAULT_WORKSPACE_ID,
+                    "name": "默认 RagApp",
+                    "public_model_id": "onekey-docs",
+                    "status": "published",
+                    "config": {},
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            ],
+        ),
+        # 默认绑定：App -> 默认 KB（weight=1, priority=0），依赖 uq_app_kbs_app_kb 去重
+        (
+            RagAppKnowledgeBase.__table__,
+            [
+                {
+                    "workspace_id": DEFAULT_WORKSPACE_ID,
+                    "app_id": _DEFAULT_APP_ID,
+                    "kb_id": DEFAULT_KB_ID,
+                    "priority": 0,
+                    "weight": 1.0,
+                    "enabled": True,
+                    "created_at": now,
+                }
+            ],
+        ),
+    ]
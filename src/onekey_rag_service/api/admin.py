@@ -1,24 +1,36 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import base64
+import collections
 import datetime as dt
+import functools
 import os
 import platform
+import re
 import shutil
 import tempfile
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
-from pydantic import BaseModel, Field
-from sqlalchemy import case, delete, desc, func, select, text
+from fastapi.responses import ORJSONResponse
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from sqlalchemy import String, Text, bindparam, cast, delete, desc, func, select, text, true, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer, load_only, raiseload
 
 from onekey_rag_service.admin.auth import AdminPrincipal, authenticate_admin, issue_admin_access_token, require_admin
 from onekey_rag_service.api.deps import get_db
 from onekey_rag_service.config import Settings, get_settings
+from onekey_rag_service.db import ROLLUP_LATENCY_LOG_BASE
 from onekey_rag_service.observability.langfuse import build_langfuse_callback
 from onekey_rag_service.models import (
     AuditLog,
@@ -36,7 +48,7 @@ from onekey_rag_service.models import (
     Workspace,
 )
 
-router = APIRouter(prefix="/admin/api", tags=["admin"])
+router = APIRouter(prefix="/admin/api", tags=["admin"], default_response_class=ORJSONResponse)
 
 _PROC_START_MONO = time.monotonic()
 _last_proc_cpu_sample: dict[str, float] | None = None
@@ -44,13 +56,37 @@ _last_sys_cpu_sample: dict[str, float] | None = None
 _last_cgroup_cpu_sample: dict[str, float] | None = None
 _last_storage_sample: dict[str, Any] | None = None
 _last_storage_sample_ts: float | None = None
+_storage_refresh_lock = threading.Lock()
+# cgroup 版本在进程生命周期内不变：启动时探测一次，之后只读对应版本的文件
+_CGROUP_V2 = os.path.exists("/sys/fs/cgroup/cgroup.controllers")
+_CPU_SAMPLE_INTERVAL_S = 1.0
+_last_cpu_percents: dict[str, Any] = {}
+_cpu_sampler_task: asyncio.Task | None = None
+_UTC = dt.timezone.utc
+_UTCNOW = dt.datetime.now
+_CPUSET_RE = re.compile(r"(\d+)(?:-(\d+))?")
 _UPLOAD_ROOT = Path(tempfile.gettempdir()) / "onekey_rag_uploads"
 _UPLOAD_ROOT.mkdir(parents=True, exist_ok=True)
 _last_metrics_ts: list[dict[str, Any]] = []
+try:
+    _PAGE_SIZE = int(os.sysconf("SC_PAGE_SIZE"))
+except Exception:
+    _PAGE_SIZE = 0
+
+# Dashboard 轮询较频繁：/proc、cgroup 等采样结果做秒级缓存（CPU delta 采样不走缓存）
+_SAMPLER_TTL_S = 1.0
+_sampler_cache: dict[str, tuple[float, Any]] = {}
+_sampler_lock = threading.Lock()
+
+# 常驻打开的 procfs/cgroupfs fd：path -> fd（仅对打开它的 pid 有效）
+_proc_fds: dict[str, int] = {}
+_proc_fds_pid: int | None = None
+_proc_fds_lock = threading.Lock()
 
 
 def _utcnow() -> dt.datetime:
-    return dt.datetime.utcnow()
+    # tz-aware UTC：写入 timestamptz 不依赖会话时区，isoformat 也会带上 +00:00
+    return _UTCNOW(_UTC)
 
 
 def _require_workspace_access(principal: AdminPrincipal, workspace_id: str) -> None:
@@ -69,6 +105,114 @@ def _parse_pagination(page: int, page_size: int) -> tuple[int, int, int]:
     return p, ps, offset
 
 
+def _fetch_page_with_total(
+    db: Session,
+    stmt,
+    *,
+    offset: int,
+    limit: int,
+    approx_total: int | None = None,
+    options: tuple[Any, ...] = (),
+) -> tuple[list[Any], int, bool]:
+    """
+    分页 + 总数一次查询：在列表 SELECT 上附加 COUNT(*) OVER ()，
+    让 Postgres 在同一趟过滤中同时算出总数；仅当 offset 越界（当页无数据）时才补一次 count。
+    stmt 需已带 order_by，且只 select 一个实体。
+
+    传入 approx_total（见 _approx_workspace_count）时跳过精确计数，直接用估算值；
+    但第 1 页未取满时总数就是当页行数（精确），不用估算（大表里的小 workspace 估算至少为 1 行）。
+    options（load_only/raiseload 等）只作用于取行查询，不带进 count。
+
+    返回 (items, total, estimated)。
+    """
+
+    page_stmt = stmt.options(*options) if options else stmt
+    if approx_total is not None:
+        items = list(db.scalars(page_stmt.offset(offset).limit(limit)).all())
+        if offset <= 0 and len(items) < limit:
+            return items, len(items), False
+        return items, max(int(approx_total), offset + len(items)), True
+
+    rows = db.execute(page_stmt.add_columns(func.count().over().label("_total")).offset(offset).limit(limit)).all()
+    if rows:
+        return [r[0] for r in rows], int(rows[0][1] or 0), False
+    if offset <= 0:
+        return [], 0, False
+    return [], _count_stmt(db, stmt), False
+
+
+def _count_stmt(db: Session, stmt) -> int:
+    """
+    统计仅含 WHERE 的单实体查询的行数：直接把 SELECT 列表换成 COUNT(*)，
+    不再包一层派生表；带 GROUP BY/HAVING/DISTINCT 的查询不要用它。
+    """
+
+    return int(db.scalar(stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)) or 0)
+
+
+def _encode_cursor(created_at: dt.datetime | None, row_id: int) -> str | None:
+    """
+    keyset 分页游标：(created_at, id) 编码为 urlsafe base64；created_at 为空的行无法续页，返回 None。
+    """
+
+    if created_at is None:
+        return None
+    raw = f"{created_at.isoformat()}|{int(row_id)}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[dt.datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, _, row_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").partition("|")
+        return dt.datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="cursor 无效")
+
+
+def _json_fragment(raw: str | None, *, default: bytes = b"null") -> orjson.Fragment:
+    """
+    把 JSON 列的原始文本（SELECT col::text）直接嵌入 ORJSONResponse，省去 loads -> dict -> dumps 的往返。
+    注意：含 Fragment 的响应必须直接返回 ORJSONResponse（jsonable_encoder 不认识 Fragment）。
+    """
+
+    if raw is None or raw == "null":
+        return orjson.Fragment(default)
+    return orjson.Fragment(raw)
+
+
+# 表规模超过该行数且只有 workspace 过滤时，总数改用 planner 估算（精确 COUNT 需全量扫描）
+_APPROX_COUNT_MIN_RELTUPLES = 500_000
+_APPROX_COUNT_TABLES = frozenset({"jobs", "pages"})
+
+
+def _approx_workspace_count(db: Session, table: str, workspace_id: str) -> int | None:
+    """
+    大表上 "WHERE workspace_id = :ws" 的行数估算；表规模未达阈值或估算失败时返回 None（调用方走精确计数）。
+    """
+
+    if table not in _APPROX_COUNT_TABLES:
+        return None
+    reltuples = _ttl_cached(
+        f"reltuples:{table}",
+        lambda: db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+        ).scalar(),
+        ttl_s=300.0,
+    )
+    if reltuples is None or int(reltuples) < _APPROX_COUNT_MIN_RELTUPLES:
+        return None
+    try:
+        plan = db.execute(
+            text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE workspace_id = :ws"), {"ws": workspace_id}
+        ).scalar()
+        if isinstance(plan, (str, bytes)):
+            plan = orjson.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        return None
+
+
 def _add_audit_log(
     db: Session,
     principal: AdminPrincipal,
@@ -120,6 +264,8 @@ class SummaryResponse(BaseModel):
     jobs: dict[str, Any]
     feedback: dict[str, Any]
     indexes: dict[str, Any]
+    # 读取物化视图时为快照刷新时间；实时聚合时为 None
+    stats_as_of: str | None = None
 
 
 class HealthResponse(BaseModel):
@@ -127,6 +273,87 @@ class HealthResponse(BaseModel):
     dependencies: dict[str, Any]
 
 
+def _open_proc_fd(path: str) -> int:
+    """
+    复用 procfs/cgroupfs 文件的 fd（pread 从偏移 0 读取时内核会重新生成内容），避免每次轮询都 open/close。
+    fork 之后 /proc/self 指向的仍是父进程，因此按 pid 失效重开。
+    """
+
+    global _proc_fds_pid
+
+    pid = os.getpid()
+    with _proc_fds_lock:
+        if _proc_fds_pid != pid:
+            for fd in _proc_fds.values():
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            _proc_fds.clear()
+            _proc_fds_pid = pid
+        fd = _proc_fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+            _proc_fds[path] = fd
+        return fd
+
+
+def _drop_proc_fd(path: str) -> None:
+    with _proc_fds_lock:
+        fd = _proc_fds.pop(path, None)
+    if fd is not None:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+
+def _close_proc_fds() -> None:
+    with _proc_fds_lock:
+        for fd in _proc_fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        _proc_fds.clear()
+
+
+atexit.register(_close_proc_fds)
+
+
+def _pread_all(fd: int, bufsize: int) -> bytes:
+    data = os.pread(fd, bufsize, 0)
+    # 极少数情况下（例如 CPU 很多的机器上的 /proc/stat）超过 bufsize，继续读完
+    if len(data) >= bufsize:
+        chunks = [data]
+        offset = len(data)
+        while True:
+            more = os.pread(fd, bufsize, offset)
+            if not more:
+                break
+            chunks.append(more)
+            offset += len(more)
+        data = b"".join(chunks)
+    return data
+
+
+def _read_proc_file(path: str, *, bufsize: int = 65536) -> str:
+    """
+    一次 pread() 读完整个 procfs/cgroupfs 小文件（fd 跨轮询复用）。
+    procfs 内容在每次 read 时由内核重新生成，逐行多次读取可能读到不一致的数据；
+    同时省去 Python 文本文件对象与逐行迭代的开销。
+    """
+
+    fd = _open_proc_fd(path)
+    try:
+        data = _pread_all(fd, bufsize)
+    except OSError:
+        # fd 失效（例如 cgroup 被重建）：重开一次再读
+        _drop_proc_fd(path)
+        data = _pread_all(_open_proc_fd(path), bufsize)
+    return data.decode("utf-8", errors="replace")
+
+
 def _read_meminfo_bytes() -> dict[str, int]:
     """
     读取 /proc/meminfo（Linux）并转换为 bytes。
@@ -135,27 +362,26 @@ def _read_meminfo_bytes() -> dict[str, int]:
 
     try:
         out: dict[str, int] = {}
-        with open("/proc/meminfo", "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or ":" not in line:
-                    continue
-                k, rest = line.split(":", 1)
-                parts = rest.strip().split()
-                if not parts:
-                    continue
-                try:
-                    v = int(parts[0])
-                except Exception:
-                    continue
-                unit = parts[1] if len(parts) > 1 else ""
-                if unit.lower() == "kb":
-                    out[k] = v * 1024
-                elif unit.lower() == "b":
-                    out[k] = v
-                else:
-                    # meminfo 大多是 kB；未知单位先按 bytes 处理，避免误导
-                    out[k] = v
+        for line in _read_proc_file("/proc/meminfo").splitlines():
+            line = line.strip()
+            if not line or ":" not in line:
+                continue
+            k, rest = line.split(":", 1)
+            parts = rest.strip().split()
+            if not parts:
+                continue
+            try:
+                v = int(parts[0])
+            except Exception:
+                continue
+            unit = parts[1] if len(parts) > 1 else ""
+            if unit.lower() == "kb":
+                out[k] = v * 1024
+            elif unit.lower() == "b":
+                out[k] = v
+            else:
+                # meminfo 大多是 kB；未知单位先按 bytes 处理，避免误导
+                out[k] = v
         return out
     except Exception:
         return {}
@@ -163,19 +389,26 @@ def _read_meminfo_bytes() -> dict[str, int]:
 
 def _read_proc_rss_bytes() -> int | None:
     """
-    读取当前进程 RSS（Linux /proc/self/status）。
+    读取当前进程 RSS（Linux）。
+    优先读 /proc/self/statm（单行整数，第 2 列为常驻页数），失败再回退到 /proc/self/status 的 VmRSS。
     """
 
+    if _PAGE_SIZE:
+        try:
+            parts = _read_proc_file("/proc/self/statm").split()
+            return int(parts[1]) * _PAGE_SIZE
+        except Exception:
+            pass
+
     try:
-        with open("/proc/self/status", "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.startswith("VmRSS:"):
-                    continue
-                parts = line.split()
-                if len(parts) < 2:
-                    return None
-                kb = int(parts[1])
-                return kb * 1024
+        for line in _read_proc_file("/proc/self/status").splitlines():
+            if not line.startswith("VmRSS:"):
+                continue
+            parts = line.split()
+            if len(parts) < 2:
+                return None
+            kb = int(parts[1])
+            return kb * 1024
         return None
     except Exception:
         return None
@@ -204,12 +437,15 @@ def _read_sys_cpu_jiffies() -> tuple[int, int] | None:
     """
 
     try:
-        with open("/proc/stat", "r", encoding="utf-8") as f:
-            line = f.readline().strip()
+        line = _read_proc_file("/proc/stat").split("\n", 1)[0].strip()
         if not line.startswith("cpu "):
             return None
         parts = line.split()
-        vals = [int(x) for x in parts[1:] if x.isdigit() or (x and x[0].isdigit())]
+        try:
+            vals = list(map(int, parts[1:]))
+        except ValueError:
+            # 极少数内核会带非数字字段：退回逐项过滤
+            vals = [int(x) for x in parts[1:] if x.isdigit()]
         if len(vals) < 4:
             return None
         idle = vals[3] + (vals[4] if len(vals) > 4 else 0)
@@ -219,12 +455,19 @@ def _read_sys_cpu_jiffies() -> tuple[int, int] | None:
         return None
 
 
-def _read_cgroup_limits() -> dict[str, Any]:
+@functools.lru_cache(maxsize=1)
+def _read_cgroup_static_limits() -> dict[str, Any]:
     """
-    读取 cgroup v2/v1 的 CPU/内存限制信息（容器环境）。
-    不保证所有字段都有；尽量做到“有就展示、没有就跳过”。
+    读取 cgroup v2/v1 的 CPU/内存“限额”（容器生命周期内不变），进程内只读一次。
+    memory.source 记录限额来自 v2 还是 v1，便于后续只读对应的 current 文件。
     """
 
+    if _CGROUP_V2:
+        return _read_cgroup_v2_static_limits()
+    return _read_cgroup_v1_static_limits()
+
+
+def _read_cgroup_v2_static_limits() -> dict[str, Any]:
     out: dict[str, Any] = {}
 
     # cgroup v2：/sys/fs/cgroup/cpu.max, memory.max
@@ -247,38 +490,65 @@ def _read_cgroup_limits() -> dict[str, Any]:
         mem_max = ""
         with open("/sys/fs/cgroup/memory.max", "r", encoding="utf-8") as f:
             mem_max = f.read().strip()
-        mem_cur = ""
-        with open("/sys/fs/cgroup/memory.current", "r", encoding="utf-8") as f:
-            mem_cur = f.read().strip()
-
         limit = None if mem_max == "max" else int(mem_max)
-        current = int(mem_cur) if mem_cur.isdigit() else None
-        out["memory"] = {"limit_bytes": limit, "current_bytes": current}
+        out["memory"] = {"limit_bytes": limit, "source": "v2"}
     except Exception:
         pass
 
+    return out
+
+
+def _read_cgroup_v1_static_limits() -> dict[str, Any]:
+    out: dict[str, Any] = {}
+
     # cgroup v1：memory.limit_in_bytes, cpu.cfs_quota_us
-    if not out.get("memory"):
-        try:
-            with open("/sys/fs/cgroup/memory/memory.limit_in_bytes", "r", encoding="utf-8") as f:
-                limit = int(f.read().strip())
-            with open("/sys/fs/cgroup/memory/memory.usage_in_bytes", "r", encoding="utf-8") as f:
-                current = int(f.read().strip())
-            out["memory"] = {"limit_bytes": limit, "current_bytes": current}
-        except Exception:
-            pass
+    try:
+        with open("/sys/fs/cgroup/memory/memory.limit_in_bytes", "r", encoding="utf-8") as f:
+            limit = int(f.read().strip())
+        out["memory"] = {"limit_bytes": limit, "source": "v1"}
+    except Exception:
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r", encoding="utf-8") as f:
+            quota_us = int(f.read().strip())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r", encoding="utf-8") as f:
+            period_us = int(f.read().strip())
+        out["cpu"] = {"quota_us": quota_us, "period_us": period_us, "limit_cores": None}
+        if quota_us > 0 and period_us > 0:
+            out["cpu"]["limit_cores"] = round(quota_us / period_us, 4)
+    except Exception:
+        pass
+
+    return out
+
 
-    if not out.get("cpu"):
+def _read_cgroup_limits() -> dict[str, Any]:
+    """
+    读取 cgroup v2/v1 的 CPU/内存限制信息（容器环境）。
+    不保证所有字段都有；尽量做到“有就展示、没有就跳过”。
+    限额部分来自进程内缓存，每次只读取会变化的 memory current。
+    """
+
+    static = _read_cgroup_static_limits()
+    out: dict[str, Any] = {}
+    if static.get("cpu"):
+        out["cpu"] = dict(static["cpu"])
+
+    mem_static = static.get("memory")
+    if mem_static:
+        path = (
+            "/sys/fs/cgroup/memory.current"
+            if mem_static.get("source") == "v2"
+            else "/sys/fs/cgroup/memory/memory.usage_in_bytes"
+        )
+        current = None
         try:
-            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r", encoding="utf-8") as f:
-                quota_us = int(f.read().strip())
-            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r", encoding="utf-8") as f:
-                period_us = int(f.read().strip())
-            out["cpu"] = {"quota_us": quota_us, "period_us": period_us, "limit_cores": None}
-            if quota_us > 0 and period_us > 0:
-                out["cpu"]["limit_cores"] = round(quota_us / period_us, 4)
+            mem_cur = _read_proc_file(path).strip()
+            current = int(mem_cur) if mem_cur.isdigit() else None
         except Exception:
             pass
+        out["memory"] = {"limit_bytes": mem_static.get("limit_bytes"), "current_bytes": current}
 
     return out
 
@@ -290,17 +560,18 @@ def _read_cgroup_cpu_stat() -> dict[str, int]:
     """
 
     out: dict[str, int] = {}
+    if not _CGROUP_V2:
+        return out
     try:
-        with open("/sys/fs/cgroup/cpu.stat", "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) != 2:
-                    continue
-                k, v = parts
-                try:
-                    out[k] = int(v)
-                except Exception:
-                    continue
+        for line in _read_proc_file("/sys/fs/cgroup/cpu.stat").splitlines():
+            parts = line.strip().split()
+            if len(parts) != 2:
+                continue
+            k, v = parts
+            try:
+                out[k] = int(v)
+            except Exception:
+                continue
     except Exception:
         return {}
     return out
@@ -311,6 +582,8 @@ def _read_cgroup_cpuset_effective() -> str | None:
     读取 cgroup v2 的 cpuset.cpus.effective（例如：0-3,6）。
     """
 
+    if not _CGROUP_V2:
+        return None
     for p in ("/sys/fs/cgroup/cpuset.cpus.effective", "/sys/fs/cgroup/cpuset.cpus"):
         try:
             with open(p, "r", encoding="utf-8") as f:
@@ -327,32 +600,40 @@ def _count_cpuset_cpus(cpuset: str | None) -> int | None:
     统计 cpuset.cpus.effective 的 CPU 数量。
     """
 
-    s = (cpuset or "").strip()
-    if not s:
-        return None
+    return _count_cpuset_cpus_cached((cpuset or "").strip())
+
+
+@functools.lru_cache(maxsize=4)
+def _count_cpuset_cpus_cached(s: str) -> int | None:
+    # 格式如 "0-3,6"；cpuset 基本不变，按原始字符串缓存解析结果
     total = 0
-    for part in s.split(","):
-        part = part.strip()
-        if not part:
-            continue
-        if "-" in part:
-            a_s, b_s = (part.split("-", 1) + [""])[:2]
-            try:
-                a = int(a_s)
-                b = int(b_s)
-            except Exception:
-                continue
-            if b >= a:
-                total += b - a + 1
-            continue
-        try:
-            int(part)
-        except Exception:
+    for a_s, b_s in _CPUSET_RE.findall(s):
+        a = int(a_s)
+        if not b_s:
+            total += 1
             continue
-        total += 1
+        b = int(b_s)
+        if b >= a:
+            total += b - a + 1
     return total or None
 
 
+@functools.lru_cache(maxsize=4)
+def _effective_limit_cores(limit_cores: float | None, cpuset_count: int | None) -> float:
+    """
+    有效 CPU 限额核数 = min(cgroup quota, cpuset 核数)，都没有则取机器核数。
+    两个输入在容器生命周期内基本不变，结果按参数缓存。
+    """
+
+    if limit_cores is not None and cpuset_count is not None:
+        return float(min(limit_cores, float(cpuset_count)))
+    if limit_cores is not None:
+        return float(limit_cores)
+    if cpuset_count is not None:
+        return float(cpuset_count)
+    return float(os.cpu_count() or 1)
+
+
 def _compute_cgroup_cpu_usage(*, limit_cores: float | None, cpuset_count: int | None) -> dict[str, Any]:
     """
     基于 cgroup cpu.stat 的 usage_usec 计算“容器（cgroup）CPU 使用率”。
@@ -370,15 +651,7 @@ def _compute_cgroup_cpu_usage(*, limit_cores: float | None, cpuset_count: int |
     usage_usec = float(stat.get("usage_usec") or 0)
     throttled_usec = float(stat.get("throttled_usec") or 0)
 
-    effective_limit = None
-    if limit_cores is not None and cpuset_count is not None:
-        effective_limit = float(min(limit_cores, float(cpuset_count)))
-    elif limit_cores is not None:
-        effective_limit = float(limit_cores)
-    elif cpuset_count is not None:
-        effective_limit = float(cpuset_count)
-    else:
-        effective_limit = float(os.cpu_count() or 1)
+    effective_limit = _effective_limit_cores(limit_cores, cpuset_count)
 
     out: dict[str, Any] = {
         "cpu_stat": stat,
@@ -401,6 +674,88 @@ def _compute_cgroup_cpu_usage(*, limit_cores: float | None, cpuset_count: int |
     return out
 
 
+def _ttl_cached(key: str, fn: Any, *, ttl_s: float = _SAMPLER_TTL_S) -> Any:
+    """
+    按 key 缓存采样函数结果 ttl_s 秒；调用方不应修改返回值（需要修改时先拷贝）。
+    """
+
+    now = time.monotonic()
+    with _sampler_lock:
+        item = _sampler_cache.get(key)
+        if item and (now - item[0]) < ttl_s:
+            return item[1]
+
+    value = fn()
+    with _sampler_lock:
+        _sampler_cache[key] = (now, value)
+    return value
+
+
+# 看板聚合结果（observability/alerts）的进程内缓存：LRU + 按 key 防击穿。
+# 多 worker/多实例部署时各自缓存，TTL 很短，不同进程间的差异可以接受
+_DASHBOARD_CACHE_MAX_SIZE = 256
+_dashboard_cache: collections.OrderedDict[tuple, tuple[float, Any]] = collections.OrderedDict()
+_dashboard_cache_lock = threading.Lock()
+_dashboard_key_locks: dict[tuple, threading.Lock] = {}
+
+
+def _dashboard_cached(key: tuple, fn: Any, *, ttl_s: float) -> Any:
+    """
+    按 key 缓存 fn() 结果 ttl_s 秒；未命中时同一 key 只有一个请求执行 fn，其余请求等待其完成后直接读缓存。
+    调用方不应修改返回值。
+    """
+
+    with _dashboard_cache_lock:
+        item = _dashboard_cache.get(key)
+        if item and item[0] > time.monotonic():
+            _dashboard_cache.move_to_end(key)
+            return item[1]
+        key_lock = _dashboard_key_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _dashboard_cache_lock:
+            item = _dashboard_cache.get(key)
+            if item and item[0] > time.monotonic():
+                return item[1]
+        try:
+            value = fn()
+            with _dashboard_cache_lock:
+                _dashboard_cache[key] = (time.monotonic() + ttl_s, value)
+                _dashboard_cache.move_to_end(key)
+                while len(_dashboard_cache) > _DASHBOARD_CACHE_MAX_SIZE:
+                    _dashboard_cache.popitem(last=False)
+        finally:
+            with _dashboard_cache_lock:
+                _dashboard_key_locks.pop(key, None)
+    return value
+
+
+def _read_loadavg() -> tuple[float | None, float | None, float | None]:
+    try:
+        load1, load5, load15 = os.getloadavg()
+        return load1, load5, load15
+    except Exception:
+        return None, None, None
+
+
+def _read_sys_uptime_s() -> float | None:
+    try:
+        # /proc/uptime: "uptime idle"
+        with open("/proc/uptime", "r", encoding="utf-8") as f:
+            up = f.read().strip().split()[0]
+        return float(up)
+    except Exception:
+        return None
+
+
+def _read_disk_root() -> dict[str, int] | None:
+    try:
+        du = shutil.disk_usage("/")
+        return {"total_bytes": int(du.total), "used_bytes": int(du.used), "free_bytes": int(du.free)}
+    except Exception:
+        return None
+
+
 def _read_postgres_storage_stats(db: Session) -> dict[str, Any]:
     """
     返回“数据库存储体积”信息（用于运维/容量管理）。
@@ -431,43 +786,76 @@ def _read_postgres_storage_stats(db: Session) -> dict[str, Any]:
         "workspaces",
     ]
 
-    items: list[dict[str, Any]] = []
-    for t in tables:
-        try:
-            row = db.execute(
-                text(
-                    """
-                    SELECT
-                      pg_total_relation_size(CAST(:tbl AS regclass)) AS total_bytes,
-                      pg_relation_size(CAST(:tbl AS regclass)) AS table_bytes,
-                      pg_indexes_size(CAST(:tbl AS regclass)) AS index_bytes
-                    """
-                ),
-                {"tbl": f"public.{t}"},
-            ).first()
-        except Exception:
-            continue
-        if not row:
-            continue
-        total_b = int(row[0] or 0)
-        table_b = int(row[1] or 0)
-        index_b = int(row[2] or 0)
-        items.append({"name": t, "total_bytes": total_b, "table_bytes": table_b, "index_bytes": index_b})
+    # 一次查询返回所有表的体积（替代逐表查询的 N 次往返）
+    try:
+        rows = db.execute(
+            text(
+                """
+                SELECT
+                  c.relname AS name,
+                  pg_total_relation_size(c.oid) AS total_bytes,
+                  pg_relation_size(c.oid) AS table_bytes,
+                  pg_indexes_size(c.oid) AS index_bytes
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public'
+                  AND c.relkind = 'r'
+                  AND c.relname = ANY(:tables)
+                """
+            ),
+            {"tables": tables},
+        ).all()
+    except Exception:
+        rows = []
+
+    items: list[dict[str, Any]] = [
+        {
+            "name": str(r[0]),
+            "total_bytes": int(r[1] or 0),
+            "table_bytes": int(r[2] or 0),
+            "index_bytes": int(r[3] or 0),
+        }
+        for r in rows
+    ]
 
     items.sort(key=lambda x: int(x.get("total_bytes") or 0), reverse=True)
     out["tables"] = items
     return out
 
 
-def _get_storage_cached(db: Session, *, ttl_s: float = 30.0) -> dict[str, Any]:
+def _refresh_storage_sample(session_factory: Any) -> None:
+    global _last_storage_sample, _last_storage_sample_ts
+
+    try:
+        with session_factory() as db:
+            sample = {"now": _utcnow().isoformat(), "postgres": _read_postgres_storage_stats(db)}
+        _last_storage_sample = sample
+        _last_storage_sample_ts = time.time()
+    finally:
+        _storage_refresh_lock.release()
+
+
+def _get_storage_cached(db: Session, *, session_factory: Any, ttl_s: float = 300.0) -> dict[str, Any]:
     """
-    由于 Dashboard 可能频繁轮询，存储统计做轻量缓存，避免每次都打 pg_*size 查询。
+    由于 Dashboard 可能频繁轮询，存储统计做缓存，避免每次都打 pg_*size 查询。
+    - 首次（无缓存）同步计算
+    - 过期后先返回旧值（stale-while-revalidate），由后台线程刷新；同一时刻只允许一个刷新任务
     """
 
     global _last_storage_sample, _last_storage_sample_ts
 
     now = time.time()
-    if _last_storage_sample_ts is not None and _last_storage_sample and (now - _last_storage_sample_ts) < ttl_s:
+    if _last_storage_sample_ts is not None and _last_storage_sample:
+        if (now - _last_storage_sample_ts) >= ttl_s and _storage_refresh_lock.acquire(blocking=False):
+            try:
+                threading.Thread(
+                    target=_refresh_storage_sample,
+                    args=(session_factory,),
+                    name="admin-storage-refresh",
+                    daemon=True,
+                ).start()
+            except Exception:
+                _storage_refresh_lock.release()
         return _last_storage_sample
 
     sample = {"now": _utcnow().isoformat(), "postgres": _read_postgres_storage_stats(db)}
@@ -515,15 +903,80 @@ def _compute_cpu_percents() -> dict[str, Any]:
     return out
 
 
+def _ewma_merge(prev: dict[str, Any], cur: dict[str, Any], *, alpha: float) -> dict[str, Any]:
+    out: dict[str, Any] = {}
+    for section, values in cur.items():
+        prev_sec = prev.get(section) or {}
+        merged: dict[str, Any] = {}
+        for k, v in values.items():
+            pv = prev_sec.get(k)
+            if isinstance(v, (int, float)) and isinstance(pv, (int, float)):
+                merged[k] = round(alpha * float(v) + (1.0 - alpha) * float(pv), 3)
+            else:
+                merged[k] = v
+        out[section] = merged
+    return out
+
+
+async def _cpu_sampler_loop(*, interval_s: float = _CPU_SAMPLE_INTERVAL_S, alpha: float = 0.3) -> None:
+    """
+    后台以固定频率采样 CPU 使用率（EWMA 平滑），请求路径只读取最近结果：
+    - 首次请求也有数据（无需等待上一次采样）
+    - 采样窗口固定，不受 Dashboard 轮询频率影响
+    """
+
+    global _last_cpu_percents
+
+    _compute_cpu_percents()
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            cur = _compute_cpu_percents()
+        except Exception:
+            continue
+        # 整体替换引用（CPython 下赋值是原子的），读取方无需加锁
+        _last_cpu_percents = _ewma_merge(_last_cpu_percents, cur, alpha=alpha) if _last_cpu_percents else cur
+
+
+def start_cpu_sampler() -> None:
+    """
+    在事件循环中启动 CPU 采样任务（需在运行中的 loop 内调用，例如 startup 事件）。
+    """
+
+    global _cpu_sampler_task
+
+    if _cpu_sampler_task is not None and not _cpu_sampler_task.done():
+        return
+    _cpu_sampler_task = asyncio.get_running_loop().create_task(_cpu_sampler_loop())
+
+
+def stop_cpu_sampler() -> None:
+    global _cpu_sampler_task
+
+    if _cpu_sampler_task is not None:
+        _cpu_sampler_task.cancel()
+        _cpu_sampler_task = None
+
+
+def _get_cpu_percents() -> dict[str, Any]:
+    """
+    读取后台采样的 CPU 使用率；采样任务未运行（例如非 API 进程）时退化为请求内计算。
+    """
+
+    if _cpu_sampler_task is not None and not _cpu_sampler_task.done():
+        return _last_cpu_percents or {"system": {}, "process": {}}
+    return _compute_cpu_percents()
+
+
 def _collect_container_metrics() -> dict[str, Any]:
     """
     容器内 cgroup + /proc 的轻量指标；不可用则返回空 dict。
     """
 
-    cpu = _compute_cpu_percents()
-    mem = _read_meminfo_bytes()
+    cpu = _get_cpu_percents()
+    mem = _ttl_cached("meminfo", _read_meminfo_bytes)
     rss = _read_proc_rss_bytes()
-    cgroup_limits = _read_cgroup_limits()
+    cgroup_limits = _ttl_cached("cgroup_limits", _read_cgroup_limits)
     cgroup_usage = _compute_cgroup_cpu_usage(
         limit_cores=float(cgroup_limits.get("cpu_quota_cores") or 0) if cgroup_limits else None,
         cpuset_count=int(cgroup_limits.get("cpuset_cpu_count") or 0) if cgroup_limits else None,
@@ -623,7 +1076,7 @@ def workspace_system(
 
     _require_workspace_access(principal, workspace_id)
 
-    meminfo = _read_meminfo_bytes()
+    meminfo = _ttl_cached("meminfo", _read_meminfo_bytes)
     mem_total = int(meminfo.get("MemTotal") or 0)
     mem_avail = int(meminfo.get("MemAvailable") or 0)
     mem_used = mem_total - mem_avail if mem_total and mem_avail else None
@@ -631,23 +1084,14 @@ def workspace_system(
 
     rss = _read_proc_rss_bytes()
     proc_cpu_total_s = _read_proc_cpu_times_s()
-    cpu_delta = _compute_cpu_percents()
+    cpu_delta = _get_cpu_percents()
 
-    try:
-        load1, load5, load15 = os.getloadavg()
-    except Exception:
-        load1, load5, load15 = None, None, None
+    load1, load5, load15 = _ttl_cached("loadavg", _read_loadavg)
+    sys_uptime_s = _ttl_cached("uptime", _read_sys_uptime_s)
 
-    try:
-        # /proc/uptime: "uptime idle"
-        with open("/proc/uptime", "r", encoding="utf-8") as f:
-            up = f.read().strip().split()[0]
-        sys_uptime_s = float(up)
-    except Exception:
-        sys_uptime_s = None
-
-    cgroup = _read_cgroup_limits()
-    cpuset_eff = _read_cgroup_cpuset_effective()
+    # 缓存的是共享对象：下面会往 cgroup 子 dict 里补字段，这里先浅拷贝一层
+    cgroup = {k: dict(v) if isinstance(v, dict) else v for k, v in _ttl_cached("cgroup_limits", _read_cgroup_limits).items()}
+    cpuset_eff = _ttl_cached("cpuset_effective", _read_cgroup_cpuset_effective)
     cpuset_cnt = _count_cpuset_cpus(cpuset_eff)
     if cgroup.get("cpu") is None:
         cgroup["cpu"] = {}
@@ -680,42 +1124,43 @@ def workspace_system(
                     max(0.0, min(100.0, cur_i / float(effective_limit) * 100.0)), 2
                 )
 
-    disk_root = None
-    try:
-        du = shutil.disk_usage("/")
-        disk_root = {"total_bytes": int(du.total), "used_bytes": int(du.used), "free_bytes": int(du.free)}
-    except Exception:
-        pass
+    disk_root = _ttl_cached("disk_root", _read_disk_root)
 
     fd_count = None
     try:
-        fd_count = len(os.listdir("/proc/self/fd"))
+        # 逐项计数不构造文件名列表；减 1 扣除 scandir 自身打开的目录 fd
+        with os.scandir("/proc/self/fd") as it:
+            fd_count = sum(1 for _ in it) - 1
     except Exception:
         pass
 
+    process: dict[str, Any] = {
+        "pid": int(os.getpid()),
+        "uptime_s": round(time.monotonic() - _PROC_START_MONO, 3),
+        "rss_bytes": rss,
+        "cpu_total_s": proc_cpu_total_s,
+        "open_fds": fd_count,
+    }
+    process.update(cpu_delta.get("process") or {})
+
+    system: dict[str, Any] = {
+        "cpu_count": int(os.cpu_count() or 0) or None,
+        "loadavg": {"1m": load1, "5m": load5, "15m": load15},
+        "uptime_s": sys_uptime_s,
+        "memory": {
+            "total_bytes": mem_total or None,
+            "available_bytes": mem_avail or None,
+            "used_bytes": mem_used,
+            "used_percent": round(mem_used_pct, 2) if mem_used_pct is not None else None,
+        },
+        "disk_root": disk_root,
+    }
+    system.update(cpu_delta.get("system") or {})
+
     return {
         "now": _utcnow().isoformat(),
-        "process": {
-            "pid": int(os.getpid()),
-            "uptime_s": round(time.monotonic() - _PROC_START_MONO, 3),
-            "rss_bytes": rss,
-            "cpu_total_s": proc_cpu_total_s,
-            "open_fds": fd_count,
-        }
-        | cpu_delta.get("process", {}),
-        "system": {
-            "cpu_count": int(os.cpu_count() or 0) or None,
-            "loadavg": {"1m": load1, "5m": load5, "15m": load15},
-            "uptime_s": sys_uptime_s,
-            "memory": {
-                "total_bytes": mem_total or None,
-                "available_bytes": mem_avail or None,
-                "used_bytes": mem_used,
-                "used_percent": round(mem_used_pct, 2) if mem_used_pct is not None else None,
-            },
-            "disk_root": disk_root,
-        }
-        | cpu_delta.get("system", {}),
+        "process": process,
+        "system": system,
         "cgroup": cgroup,
         "runtime": {"python": platform.python_version(), "platform": platform.platform()},
     }
@@ -770,6 +1215,7 @@ def workspace_metrics(
 @router.get("/workspaces/{workspace_id}/storage")
 def workspace_storage(
     workspace_id: str,
+    request: Request,
     principal: AdminPrincipal = Depends(require_admin),
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
@@ -780,7 +1226,7 @@ def workspace_storage(
     """
 
     _require_workspace_access(principal, workspace_id)
-    return _get_storage_cached(db)
+    return _get_storage_cached(db, session_factory=request.app.state.SessionLocal)
 
 
 class AppCreateRequest(BaseModel):
@@ -914,39 +1360,72 @@ def _parse_iso_datetime(value: str | None) -> dt.datetime | None:
     if not raw:
         return None
 
-    s = raw[:-1] if raw.endswith("Z") else raw
-    try:
-        return dt.datetime.fromisoformat(s)
-    except Exception:
-        pass
-
+    # 纯日期直接走 date 解析；其余交给 datetime.fromisoformat（3.11+ 原生支持 Z 后缀）
+    if len(raw) == 10:
+        try:
+            return dt.datetime.combine(dt.date.fromisoformat(raw), dt.time.min)
+        except ValueError:
+            return None
     try:
-        d = dt.date.fromisoformat(s)
-    except Exception:
+        return dt.datetime.fromisoformat(raw)
+    except ValueError:
         return None
-    return dt.datetime.combine(d, dt.time.min)
 
 
-def _estimate_cost_usd(
-    pricing: dict[str, dict[str, float]],
-    *,
-    model: str,
-    prompt_tokens: int,
-    completion_tokens: int,
-) -> float | None:
-    m = (model or "").strip()
-    if not m:
-        return None
-    p = pricing.get(m)
-    if not p:
-        return None
-    pt = max(0, int(prompt_tokens or 0))
-    ct = max(0, int(completion_tokens or 0))
-    return (pt / 1000.0) * float(p.get("prompt_usd_per_1k", 0.0)) + (ct / 1000.0) * float(p.get("completion_usd_per_1k", 0.0))
+def _pricing_per_token(pricing: dict[str, dict[str, float]]) -> dict[str, tuple[float, float]]:
+    """
+    把 {model: {prompt_usd_per_1k, completion_usd_per_1k}} 预先折算成每 token 单价，
+    再作为绑定参数交给 SQL 计算成本。
+    """
+
+    return {
+        m: (float(p.get("prompt_usd_per_1k", 0.0)) / 1000.0, float(p.get("completion_usd_per_1k", 0.0)) / 1000.0)
+        for m, p in pricing.items()
+        if p
+    }
+
+
+def _pricing_params(per_token: dict[str, tuple[float, float]]) -> dict[str, list[Any]]:
+    """
+    把每 token 单价拆成三列数组作为绑定参数，SQL 侧 unnest 成 (model, pp, cp) 计价表，
+    成本随聚合一起算出，避免模型名拼进 SQL 文本。
+    """
+
+    return {
+        "price_models": list(per_token),
+        "price_pp": [v[0] for v in per_token.values()],
+        "price_cp": [v[1] for v in per_token.values()],
+    }
+
+
+# 计价配置在进程生命周期内基本不变：按 MODEL_PRICING_JSON 原始字符串缓存折算结果与绑定参数
+_pricing_memo: tuple[str | None, dict[str, tuple[float, float]], dict[str, list[Any]]] | None = None
+
+
+def _pricing_tables(settings: Settings) -> tuple[dict[str, tuple[float, float]], dict[str, list[Any]]]:
+    global _pricing_memo
+    memo = _pricing_memo
+    if memo is not None and memo[0] == settings.pricing_json:
+        return memo[1], memo[2]
+    per_token = _pricing_per_token(settings.model_pricing())
+    params = _pricing_params(per_token)
+    _pricing_memo = (settings.pricing_json, per_token, params)
+    return per_token, params
+
+
+# 计价表：未配置计价的模型 LEFT JOIN 不到，cost 为 NULL（与原 Python 估算返回 None 一致）
+_PRICING_JOIN_TMPL = """
+    LEFT JOIN unnest(
+      CAST(:price_models AS text[]),
+      CAST(:price_pp AS double precision[]),
+      CAST(:price_cp AS double precision[])
+    ) AS pr(model, pp, cp) ON pr.model = btrim({model_expr})"""
 
 
 @router.post("/auth/login", response_model=AdminLoginResponse)
-def admin_login(req: AdminLoginRequest, settings: Settings = Depends(get_settings)) -> AdminLoginResponse:
+async def admin_login(req: AdminLoginRequest, settings: Settings = Depends(get_settings)) -> AdminLoginResponse:
+    # 校验只是常量时间的 compare_digest（无 bcrypt/argon2 等 KDF），微秒级，直接在事件循环内完成，
+    # 省去同步路由的线程池调度；若将来引入 KDF，需改为 await run_in_threadpool(authenticate_admin, ...)
     principal = authenticate_admin(username=req.username, password=req.password, settings=settings)
     token, expires_in = issue_admin_access_token(principal, settings=settings)
     return AdminLoginResponse(access_token=token, expires_in=expires_in)
@@ -962,7 +1441,7 @@ def list_workspaces(
     principal: AdminPrincipal = Depends(require_admin),
     db: Session = Depends(get_db),
 ) -> list[WorkspaceItem]:
-    items = db.scalars(select(Workspace).order_by(Workspace.created_at.asc())).all()
+    items = db.execute(select(Workspace.id, Workspace.name).order_by(Workspace.created_at.asc())).all()
     # 当前只有超管账号：返回全部 workspace；访问控制在具体 workspace 路由校验
     return [WorkspaceItem(id=w.id, name=w.name) for w in items]
 
@@ -974,12 +1453,24 @@ def get_workspace(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    w = db.get(Workspace, workspace_id)
+    w = db.execute(
+        select(Workspace.id, Workspace.name, Workspace.created_at).where(Workspace.id == workspace_id)
+    ).first()
     if not w:
         raise HTTPException(status_code=404, detail="workspace not found")
     return {"id": w.id, "name": w.name, "created_at": w.created_at.isoformat() if w.created_at else None}
 
 
+_HEALTH_SQL = text(
+    """
+    SELECT
+      (SELECT 1) AS ping,
+      (SELECT extname FROM pg_extension WHERE extname = 'vector') AS extname,
+      ARRAY(SELECT indexname::text FROM pg_indexes WHERE tablename = 'chunks') AS idx_names
+    """
+)
+
+
 @router.get("/workspaces/{workspace_id}/health", response_model=HealthResponse)
 def workspace_health(
     workspace_id: str,
@@ -990,44 +1481,49 @@ def workspace_health(
     _require_workspace_access(principal, workspace_id)
     deps: dict[str, Any] = {"postgres": "unknown", "pgvector": "unknown", "indexes": {}}
 
+    # 连通性 / 扩展 / 索引一次往返取回
     try:
-        db.execute(text("SELECT 1")).scalar()
-        deps["postgres"] = "ok"
-    except Exception as e:
-        deps["postgres"] = f"error: {str(e)}"
-
-    try:
-        db.execute(text("SELECT extname FROM pg_extension WHERE extname='vector'")).scalar()
-        deps["pgvector"] = "ok"
+        _, extname, idx_names = db.execute(_HEALTH_SQL).one()
     except Exception as e:
-        deps["pgvector"] = f"error: {str(e)}"
-
-    try:
-        idx_rows = db.execute(text("SELECT indexname FROM pg_indexes WHERE tablename='chunks'")).scalars().all()
-        idx_set = {str(n) for n in (idx_rows or [])}
+        err = f"error: {str(e)}"
+        deps["postgres"] = err
+        deps["pgvector"] = err
+        deps["indexes"] = {"error": str(e)}
+    else:
+        deps["postgres"] = "ok"
+        deps["pgvector"] = "ok" if extname else "missing"
+        has_hnsw = has_ivfflat = has_fts = False
+        for n in idx_names or ():
+            if n == "idx_chunks_embedding_hnsw":
+                has_hnsw = True
+            elif n == "idx_chunks_embedding_ivfflat":
+                has_ivfflat = True
+            elif n.startswith("idx_chunks_fts_"):
+                has_fts = True
         deps["indexes"] = {
-            "pgvector_hnsw": "idx_chunks_embedding_hnsw" in idx_set,
-            "pgvector_ivfflat": "idx_chunks_embedding_ivfflat" in idx_set,
-            "fts": any(n.startswith("idx_chunks_fts_") for n in idx_set),
+            "pgvector_hnsw": has_hnsw,
+            "pgvector_ivfflat": has_ivfflat,
+            "fts": has_fts,
             "pgvector_embedding_dim": int(settings.pgvector_embedding_dim),
         }
-    except Exception as e:
-        deps["indexes"] = {"error": str(e)}
 
     ok = deps.get("postgres") == "ok" and deps.get("pgvector") == "ok"
     return HealthResponse(status=("ok" if ok else "degraded"), dependencies=deps)
 
 
-@router.get("/workspaces/{workspace_id}/settings")
-def workspace_settings(
-    workspace_id: str,
-    settings: Settings = Depends(get_settings),
-    principal: AdminPrincipal = Depends(require_admin),
-) -> dict[str, Any]:
-    _require_workspace_access(principal, workspace_id)
+# settings 在进程生命周期内不变：脱敏后的配置快照按 settings 对象身份缓存
+_settings_payload_cache: tuple[Settings, dict[str, Any]] | None = None
+
+
+def _build_settings_payload(settings: Settings) -> dict[str, Any]:
+    global _settings_payload_cache
+
+    cached = _settings_payload_cache
+    if cached is not None and cached[0] is settings:
+        return cached[1]
 
     # 脱敏：不返回密码/密钥
-    return {
+    payload = {
         "app_env": settings.app_env,
         "log_level": settings.log_level,
         "database": {"url": "***"},
@@ -1078,6 +1574,18 @@ def workspace_settings(
         "widget": {"frame_ancestors": settings.widget_frame_ancestors},
         "observability": {"retrieval_events_enabled": bool(settings.retrieval_events_enabled)},
     }
+    _settings_payload_cache = (settings, payload)
+    return payload
+
+
+@router.get("/workspaces/{workspace_id}/settings")
+def workspace_settings(
+    workspace_id: str,
+    settings: Settings = Depends(get_settings),
+    principal: AdminPrincipal = Depends(require_admin),
+) -> dict[str, Any]:
+    _require_workspace_access(principal, workspace_id)
+    return _build_settings_payload(settings)
 
 
 class ModelTestRequest(BaseModel):
@@ -1215,7 +1723,7 @@ def list_audit_logs(
         like = f"%{object_id.strip()}%"
         stmt = stmt.where(AuditLog.object_id.ilike(like))
 
-    total = int(db.scalar(select(func.count()).select_from(stmt.subquery())) or 0)
+    total = _count_stmt(db, stmt)
     rows = db.scalars(stmt.order_by(desc(AuditLog.created_at)).offset(offset).limit(ps)).all()
     return {
         "page": p,
@@ -1236,124 +1744,165 @@ def list_audit_logs(
     }
 
 
+# 统计类热点查询：模块级 text() 常量 + 显式参数类型，编译结果可被 SQLAlchemy 复用，避免每次请求重建
+_WS_CHUNK_COUNTS_SQL = text(
+    """
+    SELECT
+      COUNT(*) AS total,
+      COUNT(*) FILTER (WHERE c.embedding IS NOT NULL) AS with_embedding
+    FROM chunks c
+    JOIN pages p ON p.id = c.page_id
+    WHERE p.workspace_id = :ws
+    """
+).bindparams(bindparam("ws", type_=String))
+
+_KB_CHUNK_COUNTS_SQL = text(
+    """
+    SELECT
+      COUNT(*) AS total,
+      COUNT(*) FILTER (WHERE c.embedding IS NOT NULL) AS with_embedding
+    FROM chunks c
+    JOIN pages p ON p.id = c.page_id
+    WHERE p.workspace_id = :ws
+      AND p.kb_id = :kb
+    """
+).bindparams(bindparam("ws", type_=String), bindparam("kb", type_=String))
+
+_WS_EMBEDDING_MODELS_SQL = text(
+    """
+    SELECT c.embedding_model AS model, COUNT(*) AS cnt
+    FROM chunks c
+    JOIN pages p ON p.id = c.page_id
+    WHERE p.workspace_id = :ws
+    GROUP BY c.embedding_model
+    ORDER BY cnt DESC
+    """
+).bindparams(bindparam("ws", type_=String))
+
+# 在 SQL 内完成 type -> status -> count 的透视，只回传一行 JSONB
+_WS_JOBS_BY_TYPE_SQL = text(
+    """
+    SELECT COALESCE(jsonb_object_agg(t.type, t.by_status), '{}'::jsonb)
+    FROM (
+      SELECT type, jsonb_object_agg(status, cnt) AS by_status
+      FROM (
+        SELECT type, status, COUNT(*) AS cnt
+        FROM jobs
+        WHERE workspace_id = :ws
+        GROUP BY type, status
+      ) x
+      GROUP BY type
+    ) t
+    """
+).bindparams(bindparam("ws", type_=String))
+
+
+_WS_SUMMARY_MV_SQL = text(
+    """
+    SELECT
+      pages_total, pages_failed, pages_24h, last_crawled_at,
+      chunks_total, chunks_with_embedding, embedding_models,
+      feedback_total, feedback_up, feedback_down, refreshed_at
+    FROM mv_workspace_summary
+    WHERE workspace_id = :ws
+    """
+).bindparams(bindparam("ws", type_=String))
+
+
+def _read_summary_mv(db: Session, workspace_id: str) -> Any | None:
+    """
+    读取 mv_workspace_summary 中该 workspace 的快照行；视图不存在/未填充时回滚并返回 None。
+    """
+
+    try:
+        return db.execute(_WS_SUMMARY_MV_SQL, {"ws": workspace_id}).mappings().first()
+    except Exception:
+        db.rollback()
+        return None
+
+
+_CHUNKS_INDEXES_TTL_S = 60.0
+
+
+def _chunks_index_names(db: Session) -> frozenset[str]:
+    """
+    chunks 表上的索引名（只在部署/启动时由 ensure_indexes 变更），进程内缓存 60s，省去每次 summary 的系统表查询。
+    """
+
+    return _ttl_cached(
+        "chunks_indexes",
+        lambda: frozenset(
+            str(n) for n in db.execute(text("SELECT indexname FROM pg_indexes WHERE tablename='chunks'")).scalars().all()
+        ),
+        ttl_s=_CHUNKS_INDEXES_TTL_S,
+    )
+
+
 @router.get("/workspaces/{workspace_id}/summary", response_model=SummaryResponse)
 def workspace_summary(
     workspace_id: str,
+    settings: Settings = Depends(get_settings),
     principal: AdminPrincipal = Depends(require_admin),
     db: Session = Depends(get_db),
 ) -> SummaryResponse:
     _require_workspace_access(principal, workspace_id)
-    now = _utcnow()
-    since_24h = now - dt.timedelta(hours=24)
 
-    pages_total = int(
-        db.scalar(select(func.count()).select_from(Page).where(Page.workspace_id == workspace_id)) or 0
-    )
-    pages_failed = int(
-        db.scalar(
-            select(func.count())
-            .select_from(Page)
-            .where(Page.workspace_id == workspace_id)
-            .where(Page.http_status != 200)
-        )
-        or 0
-    )
-    pages_24h = int(
-        db.scalar(
-            select(func.count())
-            .select_from(Page)
-            .where(Page.workspace_id == workspace_id)
-            .where(Page.last_crawled_at >= since_24h)
-        )
-        or 0
-    )
-    last_crawl = db.scalar(select(func.max(Page.last_crawled_at)).where(Page.workspace_id == workspace_id))
+    # 开启物化视图时优先读快照；新 workspace（视图中尚无该行）或视图不可用时回退实时聚合
+    mv_row = _read_summary_mv(db, workspace_id) if settings.summary_mv_refresh_s > 0 else None
+    if mv_row is not None:
+        pages_total = int(mv_row["pages_total"] or 0)
+        pages_failed = int(mv_row["pages_failed"] or 0)
+        pages_24h = int(mv_row["pages_24h"] or 0)
+        last_crawl = mv_row["last_crawled_at"]
+        chunks_total = int(mv_row["chunks_total"] or 0)
+        chunks_with_embedding = int(mv_row["chunks_with_embedding"] or 0)
+        embedding_models = {str(k): int(v or 0) for k, v in (mv_row["embedding_models"] or {}).items()}
+        feedback_total = int(mv_row["feedback_total"] or 0)
+        feedback_up = int(mv_row["feedback_up"] or 0)
+        feedback_down = int(mv_row["feedback_down"] or 0)
+        stats_as_of = mv_row["refreshed_at"].isoformat() if mv_row["refreshed_at"] else None
+    else:
+        since_24h = _utcnow() - dt.timedelta(hours=24)
 
-    chunks_total = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM chunks c
-                JOIN pages p ON p.id = c.page_id
-                WHERE p.workspace_id = :ws
-                """
-            ),
-            {"ws": workspace_id},
-        ).scalar()
-        or 0
-    )
-    chunks_with_embedding = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM chunks c
-                JOIN pages p ON p.id = c.page_id
-                WHERE p.workspace_id = :ws
-                  AND c.embedding IS NOT NULL
-                """
-            ),
-            {"ws": workspace_id},
-        ).scalar()
-        or 0
-    )
-    embedding_coverage = (chunks_with_embedding / chunks_total) if chunks_total > 0 else 0.0
+        # 页面统计一次查询返回（COUNT ... FILTER），避免 4 次往返
+        pages_row = db.execute(
+            select(
+                func.count(),
+                func.count().filter(Page.http_status != 200),
+                func.count().filter(Page.last_crawled_at >= since_24h),
+                func.max(Page.last_crawled_at),
+            ).where(Page.workspace_id == workspace_id)
+        ).one()
+        pages_total = int(pages_row[0] or 0)
+        pages_failed = int(pages_row[1] or 0)
+        pages_24h = int(pages_row[2] or 0)
+        last_crawl = pages_row[3]
+
+        chunks_row = db.execute(_WS_CHUNK_COUNTS_SQL, {"ws": workspace_id}).one()
+        chunks_total = int(chunks_row[0] or 0)
+        chunks_with_embedding = int(chunks_row[1] or 0)
+
+        embedding_models_rows = db.execute(_WS_EMBEDDING_MODELS_SQL, {"ws": workspace_id}).all()
+        embedding_models = {str(r[0] or ""): int(r[1] or 0) for r in embedding_models_rows if (r[0] or "").strip()}
+
+        feedback_row = db.execute(
+            select(
+                func.count(),
+                func.count().filter(Feedback.rating == "up"),
+                func.count().filter(Feedback.rating == "down"),
+            ).where(Feedback.workspace_id == workspace_id)
+        ).one()
+        feedback_total = int(feedback_row[0] or 0)
+        feedback_up = int(feedback_row[1] or 0)
+        feedback_down = int(feedback_row[2] or 0)
+        stats_as_of = None
 
-    embedding_models_rows = db.execute(
-        text(
-            """
-            SELECT c.embedding_model AS model, COUNT(*) AS cnt
-            FROM chunks c
-            JOIN pages p ON p.id = c.page_id
-            WHERE p.workspace_id = :ws
-            GROUP BY c.embedding_model
-            ORDER BY cnt DESC
-            """
-        ),
-        {"ws": workspace_id},
-    ).all()
-    embedding_models = {str(r[0] or ""): int(r[1] or 0) for r in embedding_models_rows if (r[0] or "").strip()}
-
-    jobs_rows = db.execute(
-        text(
-            """
-            SELECT type, status, COUNT(*) AS cnt
-            FROM jobs
-            WHERE workspace_id = :ws
-            GROUP BY type, status
-            """
-        ),
-        {"ws": workspace_id},
-    ).all()
-    jobs_by_type: dict[str, dict[str, int]] = {}
-    for t, s, cnt in jobs_rows:
-        jobs_by_type.setdefault(str(t), {})[str(s)] = int(cnt or 0)
+    embedding_coverage = (chunks_with_embedding / chunks_total) if chunks_total > 0 else 0.0
 
-    feedback_total = int(
-        db.scalar(select(func.count()).select_from(Feedback).where(Feedback.workspace_id == workspace_id)) or 0
-    )
-    feedback_up = int(
-        db.scalar(
-            select(func.count())
-            .select_from(Feedback)
-            .where(Feedback.workspace_id == workspace_id)
-            .where(Feedback.rating == "up")
-        )
-        or 0
-    )
-    feedback_down = int(
-        db.scalar(
-            select(func.count())
-            .select_from(Feedback)
-            .where(Feedback.workspace_id == workspace_id)
-            .where(Feedback.rating == "down")
-        )
-        or 0
-    )
+    # 任务状态变化频繁，始终实时统计
+    jobs_by_type: dict[str, dict[str, int]] = db.execute(_WS_JOBS_BY_TYPE_SQL, {"ws": workspace_id}).scalar() or {}
 
-    idx_rows = db.execute(text("SELECT indexname FROM pg_indexes WHERE tablename='chunks'")).scalars().all()
-    idx_set = {str(n) for n in (idx_rows or [])}
+    idx_set = _chunks_index_names(db)
     has_hnsw = "idx_chunks_embedding_hnsw" in idx_set
     has_ivfflat = "idx_chunks_embedding_ivfflat" in idx_set
     has_fts = any(n.startswith("idx_chunks_fts_") for n in idx_set)
@@ -1379,6 +1928,7 @@ def workspace_summary(
             "up_ratio": (feedback_up / feedback_total) if feedback_total > 0 else 0.0,
         },
         indexes={"pgvector_hnsw": has_hnsw, "pgvector_ivfflat": has_ivfflat, "fts": has_fts},
+        stats_as_of=stats_as_of,
     )
 
 
@@ -1389,17 +1939,18 @@ def list_apps(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    kb_count_subq = (
-        select(RagAppKnowledgeBase.app_id, func.count().label("kb_count"))
+    # LATERAL：按 app 逐个下推计数，避免对整张绑定表先做 GROUP BY
+    kb_count_lat = (
+        select(func.count().label("kb_count"))
+        .where(RagAppKnowledgeBase.app_id == RagApp.id)
         .where(RagAppKnowledgeBase.workspace_id == workspace_id)
         .where(RagAppKnowledgeBase.enabled.is_(True))
-        .group_by(RagAppKnowledgeBase.app_id)
-        .subquery()
+        .lateral("kb_counts")
     )
     rows = db.execute(
-        select(RagApp, func.coalesce(kb_count_subq.c.kb_count, 0))
+        select(RagApp, func.coalesce(kb_count_lat.c.kb_count, 0))
+        .outerjoin(kb_count_lat, true())
         .where(RagApp.workspace_id == workspace_id)
-        .outerjoin(kb_count_subq, kb_count_subq.c.app_id == RagApp.id)
         .order_by(RagApp.created_at.asc())
     ).all()
     return {
@@ -1531,33 +2082,37 @@ def get_app_kbs(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    app = db.get(RagApp, app_id)
-    if not app or app.workspace_id != workspace_id:
+    app_exists = db.scalar(select(RagApp.id).where(RagApp.id == app_id).where(RagApp.workspace_id == workspace_id))
+    if app_exists is None:
         raise HTTPException(status_code=404, detail="app not found")
 
-    bindings = db.scalars(
-        select(RagAppKnowledgeBase)
+    # 绑定与 KB 名称一次 JOIN 取回；LEFT JOIN 保留 KB 已被删除的绑定（kb_name 置空）
+    rows = db.execute(
+        select(
+            RagAppKnowledgeBase.kb_id,
+            KnowledgeBase.name,
+            RagAppKnowledgeBase.weight,
+            RagAppKnowledgeBase.priority,
+            RagAppKnowledgeBase.enabled,
+        )
+        .outerjoin(
+            KnowledgeBase,
+            (KnowledgeBase.id == RagAppKnowledgeBase.kb_id) & (KnowledgeBase.workspace_id == workspace_id),
+        )
         .where(RagAppKnowledgeBase.workspace_id == workspace_id)
         .where(RagAppKnowledgeBase.app_id == app_id)
         .order_by(RagAppKnowledgeBase.priority.asc(), RagAppKnowledgeBase.id.asc())
     ).all()
-    kb_ids = [b.kb_id for b in bindings]
-    kb_map = {
-        kb.id: kb
-        for kb in db.scalars(
-            select(KnowledgeBase).where(KnowledgeBase.workspace_id == workspace_id).where(KnowledgeBase.id.in_(kb_ids))
-        ).all()
-    }
     return {
         "items": [
             {
-                "kb_id": b.kb_id,
-                "kb_name": (kb_map.get(b.kb_id).name if kb_map.get(b.kb_id) else ""),
-                "weight": float(b.weight or 0.0),
-                "priority": int(b.priority or 0),
-                "enabled": bool(b.enabled),
+                "kb_id": kb_id,
+                "kb_name": kb_name or "",
+                "weight": float(weight or 0.0),
+                "priority": int(priority or 0),
+                "enabled": bool(enabled),
             }
-            for b in bindings
+            for kb_id, kb_name, weight, priority, enabled in rows
         ]
     }
 
@@ -1571,38 +2126,69 @@ def put_app_kbs(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    app = db.get(RagApp, app_id)
-    if not app or app.workspace_id != workspace_id:
+    app_exists = db.scalar(select(RagApp.id).where(RagApp.id == app_id).where(RagApp.workspace_id == workspace_id))
+    if app_exists is None:
         raise HTTPException(status_code=404, detail="app not found")
 
     # 校验 kb 存在且同 workspace
     kb_ids = [b.kb_id for b in req.bindings]
     if kb_ids:
-        exists = set(
-            db.scalars(
-                select(KnowledgeBase.id).where(KnowledgeBase.workspace_id == workspace_id).where(KnowledgeBase.id.in_(kb_ids))
-            ).all()
-        )
-        missing = [kid for kid in kb_ids if kid not in exists]
-        if missing:
+        kb_filter = (KnowledgeBase.workspace_id == workspace_id) & KnowledgeBase.id.in_(kb_ids)
+        found = int(db.scalar(select(func.count()).select_from(KnowledgeBase).where(kb_filter)) or 0)
+        # 快路径只回传一个计数；不一致时再取 id 列表拼出缺失项
+        if found != len(set(kb_ids)):
+            exists = set(db.scalars(select(KnowledgeBase.id).where(kb_filter)).all())
+            missing = [kid for kid in kb_ids if kid not in exists]
             raise HTTPException(status_code=400, detail=f"kb 不存在：{','.join(missing)}")
 
-    db.execute(
-        delete(RagAppKnowledgeBase)
-        .where(RagAppKnowledgeBase.workspace_id == workspace_id)
-        .where(RagAppKnowledgeBase.app_id == app_id)
-    )
+    # 与现有绑定做差异：只删除移除项、只 upsert 新增/变更项；未变化的行不动（保留 created_at，减少索引与 WAL 写入）
+    existing = {
+        str(kid): (float(w or 0.0), int(pr or 0), bool(en))
+        for kid, w, pr, en in db.execute(
+            select(
+                RagAppKnowledgeBase.kb_id,
+                RagAppKnowledgeBase.weight,
+                RagAppKnowledgeBase.priority,
+                RagAppKnowledgeBase.enabled,
+            )
+            .where(RagAppKnowledgeBase.workspace_id == workspace_id)
+            .where(RagAppKnowledgeBase.app_id == app_id)
+        ).all()
+    }
+    desired = {b.kb_id: (float(b.weight), int(b.priority), bool(b.enabled)) for b in req.bindings}
+
+    removed = [kid for kid in existing if kid not in desired]
+    if removed:
+        db.execute(
+            delete(RagAppKnowledgeBase)
+            .where(RagAppKnowledgeBase.workspace_id == workspace_id)
+            .where(RagAppKnowledgeBase.app_id == app_id)
+            .where(RagAppKnowledgeBase.kb_id.in_(removed))
+        )
     now = _utcnow()
-    for b in req.bindings:
-        db.add(
-            RagAppKnowledgeBase(
-                workspace_id=workspace_id,
-                app_id=app_id,
-                kb_id=b.kb_id,
-                weight=float(b.weight),
-                priority=int(b.priority),
-                enabled=bool(b.enabled),
-                created_at=now,
+    upserts = [
+        {
+            "workspace_id": workspace_id,
+            "app_id": app_id,
+            "kb_id": kid,
+            "weight": weight,
+            "priority": priority,
+            "enabled": enabled,
+            "created_at": now,
+        }
+        for kid, (weight, priority, enabled) in desired.items()
+        if existing.get(kid) != (weight, priority, enabled)
+    ]
+    if upserts:
+        stmt = pg_insert(RagAppKnowledgeBase).values(upserts)
+        db.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_app_kbs_app_kb",
+                set_={
+                    "weight": stmt.excluded.weight,
+                    "priority": stmt.excluded.priority,
+                    "enabled": stmt.excluded.enabled,
+                },
             )
         )
     _add_audit_log(
@@ -1625,6 +2211,15 @@ def _ensure_kb_or_404(db: Session, workspace_id: str, kb_id: str) -> KnowledgeBa
     return kb
 
 
+def _ensure_kb_exists(db: Session, workspace_id: str, kb_id: str) -> None:
+    # 仅做归属校验时不加载整行（config 等 JSON 列可能较大）
+    found = db.scalar(
+        select(KnowledgeBase.id).where(KnowledgeBase.id == kb_id).where(KnowledgeBase.workspace_id == workspace_id)
+    )
+    if found is None:
+        raise HTTPException(status_code=404, detail="kb not found")
+
+
 def _safe_render(template: str, variables: dict[str, Any]) -> str:
     """
     使用 format_map 渲染占位符，缺失变量置为空，避免 KeyError 中断。
@@ -1647,7 +2242,18 @@ def list_kbs(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    kbs = db.scalars(select(KnowledgeBase).where(KnowledgeBase.workspace_id == workspace_id).order_by(KnowledgeBase.created_at.asc())).all()
+    kbs = db.execute(
+        select(
+            KnowledgeBase.id,
+            KnowledgeBase.name,
+            KnowledgeBase.description,
+            KnowledgeBase.status,
+            KnowledgeBase.created_at,
+            KnowledgeBase.updated_at,
+        )
+        .where(KnowledgeBase.workspace_id == workspace_id)
+        .order_by(KnowledgeBase.created_at.asc())
+    ).all()
 
     kb_ids = [kb.id for kb in kbs]
     pages_map: dict[str, dict[str, Any]] = {}
@@ -1669,8 +2275,8 @@ def list_kbs(
         chunk_rows = db.execute(
             select(
                 Page.kb_id,
-                func.count(Chunk.id),
-                func.sum(case((Chunk.embedding.is_not(None), 1), else_=0)),
+                func.count(),
+                func.count().filter(Chunk.embedding.is_not(None)),
                 func.max(Chunk.created_at),
             )
             .select_from(Chunk)
@@ -1822,54 +2428,18 @@ def kb_stats(
     if not kb or kb.workspace_id != workspace_id:
         raise HTTPException(status_code=404, detail="kb not found")
 
-    pages_total = int(
-        db.scalar(
-            select(func.count())
-            .select_from(Page)
-            .where(Page.workspace_id == workspace_id)
-            .where(Page.kb_id == kb_id)
-        )
-        or 0
-    )
-    chunks_total = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM chunks c
-                JOIN pages p ON p.id = c.page_id
-                WHERE p.workspace_id = :ws
-                  AND p.kb_id = :kb
-                """
-            ),
-            {"ws": workspace_id, "kb": kb_id},
-        ).scalar()
-        or 0
-    )
-    chunks_with_embedding = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM chunks c
-                JOIN pages p ON p.id = c.page_id
-                WHERE p.workspace_id = :ws
-                  AND p.kb_id = :kb
-                  AND c.embedding IS NOT NULL
-                """
-            ),
-            {"ws": workspace_id, "kb": kb_id},
-        ).scalar()
-        or 0
-    )
-    embedding_coverage = (chunks_with_embedding / chunks_total) if chunks_total > 0 else 0.0
-
-    last_crawl = db.scalar(
-        select(func.max(Page.last_crawled_at))
-        .select_from(Page)
+    pages_row = db.execute(
+        select(func.count(), func.max(Page.last_crawled_at))
         .where(Page.workspace_id == workspace_id)
         .where(Page.kb_id == kb_id)
-    )
+    ).one()
+    pages_total = int(pages_row[0] or 0)
+    last_crawl = pages_row[1]
+
+    chunks_row = db.execute(_KB_CHUNK_COUNTS_SQL, {"ws": workspace_id, "kb": kb_id}).one()
+    chunks_total = int(chunks_row[0] or 0)
+    chunks_with_embedding = int(chunks_row[1] or 0)
+    embedding_coverage = (chunks_with_embedding / chunks_total) if chunks_total > 0 else 0.0
 
     return {
         "kb_id": kb_id,
@@ -1925,12 +2495,14 @@ def delete_kb(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    kb = db.get(KnowledgeBase, kb_id)
-    if not kb or kb.workspace_id != workspace_id:
-        raise HTTPException(status_code=404, detail="kb not found")
-
+    # 直接按归属条件删除，rowcount 为 0 即不存在/不属于该 workspace
     # 删除 KB 不会自动清理 pages/chunks（历史兼容）；P1 可补齐级联与批次回滚机制
-    db.delete(kb)
+    deleted = db.execute(
+        delete(KnowledgeBase).where(KnowledgeBase.id == kb_id).where(KnowledgeBase.workspace_id == workspace_id)
+    ).rowcount
+    if not deleted:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="kb not found")
     _add_audit_log(
         db,
         principal,
@@ -1952,8 +2524,16 @@ def list_sources(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    sources = db.scalars(
-        select(DataSource)
+    sources = db.execute(
+        select(
+            DataSource.id,
+            DataSource.type,
+            DataSource.name,
+            DataSource.status,
+            DataSource.config,
+            DataSource.created_at,
+            DataSource.updated_at,
+        )
         .where(DataSource.workspace_id == workspace_id)
         .where(DataSource.kb_id == kb_id)
         .order_by(DataSource.created_at.asc())
@@ -2056,10 +2636,15 @@ def delete_source(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    s = db.get(DataSource, source_id)
-    if not s or s.workspace_id != workspace_id or s.kb_id != kb_id:
+    deleted = db.execute(
+        delete(DataSource)
+        .where(DataSource.id == source_id)
+        .where(DataSource.workspace_id == workspace_id)
+        .where(DataSource.kb_id == kb_id)
+    ).rowcount
+    if not deleted:
+        db.rollback()
         raise HTTPException(status_code=404, detail="source not found")
-    db.delete(s)
     _add_audit_log(
         db,
         principal,
@@ -2149,17 +2734,82 @@ def render_kb_prompt_template(
     }
 
 
+_DATE_ONLY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class JobListFilters(BaseModel):
+    """
+    任务列表的查询参数（Depends 注入为 query string）。
+
+    created_from/created_to 在校验阶段一次解析为 started_at 上下界：
+    created_to 为纯日期（YYYY-MM-DD）时按当天结束做包含，即 +1d 作为开区间上界。
+    """
+
+    type: str | None = None
+    status: str | None = None
+    kb_id: str | None = None
+    app_id: str | None = None
+    source_id: str | None = None
+    q: str | None = None
+    created_from: str | None = None
+    created_to: str | None = None
+
+    _started_from: dt.datetime | None = PrivateAttr(default=None)
+    _started_to: dt.datetime | None = PrivateAttr(default=None)
+    _started_to_exclusive: bool = PrivateAttr(default=False)
+
+    @model_validator(mode="after")
+    def _parse_started_range(self) -> "JobListFilters":
+        self._started_from = _parse_iso_datetime(self.created_from)
+        raw_to = (self.created_to or "").strip()
+        started_to = _parse_iso_datetime(raw_to)
+        if started_to is not None and _DATE_ONLY_RE.match(raw_to):
+            started_to += dt.timedelta(days=1)
+            self._started_to_exclusive = True
+        self._started_to = started_to
+        return self
+
+    def apply(self, stmt):
+        if self.type:
+            stmt = stmt.where(Job.type == self.type)
+        if self.status:
+            stmt = stmt.where(Job.status == self.status)
+        if self.kb_id:
+            stmt = stmt.where(Job.kb_id == self.kb_id)
+        if self.app_id:
+            stmt = stmt.where(Job.app_id == self.app_id)
+        if self.source_id:
+            stmt = stmt.where(Job.source_id == self.source_id)
+        if self._started_from is not None:
+            stmt = stmt.where(Job.started_at >= self._started_from)
+        if self._started_to is not None:
+            if self._started_to_exclusive:
+                stmt = stmt.where(Job.started_at < self._started_to)
+            else:
+                stmt = stmt.where(Job.started_at <= self._started_to)
+        if self.q:
+            like = f"%{self.q.strip()}%"
+            stmt = stmt.where(Job.id.ilike(like) | Job.error.ilike(like))
+        return stmt
+
+    @property
+    def only_workspace(self) -> bool:
+        return not (
+            self.type
+            or self.status
+            or self.kb_id
+            or self.app_id
+            or self.source_id
+            or self.q
+            or self._started_from is not None
+            or self._started_to is not None
+        )
+
+
 @router.get("/workspaces/{workspace_id}/jobs")
 def list_jobs(
     workspace_id: str,
-    type: str | None = None,  # noqa: A002
-    status: str | None = None,
-    kb_id: str | None = None,
-    app_id: str | None = None,
-    source_id: str | None = None,
-    q: str | None = None,
-    created_from: str | None = None,
-    created_to: str | None = None,
+    filters: JobListFilters = Depends(),
     page: int = 1,
     page_size: int = 20,
     principal: AdminPrincipal = Depends(require_admin),
@@ -2168,37 +2818,15 @@ def list_jobs(
     _require_workspace_access(principal, workspace_id)
     p, ps, offset = _parse_pagination(page, page_size)
 
-    stmt = select(Job).where(Job.workspace_id == workspace_id)
-    if type:
-        stmt = stmt.where(Job.type == type)
-    if status:
-        stmt = stmt.where(Job.status == status)
-    if kb_id:
-        stmt = stmt.where(Job.kb_id == kb_id)
-    if app_id:
-        stmt = stmt.where(Job.app_id == app_id)
-    if source_id:
-        stmt = stmt.where(Job.source_id == source_id)
-
-    q_from = _parse_iso_datetime(created_from)
-    if q_from is not None:
-        stmt = stmt.where(Job.started_at >= q_from)
-    q_to = _parse_iso_datetime(created_to)
-    if q_to is not None:
-        # 约定：若传入的是“日期”（YYYY-MM-DD），按当天结束做包含（+1d 作为上界）
-        if (created_to or "").strip() and len((created_to or "").strip()) == 10:
-            q_to = q_to + dt.timedelta(days=1)
-            stmt = stmt.where(Job.started_at < q_to)
-        else:
-            stmt = stmt.where(Job.started_at <= q_to)
-
-    if q:
-        like = f"%{q.strip()}%"
-        stmt = stmt.where(Job.id.ilike(like) | Job.error.ilike(like))
+    stmt = filters.apply(select(Job).where(Job.workspace_id == workspace_id))
 
-    total = int(db.scalar(select(func.count()).select_from(stmt.subquery())) or 0)
-    rows = db.scalars(stmt.order_by(desc(Job.started_at)).offset(offset).limit(ps)).all()
-    subtasks_cache: dict[str, list[dict[str, Any]]] = {}
+    only_workspace = filters.only_workspace
+    approx_total = _approx_workspace_count(db, "jobs", workspace_id) if only_workspace else None
+    rows, total, estimated = _fetch_page_with_total(
+        db, stmt.order_by(desc(Job.started_at)), offset=offset, limit=ps, approx_total=approx_total
+    )
+    # file_process 任务的子任务：当前页所有批次一次 IN 查询取回，按 batch 分组
+    job_batch: dict[str, str] = {}
     for j in rows:
         if j.type == "file_process":
             batch_id = None
@@ -2207,39 +2835,50 @@ def list_jobs(
             except Exception:
                 batch_id = None
             if batch_id:
-                items_rows = db.scalars(select(FileItem).where(FileItem.batch_id == str(batch_id)).order_by(FileItem.created_at.asc())).all()
-                subtasks_cache[j.id] = [
-                    {
-                        "id": it.id,
-                        "filename": it.filename,
-                        "size_bytes": it.size_bytes,
-                        "status": it.status,
-                        "error": it.error or "",
-                    }
-                    for it in items_rows
-                ]
-    return {
-        "page": p,
-        "page_size": ps,
-        "total": total,
-        "items": [
-            {
-                "id": j.id,
-                "type": j.type,
-                "status": j.status,
-                "kb_id": j.kb_id,
-                "app_id": j.app_id,
-                "source_id": j.source_id,
-                "progress": j.progress or {},
-                "logs": (j.progress or {}).get("logs") if isinstance((j.progress or {}).get("logs"), list) else [],
-                "subtasks": subtasks_cache.get(j.id) or [],
-                "error": j.error or "",
-                "started_at": j.started_at.isoformat() if j.started_at else None,
-                "finished_at": j.finished_at.isoformat() if j.finished_at else None,
-            }
-            for j in rows
-        ],
-    }
+                job_batch[j.id] = str(batch_id)
+    items_by_batch: dict[str, list[dict[str, Any]]] = {}
+    if job_batch:
+        for it in db.execute(
+            select(FileItem.batch_id, FileItem.id, FileItem.filename, FileItem.size_bytes, FileItem.status, FileItem.error)
+            .where(FileItem.batch_id.in_(set(job_batch.values())))
+            .order_by(FileItem.created_at.asc())
+        ).all():
+            items_by_batch.setdefault(str(it.batch_id), []).append(
+                {
+                    "id": it.id,
+                    "filename": it.filename,
+                    "size_bytes": it.size_bytes,
+                    "status": it.status,
+                    "error": it.error or "",
+                }
+            )
+    subtasks_cache = {jid: items_by_batch.get(bid) or [] for jid, bid in job_batch.items()}
+    # 行已全部是基础类型：直接 orjson 编码，跳过 jsonable_encoder 的逐层遍历
+    return ORJSONResponse(
+        {
+            "page": p,
+            "page_size": ps,
+            "total": total,
+            "estimated": estimated,
+            "items": [
+                {
+                    "id": j.id,
+                    "type": j.type,
+                    "status": j.status,
+                    "kb_id": j.kb_id,
+                    "app_id": j.app_id,
+                    "source_id": j.source_id,
+                    "progress": j.progress or {},
+                    "logs": (j.progress or {}).get("logs") if isinstance((j.progress or {}).get("logs"), list) else [],
+                    "subtasks": subtasks_cache.get(j.id) or [],
+                    "error": j.error or "",
+                    "started_at": j.started_at.isoformat() if j.started_at else None,
+                    "finished_at": j.finished_at.isoformat() if j.finished_at else None,
+                }
+                for j in rows
+            ],
+        }
+    )
 
 
 @router.get("/workspaces/{workspace_id}/jobs/{job_id}")
@@ -2250,9 +2889,16 @@ def get_job(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    job = db.get(Job, job_id)
-    if not job or job.workspace_id != workspace_id:
+    # payload 只做透传：以文本取出原样嵌入响应；progress 需要读取 logs/batch_id，仍按 dict 加载
+    row = db.execute(
+        select(Job, cast(Job.payload, Text))
+        .where(Job.id == job_id)
+        .where(Job.workspace_id == workspace_id)
+        .options(defer(Job.payload))
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="job not found")
+    job, payload_json = row
     progress = dict(job.progress or {})
     subtasks: list[dict[str, Any]] = []
     logs = progress.get("logs") if isinstance(progress.get("logs"), list) else []
@@ -2268,22 +2914,24 @@ def get_job(
                     "error": it.error or "",
                 }
             )
-    return {
-        "id": job.id,
-        "type": job.type,
-        "status": job.status,
-        "workspace_id": job.workspace_id,
-        "kb_id": job.kb_id,
-        "app_id": job.app_id,
-        "source_id": job.source_id,
-        "payload": job.payload or {},
-        "progress": progress,
-        "error": job.error or "",
-        "logs": logs,
-        "subtasks": subtasks,
-        "started_at": job.started_at.isoformat() if job.started_at else None,
-        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
-    }
+    return ORJSONResponse(
+        {
+            "id": job.id,
+            "type": job.type,
+            "status": job.status,
+            "workspace_id": job.workspace_id,
+            "kb_id": job.kb_id,
+            "app_id": job.app_id,
+            "source_id": job.source_id,
+            "payload": _json_fragment(payload_json, default=b"{}"),
+            "progress": progress,
+            "error": job.error or "",
+            "logs": logs,
+            "subtasks": subtasks,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+    )
 
 
 @router.post("/workspaces/{workspace_id}/jobs/{job_id}/requeue")
@@ -2294,14 +2942,17 @@ def requeue_job(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    job = db.get(Job, job_id)
-    if not job or job.workspace_id != workspace_id:
+    # 单条 UPDATE ... RETURNING 完成归属校验与状态重置
+    job_type = db.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .where(Job.workspace_id == workspace_id)
+        .values(status="queued", error="", progress={}, started_at=_utcnow(), finished_at=None)
+        .returning(Job.type)
+    ).scalar()
+    if job_type is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="job not found")
-    job.status = "queued"
-    job.error = ""
-    job.progress = {}
-    job.started_at = _utcnow()
-    job.finished_at = None
     _add_audit_log(
         db,
         principal,
@@ -2309,7 +2960,7 @@ def requeue_job(
         action="job.requeue",
         object_type="job",
         object_id=job_id,
-        meta={"type": job.type, "status": job.status},
+        meta={"type": job_type, "status": "queued"},
     )
     db.commit()
     return {"ok": True}
@@ -2323,13 +2974,21 @@ def cancel_job(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    job = db.get(Job, job_id)
-    if not job or job.workspace_id != workspace_id:
-        raise HTTPException(status_code=404, detail="job not found")
-    if job.status != "queued":
+    # 条件 UPDATE：只有 queued 才会命中，与 worker 抢占任务的竞争在数据库层原子化
+    job_type = db.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .where(Job.workspace_id == workspace_id)
+        .where(Job.status == "queued")
+        .values(status="cancelled", finished_at=_utcnow())
+        .returning(Job.type)
+    ).scalar()
+    if job_type is None:
+        db.rollback()
+        exists = db.scalar(select(Job.id).where(Job.id == job_id).where(Job.workspace_id == workspace_id))
+        if exists is None:
+            raise HTTPException(status_code=404, detail="job not found")
         raise HTTPException(status_code=400, detail="仅支持取消 queued 状态任务（running 暂不支持中断）")
-    job.status = "cancelled"
-    job.finished_at = _utcnow()
     _add_audit_log(
         db,
         principal,
@@ -2337,7 +2996,7 @@ def cancel_job(
         action="job.cancel",
         object_type="job",
         object_id=job_id,
-        meta={"type": job.type, "status": job.status},
+        meta={"type": job_type, "status": "cancelled"},
     )
     db.commit()
     return {"ok": True}
@@ -2419,7 +3078,7 @@ def get_kb_file_batch(
     db: Session = Depends(get_db),
 ) -> FileBatchResponse:
     _require_workspace_access(principal, workspace_id)
-    _ensure_kb_or_404(db, workspace_id, kb_id)
+    _ensure_kb_exists(db, workspace_id, kb_id)
     batch = db.get(FileBatch, batch_id)
     if not batch or batch.workspace_id != workspace_id or batch.kb_id != kb_id:
         raise HTTPException(status_code=404, detail="file batch not found")
@@ -2476,7 +3135,7 @@ def list_kb_file_batches(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    _ensure_kb_or_404(db, workspace_id, kb_id)
+    _ensure_kb_exists(db, workspace_id, kb_id)
     batches = (
         db.scalars(
             select(FileBatch)
@@ -2486,18 +3145,23 @@ def list_kb_file_batches(
         )
         .all()
     )
+    # 各批次的 total/done/failed 一次 GROUP BY + FILTER 取回，替代每批 3 次 count
+    counts: dict[str, tuple[int, int, int]] = {}
+    if batches:
+        count_rows = db.execute(
+            select(
+                FileItem.batch_id,
+                func.count(),
+                func.count().filter(FileItem.status == "completed"),
+                func.count().filter(FileItem.status == "failed"),
+            )
+            .where(FileItem.batch_id.in_([b.id for b in batches]))
+            .group_by(FileItem.batch_id)
+        ).all()
+        counts = {str(bid): (int(t or 0), int(d or 0), int(f or 0)) for bid, t, d, f in count_rows}
     items = []
     for b in batches:
-        total = int(db.scalar(select(func.count()).select_from(FileItem).where(FileItem.batch_id == b.id)) or 0)
-        done = int(
-            db.scalar(
-                select(func.count()).select_from(FileItem).where(FileItem.batch_id == b.id).where(FileItem.status == "completed")
-            )
-            or 0
-        )
-        failed = int(
-            db.scalar(select(func.count()).select_from(FileItem).where(FileItem.batch_id == b.id).where(FileItem.status == "failed")) or 0
-        )
+        total, done, failed = counts.get(b.id, (0, 0, 0))
         items.append(
             {
                 "id": b.id,
@@ -2526,7 +3190,7 @@ def process_kb_file_batch(
     """
 
     _require_workspace_access(principal, workspace_id)
-    _ensure_kb_or_404(db, workspace_id, kb_id)
+    _ensure_kb_exists(db, workspace_id, kb_id)
     batch = db.get(FileBatch, batch_id)
     if not batch or batch.workspace_id != workspace_id or batch.kb_id != kb_id:
         raise HTTPException(status_code=404, detail="file batch not found")
@@ -2659,6 +3323,23 @@ def trigger_index_job(
     return {"job_id": job_id}
 
 
+# 列表只序列化这些列：不加载 content_markdown/meta 等大字段，且禁止意外触发 chunks 懒加载
+_PAGE_LIST_LOAD_OPTIONS = (
+    load_only(
+        Page.id,
+        Page.kb_id,
+        Page.source_id,
+        Page.url,
+        Page.title,
+        Page.http_status,
+        Page.last_crawled_at,
+        Page.content_hash,
+        Page.indexed_content_hash,
+    ),
+    raiseload("*"),
+)
+
+
 @router.get("/workspaces/{workspace_id}/pages")
 def list_pages(
     workspace_id: str,
@@ -2707,27 +3388,38 @@ def list_pages(
         dr_from, dr_to = _parse_date_range(date_range)
         stmt = stmt.where(Page.last_crawled_at >= dr_from).where(Page.last_crawled_at <= dr_to)
 
-    total = int(db.scalar(select(func.count()).select_from(stmt.subquery())) or 0)
-    rows = db.scalars(stmt.order_by(desc(Page.last_crawled_at)).offset(offset).limit(ps)).all()
-    return {
-        "page": p,
-        "page_size": ps,
-        "total": total,
-        "items": [
-            {
-                "id": r.id,
-                "kb_id": r.kb_id,
-                "source_id": r.source_id,
-                "url": r.url,
-                "title": r.title,
-                "http_status": r.http_status,
-                "last_crawled_at": r.last_crawled_at.isoformat() if r.last_crawled_at else None,
-                "indexed": bool(r.indexed_content_hash),
-                "changed": bool(r.content_hash and r.content_hash != (r.indexed_content_hash or "")),
-            }
-            for r in rows
-        ],
-    }
+    only_workspace = not (kb_id or source_id or http_status or changed is True or indexed is not None or q or date_range)
+    approx_total = _approx_workspace_count(db, "pages", workspace_id) if only_workspace else None
+    rows, total, estimated = _fetch_page_with_total(
+        db,
+        stmt.order_by(desc(Page.last_crawled_at)),
+        offset=offset,
+        limit=ps,
+        approx_total=approx_total,
+        options=_PAGE_LIST_LOAD_OPTIONS,
+    )
+    return ORJSONResponse(
+        {
+            "page": p,
+            "page_size": ps,
+            "total": total,
+            "estimated": estimated,
+            "items": [
+                {
+                    "id": r.id,
+                    "kb_id": r.kb_id,
+                    "source_id": r.source_id,
+                    "url": r.url,
+                    "title": r.title,
+                    "http_status": r.http_status,
+                    "last_crawled_at": r.last_crawled_at.isoformat() if r.last_crawled_at else None,
+                    "indexed": bool(r.indexed_content_hash),
+                    "changed": bool(r.content_hash and r.content_hash != (r.indexed_content_hash or "")),
+                }
+                for r in rows
+            ],
+        }
+    )
 
 
 @router.get("/workspaces/{workspace_id}/pages/{page_id}")
@@ -2742,20 +3434,25 @@ def get_page(
     if not page or page.workspace_id != workspace_id:
         raise HTTPException(status_code=404, detail="page not found")
 
-    chunk_total = int(db.scalar(select(func.count()).select_from(Chunk).where(Chunk.page_id == page.id)) or 0)
-    chunk_with_embedding = int(
-        db.scalar(
-            select(func.count()).select_from(Chunk).where(Chunk.page_id == page.id).where(Chunk.embedding.is_not(None))
-        )
-        or 0
-    )
-    model_rows = db.execute(
-        select(Chunk.embedding_model, func.count())
-        .where(Chunk.page_id == page.id)
-        .group_by(Chunk.embedding_model)
-        .order_by(desc(func.count()))
-    ).all()
-    embedding_models = {str(m or ""): int(c or 0) for m, c in model_rows if str(m or "").strip()}
+    stats = page.chunk_stats
+    if isinstance(stats, dict) and "total" in stats:
+        chunk_total = int(stats.get("total") or 0)
+        chunk_with_embedding = int(stats.get("with_embedding") or 0)
+        embedding_models = {str(m): int(c or 0) for m, c in (stats.get("embedding_models") or {}).items()}
+    else:
+        # 历史页面（索引时尚未写入 chunk_stats）：实时聚合
+        chunk_row = db.execute(
+            select(func.count(), func.count().filter(Chunk.embedding.is_not(None))).where(Chunk.page_id == page.id)
+        ).one()
+        chunk_total = int(chunk_row[0] or 0)
+        chunk_with_embedding = int(chunk_row[1] or 0)
+        model_rows = db.execute(
+            select(Chunk.embedding_model, func.count())
+            .where(Chunk.page_id == page.id)
+            .group_by(Chunk.embedding_model)
+            .order_by(desc(func.count()))
+        ).all()
+        embedding_models = {str(m or ""): int(c or 0) for m, c in model_rows if str(m or "").strip()}
 
     return {
         "id": page.id,
@@ -2785,8 +3482,12 @@ def recrawl_page(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    page = db.get(Page, int(page_id))
-    if not page or page.workspace_id != workspace_id:
+    page = db.execute(
+        select(Page.id, Page.kb_id, Page.source_id, Page.url)
+        .where(Page.id == int(page_id))
+        .where(Page.workspace_id == workspace_id)
+    ).first()
+    if page is None:
         raise HTTPException(status_code=404, detail="page not found")
 
     jobs_backend = (settings.jobs_backend or "worker").lower()
@@ -2835,18 +3536,24 @@ def delete_page(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    page = db.get(Page, int(page_id))
-    if not page or page.workspace_id != workspace_id:
+    # Core DELETE ... RETURNING：chunks 由外键 ON DELETE CASCADE 清理，不必先把整页 chunks（含向量）加载进 ORM
+    row = db.execute(
+        delete(Page)
+        .where(Page.id == int(page_id))
+        .where(Page.workspace_id == workspace_id)
+        .returning(Page.id, Page.kb_id, Page.source_id, Page.url)
+    ).first()
+    if row is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="page not found")
-    db.delete(page)
     _add_audit_log(
         db,
         principal,
         workspace_id=workspace_id,
         action="page.delete",
         object_type="page",
-        object_id=str(page.id),
-        meta={"kb_id": page.kb_id, "source_id": page.source_id, "url": page.url},
+        object_id=str(row.id),
+        meta={"kb_id": row.kb_id, "source_id": row.source_id, "url": row.url},
     )
     db.commit()
     return {"ok": True}
@@ -2861,13 +3568,34 @@ def list_feedback(
     date_range: str | None = None,
     page: int = 1,
     page_size: int = 20,
+    skip_total: bool = False,
+    cursor: str | None = None,
     principal: AdminPrincipal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
+    """
+    反馈列表：skip_total=true 时不计算 total（返回 null）；传 cursor（上一页的 next_cursor）时按 (created_at, id) keyset 翻页，忽略 page。
+    """
+
     _require_workspace_access(principal, workspace_id)
     p, ps, offset = _parse_pagination(page, page_size)
 
-    stmt = select(Feedback).where(Feedback.workspace_id == workspace_id)
+    # 列元组查询：跳过 ORM 实例构建；JSON 列取原文直接嵌入响应
+    stmt = select(
+        Feedback.id,
+        Feedback.app_id,
+        Feedback.conversation_id,
+        Feedback.message_id,
+        Feedback.rating,
+        Feedback.reason,
+        Feedback.comment,
+        cast(Feedback.sources, Text).label("sources"),
+        Feedback.status,
+        Feedback.attribution,
+        cast(Feedback.tags, Text).label("tags"),
+        Feedback.created_at,
+        Feedback.updated_at,
+    ).where(Feedback.workspace_id == workspace_id)
     if app_id:
         stmt = stmt.where(Feedback.app_id == app_id)
     if rating:
@@ -2878,31 +3606,38 @@ def list_feedback(
     dr_from, dr_to = _parse_date_range(date_range)
     stmt = stmt.where(Feedback.created_at >= dr_from).where(Feedback.created_at <= dr_to)
 
-    total = int(db.scalar(select(func.count()).select_from(stmt.subquery())) or 0)
-    rows = db.scalars(stmt.order_by(desc(Feedback.created_at)).offset(offset).limit(ps)).all()
-    return {
-        "page": p,
-        "page_size": ps,
-        "total": total,
-        "items": [
-            {
-                "id": f.id,
-                "app_id": f.app_id,
-                "conversation_id": f.conversation_id,
-                "message_id": f.message_id,
-                "rating": f.rating,
-                "reason": f.reason,
-                "comment": f.comment,
-                "sources": f.sources or {},
-                "status": getattr(f, "status", "new") or "new",
-                "attribution": getattr(f, "attribution", "") or "",
-                "tags": getattr(f, "tags", []) or [],
-                "created_at": f.created_at.isoformat() if f.created_at else None,
-                "updated_at": f.updated_at.isoformat() if getattr(f, "updated_at", None) else None,
-            }
-            for f in rows
-        ],
-    }
+    total = None if skip_total else _count_stmt(db, stmt)
+    if cursor:
+        stmt = stmt.where(tuple_(Feedback.created_at, Feedback.id) < tuple_(*_decode_cursor(cursor)))
+        offset = 0
+    rows = db.execute(stmt.order_by(desc(Feedback.created_at), desc(Feedback.id)).offset(offset).limit(ps)).all()
+    # datetime 交给 orjson 直接输出 ISO-8601；直接返回 ORJSONResponse 跳过 jsonable_encoder
+    return ORJSONResponse(
+        {
+            "page": p,
+            "page_size": ps,
+            "total": total,
+            "next_cursor": _encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == ps else None,
+            "items": [
+                {
+                    "id": f.id,
+                    "app_id": f.app_id,
+                    "conversation_id": f.conversation_id,
+                    "message_id": f.message_id,
+                    "rating": f.rating,
+                    "reason": f.reason,
+                    "comment": f.comment,
+                    "sources": _json_fragment(f.sources, default=b"{}"),
+                    "status": f.status or "new",
+                    "attribution": f.attribution or "",
+                    "tags": _json_fragment(f.tags, default=b"[]"),
+                    "created_at": f.created_at,
+                    "updated_at": f.updated_at,
+                }
+                for f in rows
+            ],
+        }
+    )
 
 
 @router.patch("/workspaces/{workspace_id}/feedback/{feedback_id}")
@@ -2983,17 +3718,34 @@ def list_retrieval_events(
     date_range: str | None = None,
     page: int = 1,
     page_size: int = 20,
+    skip_total: bool = False,
+    cursor: str | None = None,
     principal: AdminPrincipal = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
+    """
+    检索事件列表：skip_total / cursor 语义同 list_feedback。
+    """
+
     _require_workspace_access(principal, workspace_id)
     p, ps, offset = _parse_pagination(page, page_size)
 
-    stmt = select(RetrievalEvent).where(RetrievalEvent.workspace_id == workspace_id)
+    stmt = select(
+        RetrievalEvent.id,
+        RetrievalEvent.app_id,
+        cast(RetrievalEvent.kb_ids, Text).label("kb_ids"),
+        RetrievalEvent.request_id,
+        RetrievalEvent.conversation_id,
+        RetrievalEvent.message_id,
+        cast(RetrievalEvent.timings_ms, Text).label("timings_ms"),
+        RetrievalEvent.created_at,
+        RetrievalEvent.error,
+    ).where(RetrievalEvent.workspace_id == workspace_id)
     if app_id:
         stmt = stmt.where(RetrievalEvent.app_id == app_id)
     if kb_id:
-        stmt = stmt.where(text("kb_ids::jsonb ? :kb")).params(kb=kb_id)
+        # @> 包含查询可走 idx_retrieval_events_kb_ids_gin（jsonb_path_ops 不支持 ? 运算符）
+        stmt = stmt.where(text("kb_ids::jsonb @> CAST(:kb AS jsonb)")).params(kb=orjson.dumps([kb_id]).decode())
     if conversation_id:
         stmt = stmt.where(RetrievalEvent.conversation_id == conversation_id)
     if message_id:
@@ -3025,32 +3777,40 @@ def list_retrieval_events(
     dr_from, dr_to = _parse_date_range(date_range)
     stmt = stmt.where(RetrievalEvent.created_at >= dr_from).where(RetrievalEvent.created_at <= dr_to)
 
-    total = int(db.scalar(select(func.count()).select_from(stmt.subquery())) or 0)
-    rows = db.scalars(stmt.order_by(desc(RetrievalEvent.created_at)).offset(offset).limit(ps)).all()
-    return {
-        "page": p,
-        "page_size": ps,
-        "total": total,
-        "items": [
-            {
-                "id": e.id,
-                "app_id": e.app_id,
-                "kb_ids": e.kb_ids,
-                "request_id": e.request_id,
-                "conversation_id": e.conversation_id,
-                "message_id": e.message_id,
-                "timings_ms": e.timings_ms,
-                "created_at": e.created_at.isoformat() if e.created_at else None,
-                "has_error": bool(e.error),
-                "error_code": (
-                    "ok"
-                    if not (e.error or "").strip()
-                    else (str(e.error).split(":", 1)[0].strip() if ":" in str(e.error) else str(e.error).strip())
-                ),
-            }
-            for e in rows
-        ],
-    }
+    total = None if skip_total else _count_stmt(db, stmt)
+    if cursor:
+        stmt = stmt.where(tuple_(RetrievalEvent.created_at, RetrievalEvent.id) < tuple_(*_decode_cursor(cursor)))
+        offset = 0
+    rows = db.execute(
+        stmt.order_by(desc(RetrievalEvent.created_at), desc(RetrievalEvent.id)).offset(offset).limit(ps)
+    ).all()
+    return ORJSONResponse(
+        {
+            "page": p,
+            "page_size": ps,
+            "total": total,
+            "next_cursor": _encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == ps else None,
+            "items": [
+                {
+                    "id": e.id,
+                    "app_id": e.app_id,
+                    "kb_ids": _json_fragment(e.kb_ids, default=b"[]"),
+                    "request_id": e.request_id,
+                    "conversation_id": e.conversation_id,
+                    "message_id": e.message_id,
+                    "timings_ms": _json_fragment(e.timings_ms, default=b"{}"),
+                    "created_at": e.created_at,
+                    "has_error": bool(e.error),
+                    "error_code": (
+                        "ok"
+                        if not (e.error or "").strip()
+                        else (str(e.error).split(":", 1)[0].strip() if ":" in str(e.error) else str(e.error).strip())
+                    ),
+                }
+                for e in rows
+            ],
+        }
+    )
 
 
 @router.get("/workspaces/{workspace_id}/retrieval-events/{event_id}")
@@ -3061,32 +3821,501 @@ def get_retrieval_event(
     db: Session = Depends(get_db),
 ):
     _require_workspace_access(principal, workspace_id)
-    e = db.get(RetrievalEvent, int(event_id))
-    if not e or e.workspace_id != workspace_id:
+    # JSON 列均为透传：以文本取出，直接嵌入响应，不在 Python 侧解析再序列化
+    e = db.execute(
+        select(
+            RetrievalEvent.id,
+            RetrievalEvent.app_id,
+            cast(RetrievalEvent.kb_ids, Text).label("kb_ids"),
+            RetrievalEvent.request_id,
+            RetrievalEvent.conversation_id,
+            RetrievalEvent.message_id,
+            RetrievalEvent.question_sha256,
+            RetrievalEvent.question_len,
+            RetrievalEvent.retrieval_query_sha256,
+            RetrievalEvent.retrieval_query_len,
+            cast(RetrievalEvent.timings_ms, Text).label("timings_ms"),
+            cast(RetrievalEvent.retrieval, Text).label("retrieval"),
+            cast(RetrievalEvent.sources, Text).label("sources"),
+            cast(RetrievalEvent.token_usage, Text).label("token_usage"),
+            RetrievalEvent.error,
+            RetrievalEvent.created_at,
+        )
+        .where(RetrievalEvent.id == int(event_id))
+        .where(RetrievalEvent.workspace_id == workspace_id)
+    ).first()
+    if e is None:
         raise HTTPException(status_code=404, detail="event not found")
-    return {
-        "id": e.id,
-        "app_id": e.app_id,
-        "kb_ids": e.kb_ids,
-        "request_id": e.request_id,
-        "conversation_id": e.conversation_id,
-        "message_id": e.message_id,
-        "question_sha256": e.question_sha256,
-        "question_len": e.question_len,
-        "retrieval_query_sha256": e.retrieval_query_sha256,
-        "retrieval_query_len": e.retrieval_query_len,
-        "timings_ms": e.timings_ms,
-        "retrieval": e.retrieval,
-        "sources": e.sources,
-        "token_usage": e.token_usage,
-        "error": e.error,
-        "created_at": e.created_at.isoformat() if e.created_at else None,
-    }
+    return ORJSONResponse(
+        {
+            "id": e.id,
+            "app_id": e.app_id,
+            "kb_ids": _json_fragment(e.kb_ids),
+            "request_id": e.request_id,
+            "conversation_id": e.conversation_id,
+            "message_id": e.message_id,
+            "question_sha256": e.question_sha256,
+            "question_len": e.question_len,
+            "retrieval_query_sha256": e.retrieval_query_sha256,
+            "retrieval_query_len": e.retrieval_query_len,
+            "timings_ms": _json_fragment(e.timings_ms),
+            "retrieval": _json_fragment(e.retrieval),
+            "sources": _json_fragment(e.sources),
+            "token_usage": _json_fragment(e.token_usage),
+            "error": e.error,
+            "created_at": e.created_at.isoformat() if e.created_at else None,
+        }
+    )
+
+
+# rerank 效果（抽样最新 500 条）：top_scores（可能为 rerank 后）与 top_scores_pre_rerank（召回原始分）按位置配对求差，
+# 只统计两侧都是数字的位置；整个计算在 SQL 内完成，分数数组不再传回 Python 逐元素循环。
+# 抽样谓词与部分索引 idx_retrieval_events_ws_rerank 的 WHERE 保持一致，才能按 id 倒序走索引
+_RERANK_EFFECT_SQL = text(
+    """
+    WITH ev AS (
+      SELECT
+        retrieval->'top_scores_pre_rerank' AS pre,
+        retrieval->'top_scores' AS post
+      FROM retrieval_events
+      WHERE workspace_id = :ws
+        AND created_at >= :start
+        AND created_at < :end
+        AND (retrieval->>'rerank_used') = 'true'
+      ORDER BY id DESC
+      LIMIT 500
+    )
+    SELECT
+      (SELECT COUNT(*) FROM ev) AS sample_events,
+      COUNT(d.delta) AS sample_pairs,
+      AVG(d.delta) AS avg_delta
+    FROM ev
+    CROSS JOIN LATERAL (
+      SELECT (b.v #>> '{}')::double precision - (a.v #>> '{}')::double precision AS delta
+      FROM json_array_elements(CASE WHEN json_typeof(ev.pre) = 'array' THEN ev.pre ELSE '[]'::json END)
+        WITH ORDINALITY AS a(v, i)
+      JOIN json_array_elements(CASE WHEN json_typeof(ev.post) = 'array' THEN ev.post ELSE '[]'::json END)
+        WITH ORDINALITY AS b(v, i) ON b.i = a.i
+      WHERE json_typeof(a.v) = 'number' AND json_typeof(b.v) = 'number'
+    ) AS d
+    """
+)
+
+# 看板聚合并发执行的线程池：上限控制同时占用的连接数（每个任务一个独立 Session）
+_OBS_QUERY_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="obs-query")
+atexit.register(_OBS_QUERY_POOL.shutdown, wait=False)
+
+
+def _run_concurrently(session_factory: Any, tasks: dict[str, Any]) -> dict[str, Any]:
+    """
+    并发执行互不依赖的只读查询：每个任务 fn(session) 在线程池中用独立 Session 运行，返回 {name: 结果}。
+    结果须在任务内取完（.all()/.first()），Session 随任务结束关闭。
+    """
+
+    def _run(fn: Any) -> Any:
+        with session_factory() as s:
+            return fn(s)
+
+    futures = {name: _OBS_QUERY_POOL.submit(_run, fn) for name, fn in tasks.items()}
+    return {name: f.result() for name, f in futures.items()}
+
+
+def _pg_has_tdigest(db: Session) -> bool:
+    """
+    数据库是否装了 tdigest 扩展（由 ensure_indexes 尝试创建；变化很少，进程内缓存 300s）。
+    """
+
+    return _ttl_cached(
+        "pg_ext_tdigest",
+        lambda: db.scalar(text("SELECT 1 FROM pg_extension WHERE extname = 'tdigest'")) is not None,
+        ttl_s=300.0,
+    )
+
+
+def _hist_percentile(counts: dict[int, int], q: float) -> float | None:
+    """
+    由对数桶直方图估算分位数：取累计计数首次达到 q 的桶，返回该桶的几何中点。
+    """
+
+    total = sum(counts.values())
+    if total <= 0:
+        return None
+    rank = q * total
+    acc = 0
+    for b in sorted(counts):
+        acc += counts[b]
+        if acc >= rank:
+            return max(ROLLUP_LATENCY_LOG_BASE ** (b + 0.5) - 1.0, 0.0)
+    return None
+
+
+_ROLLUP_WINDOW = "workspace_id = :ws AND bucket_hour >= :start AND bucket_hour < :end"
+
+_ROLLUP_OVERALL_SQL = text(
+    f"""
+    SELECT
+      COALESCE(SUM(requests), 0)::bigint AS requests,
+      COALESCE(SUM(errors), 0)::bigint AS errors,
+      COALESCE(SUM(hits), 0)::bigint AS hits,
+      SUM(prepare_sum) / NULLIF(SUM(prepare_nz_n), 0) AS avg_prepare_ms,
+      SUM(embed_sum) / NULLIF(SUM(embed_n), 0) AS avg_embed_ms,
+      SUM(retrieve_sum) / NULLIF(SUM(retrieve_n), 0) AS avg_retrieve_ms,
+      SUM(rerank_sum) / NULLIF(SUM(rerank_n), 0) AS avg_rerank_ms,
+      SUM(context_sum) / NULLIF(SUM(context_n), 0) AS avg_context_ms,
+      SUM(chat_sum) / NULLIF(SUM(chat_n), 0) AS avg_chat_ms,
+      SUM(total_sum) / NULLIF(SUM(total_n), 0) AS avg_total_ms,
+      SUM(retrieved_sum) / NULLIF(SUM(requests), 0) AS avg_retrieved,
+      SUM(topn_sum)::double precision / NULLIF(SUM(requests), 0) AS avg_topn,
+      COALESCE(SUM(prompt_tokens), 0)::bigint AS prompt_tokens,
+      COALESCE(SUM(completion_tokens), 0)::bigint AS completion_tokens,
+      COALESCE(SUM(total_tokens), 0)::bigint AS total_tokens
+    FROM retrieval_events_rollup_1h
+    WHERE {_ROLLUP_WINDOW}
+    """
+)
+
+_ROLLUP_BY_APP_SQL = text(
+    f"""
+    SELECT
+      app_id,
+      SUM(requests)::bigint AS requests,
+      SUM(errors)::bigint AS errors,
+      SUM(hits)::bigint AS hits,
+      SUM(prepare_sum) / NULLIF(SUM(prepare_n), 0) AS avg_prepare_ms,
+      SUM(retrieve_sum) / NULLIF(SUM(retrieve_n), 0) AS avg_retrieve_ms,
+      SUM(retrieved_sum) / NULLIF(SUM(requests), 0) AS avg_retrieved,
+      SUM(total_tokens)::bigint AS total_tokens
+    FROM retrieval_events_rollup_1h
+    WHERE {_ROLLUP_WINDOW}
+    GROUP BY app_id
+    ORDER BY requests DESC
+    LIMIT 200
+    """
+)
+
+_ROLLUP_BY_APP_KB_SQL = text(
+    f"""
+    SELECT
+      r.app_id,
+      k.kb_id,
+      SUM(r.requests)::bigint AS requests,
+      SUM(r.errors)::bigint AS errors,
+      SUM(r.hits)::bigint AS hits,
+      SUM(r.prepare_sum) / NULLIF(SUM(r.prepare_n), 0) AS avg_prepare_ms,
+      SUM(r.retrieve_sum) / NULLIF(SUM(r.retrieve_n), 0) AS avg_retrieve_ms,
+      SUM(r.retrieved_sum) / NULLIF(SUM(r.requests), 0) AS avg_retrieved,
+      SUM(r.total_tokens)::bigint AS total_tokens
+    FROM retrieval_events_rollup_1h r
+    CROSS JOIN LATERAL unnest(
+      CASE WHEN cardinality(r.kb_ids) > 0 THEN r.kb_ids ELSE ARRAY['(none)'] END
+    ) AS k(kb_id)
+    WHERE r.{_ROLLUP_WINDOW.replace(" AND ", " AND r.")}
+    GROUP BY r.app_id, k.kb_id
+    ORDER BY requests DESC
+    LIMIT 500
+    """
+)
+
+_ROLLUP_TOKENS_BY_MODEL_SQL = text(
+    f"""
+    SELECT
+      t.*,
+      t.prompt_tokens * pr.pp + t.completion_tokens * pr.cp AS cost_usd_estimate
+    FROM (
+      SELECT
+        model,
+        SUM(requests)::bigint AS requests,
+        SUM(prompt_tokens)::bigint AS prompt_tokens,
+        SUM(completion_tokens)::bigint AS completion_tokens,
+        SUM(total_tokens)::bigint AS total_tokens
+      FROM retrieval_events_rollup_1h
+      WHERE {_ROLLUP_WINDOW}
+      GROUP BY model
+      ORDER BY total_tokens DESC
+      LIMIT 50
+    ) AS t{_PRICING_JOIN_TMPL.format(model_expr="t.model")}
+    ORDER BY t.total_tokens DESC
+    """
+)
+
+_ROLLUP_HIST_SQL = text(
+    f"""
+    SELECT dim, app_id, bucket, SUM(cnt)::bigint AS cnt
+    FROM retrieval_events_hist_1h
+    WHERE {_ROLLUP_WINDOW}
+    GROUP BY dim, app_id, bucket
+    """
+)
+
+
+def _read_observability_rollup(
+    db: Session,
+    workspace_id: str,
+    start: dt.datetime,
+    end: dt.datetime,
+    pricing_params: dict[str, list[Any]],
+) -> tuple | None:
+    """
+    从小时级汇总表（retrieval_events_rollup_1h / retrieval_events_hist_1h）读取可观测聚合，
+    结构与逐行聚合一致：(overall, by_app, by_app_kb, errors, topk, tokens_by_model_rows)。
+    汇总表不存在等异常时回滚并返回 None。
+    """
+
+    params = {"ws": workspace_id, "start": start, "end": end}
+    try:
+        overall = dict(db.execute(_ROLLUP_OVERALL_SQL, params).mappings().first() or {})
+        by_app = [dict(r) for r in db.execute(_ROLLUP_BY_APP_SQL, params).mappings().all()]
+        by_app_kb = db.execute(_ROLLUP_BY_APP_KB_SQL, params).mappings().all()
+        tokens_by_model_rows = db.execute(_ROLLUP_TOKENS_BY_MODEL_SQL, {**params, **pricing_params}).mappings().all()
+        hist_rows = db.execute(_ROLLUP_HIST_SQL, params).all()
+    except Exception:
+        db.rollback()
+        return None
+
+    error_counts: dict[str, int] = {}
+    topk_counts: dict[int, int] = {}
+    prepare_all: dict[int, int] = {}
+    prepare_by_app: dict[str, dict[int, int]] = {}
+    for dim, app_id, bucket, cnt in hist_rows:
+        cnt = int(cnt or 0)
+        if dim == "error":
+            error_counts[bucket] = error_counts.get(bucket, 0) + cnt
+        elif dim == "retrieved":
+            topk_counts[int(bucket)] = topk_counts.get(int(bucket), 0) + cnt
+        elif dim == "prepare_ms":
+            b = int(bucket)
+            prepare_all[b] = prepare_all.get(b, 0) + cnt
+            per_app = prepare_by_app.setdefault(str(app_id), {})
+            per_app[b] = per_app.get(b, 0) + cnt
+
+    overall["p50_prepare_ms"] = _hist_percentile(prepare_all, 0.5)
+    overall["p95_prepare_ms"] = _hist_percentile(prepare_all, 0.95)
+    for r in by_app:
+        r["p95_prepare_ms"] = _hist_percentile(prepare_by_app.get(str(r["app_id"]), {}), 0.95)
+    errors = [
+        {"code": code, "cnt": cnt}
+        for code, cnt in sorted(error_counts.items(), key=lambda kv: kv[1], reverse=True)[:50]
+    ]
+    topk = [{"retrieved": k, "cnt": topk_counts[k]} for k in sorted(topk_counts)[:30]]
+    return overall, by_app, by_app_kb, errors, topk, tokens_by_model_rows
+
+
+# ========== observability_summary 逐行聚合 SQL（模块加载时构建一次，请求内不再拼接/解析 SQL 文本）==========
+# 热点 JSON 标量读生成列（prepare_ms/retrieve_ms/retrieved_n/total_tokens_n/has_items/has_error，见 ensure_admin_schema），
+# 聚合时少做逐行 deTOAST + 解析 JSON
+
+# 延迟分位数：装了 tdigest 扩展时用流式 sketch（无需排序）；否则 percentile_cont 一次排序同时出 p50/p95
+_OBS_PCT_PAIR_EXPRS = {
+    True: "tdigest_percentile(prepare_ms, 100, ARRAY[0.5, 0.95])",
+    False: "percentile_cont(ARRAY[0.5, 0.95]) WITHIN GROUP (ORDER BY prepare_ms)",
+}
+
+# overall / 按 app / 按上游模型 / 错误码 / topK 分布：一次扫描时间窗口，GROUPING SETS 同时出 5 组聚合
+# gid = GROUPING(app_id, model, code, retrieved)：未参与分组的列对应位为 1
+_OBS_GID_OVERALL = 0b1111
+_OBS_GID_APP = 0b0111
+_OBS_GID_MODEL = 0b1011
+_OBS_GID_CODE = 0b1101
+_OBS_GID_RETRIEVED = 0b1110
+# 单条大聚合允许的并行 worker 数（SET LOCAL，只作用于该查询所在事务）
+_OBS_PARALLEL_WORKERS_SQL = text("SET LOCAL max_parallel_workers_per_gather = 4")
+
+_OBS_GROUPED_SQL_TMPL = """
+    SELECT
+      GROUPING(app_id, model, code, retrieved) AS gid,
+      app_id,
+      model,
+      code,
+      retrieved,
+      COUNT(*)::bigint AS requests,
+      COUNT(*) FILTER (WHERE has_error)::bigint AS errors,
+      COUNT(*) FILTER (WHERE has_items)::bigint AS hits,
+      AVG(prepare_ms) AS avg_prepare_ms,
+      AVG(NULLIF(prepare_ms, 0)) AS avg_prepare_nz_ms,
+      {pct_pair} AS prepare_pcts,
+      AVG(embed_ms) AS avg_embed_ms,
+      AVG(retrieve_ms) AS avg_retrieve_ms,
+      AVG(rerank_ms) AS avg_rerank_ms,
+      AVG(context_ms) AS avg_context_ms,
+      AVG(chat_ms) AS avg_chat_ms,
+      AVG(total_ms) AS avg_total_ms,
+      AVG(COALESCE(retrieved_n, 0)) AS avg_retrieved,
+      AVG(topn)::double precision AS avg_topn,
+      SUM(prompt_tokens)::bigint AS prompt_tokens,
+      SUM(completion_tokens)::bigint AS completion_tokens,
+      SUM(COALESCE(total_tokens_n, 0))::bigint AS total_tokens,
+      SUM(prompt_tokens * pp + completion_tokens * cp) AS cost_usd_estimate
+    FROM (
+      SELECT
+        app_id,
+        has_error,
+        has_items,
+        prepare_ms,
+        retrieve_ms,
+        retrieved_n,
+        total_tokens_n,
+        (timings_ms->>'embed')::double precision AS embed_ms,
+        (timings_ms->>'rerank')::double precision AS rerank_ms,
+        (timings_ms->>'context')::double precision AS context_ms,
+        (timings_ms->>'chat')::double precision AS chat_ms,
+        (timings_ms->>'total')::double precision AS total_ms,
+        CASE
+          WHEN json_typeof(retrieval->'top_chunk_ids')='array' THEN json_array_length(retrieval->'top_chunk_ids')
+          ELSE 0
+        END AS topn,
+        COALESCE((token_usage->>'prompt_tokens')::bigint, 0) AS prompt_tokens,
+        COALESCE((token_usage->>'completion_tokens')::bigint, 0) AS completion_tokens,
+        COALESCE(retrieval->>'upstream_chat_model', '') AS model,
+        CASE
+          WHEN error = '' THEN 'ok'
+          WHEN position(':' in error) > 0 THEN split_part(error, ':', 1)
+          ELSE error
+        END AS code,
+        COALESCE(retrieved_n, 0)::int AS retrieved,
+        pr.pp,
+        pr.cp
+      FROM retrieval_events{pricing_join}
+      WHERE workspace_id = :ws
+        AND created_at >= :start
+        AND created_at < :end
+    ) AS ev
+    GROUP BY GROUPING SETS ((), (app_id), (model), (code), (retrieved))
+    """
+_OBS_GROUPED_SQL = {
+    td: text(
+        _OBS_GROUPED_SQL_TMPL.format(
+            pct_pair=expr,
+            pricing_join=_PRICING_JOIN_TMPL.format(model_expr="COALESCE(retrieval->>'upstream_chat_model', '')"),
+        )
+    ).bindparams(bindparam("ws", type_=String))
+    for td, expr in _OBS_PCT_PAIR_EXPRS.items()
+}
+
+
+def _split_obs_grouped(rows: list[Any]) -> tuple[dict[str, Any], list, list, list, list]:
+    """
+    把 GROUPING SETS 结果按 gid 拆回各分组，并保持原有各段的字段、排序与条数上限：
+    (overall, by_app, errors, topk, tokens_by_model_rows)。
+    """
+
+    overall: dict[str, Any] = {}
+    by_app: list[dict[str, Any]] = []
+    errors: list[dict[str, Any]] = []
+    topk: list[dict[str, Any]] = []
+    tokens_by_model_rows: list[dict[str, Any]] = []
+    for r in rows:
+        gid = r["gid"]
+        pcts = r["prepare_pcts"] or (None, None)
+        if gid == _OBS_GID_OVERALL:
+            overall = {
+                "requests": r["requests"],
+                "errors": r["errors"],
+                "hits": r["hits"],
+                "avg_prepare_ms": r["avg_prepare_nz_ms"],
+                "p50_prepare_ms": pcts[0],
+                "p95_prepare_ms": pcts[1],
+                "avg_embed_ms": r["avg_embed_ms"],
+                "avg_retrieve_ms": r["avg_retrieve_ms"],
+                "avg_rerank_ms": r["avg_rerank_ms"],
+                "avg_context_ms": r["avg_context_ms"],
+                "avg_chat_ms": r["avg_chat_ms"],
+                "avg_total_ms": r["avg_total_ms"],
+                "avg_retrieved": r["avg_retrieved"],
+                "avg_topn": r["avg_topn"],
+                "prompt_tokens": r["prompt_tokens"],
+                "completion_tokens": r["completion_tokens"],
+                "total_tokens": r["total_tokens"],
+            }
+        elif gid == _OBS_GID_APP:
+            by_app.append(
+                {
+                    "app_id": r["app_id"],
+                    "requests": r["requests"],
+                    "errors": r["errors"],
+                    "hits": r["hits"],
+                    "p95_prepare_ms": pcts[1],
+                    "avg_prepare_ms": r["avg_prepare_ms"],
+                    "avg_retrieve_ms": r["avg_retrieve_ms"],
+                    "avg_retrieved": r["avg_retrieved"],
+                    "total_tokens": r["total_tokens"],
+                }
+            )
+        elif gid == _OBS_GID_MODEL:
+            tokens_by_model_rows.append(
+                {
+                    "model": r["model"],
+                    "requests": r["requests"],
+                    "prompt_tokens": r["prompt_tokens"],
+                    "completion_tokens": r["completion_tokens"],
+                    "total_tokens": r["total_tokens"],
+                    "cost_usd_estimate": r["cost_usd_estimate"],
+                }
+            )
+        elif gid == _OBS_GID_CODE:
+            errors.append({"code": r["code"], "cnt": r["requests"]})
+        elif gid == _OBS_GID_RETRIEVED:
+            topk.append({"retrieved": r["retrieved"], "cnt": r["requests"]})
+
+    by_app.sort(key=lambda x: x["requests"], reverse=True)
+    errors.sort(key=lambda x: x["cnt"], reverse=True)
+    topk.sort(key=lambda x: x["retrieved"])
+    tokens_by_model_rows.sort(key=lambda x: x["total_tokens"], reverse=True)
+    return overall, by_app[:200], errors[:50], topk[:30], tokens_by_model_rows[:50]
 
 
+def _obs_grouped_rows(s: Session, td: bool, params: dict[str, Any]) -> list[Any]:
+    s.execute(_OBS_PARALLEL_WORKERS_SQL)
+    return s.execute(_OBS_GROUPED_SQL[td], params).mappings().all()
+
+
+# 按 app + kb 聚合（kb_ids 可能为空，兜底填 (none)）
+_OBS_BY_APP_KB_SQL = text(
+    """
+    WITH ev AS (
+      SELECT
+        app_id,
+        kb_ids,
+        has_error,
+        has_items,
+        prepare_ms,
+        retrieve_ms,
+        retrieved_n,
+        total_tokens_n
+      FROM retrieval_events
+      WHERE workspace_id = :ws
+        AND created_at >= :start
+        AND created_at < :end
+    )
+    SELECT
+      ev.app_id,
+      k.kb_id,
+      COUNT(*)::bigint AS requests,
+      COUNT(*) FILTER (WHERE ev.has_error)::bigint AS errors,
+      COUNT(*) FILTER (WHERE ev.has_items)::bigint AS hits,
+      AVG(ev.prepare_ms) AS avg_prepare_ms,
+      AVG(ev.retrieve_ms) AS avg_retrieve_ms,
+      AVG(COALESCE(ev.retrieved_n, 0)) AS avg_retrieved,
+      SUM(COALESCE(ev.total_tokens_n, 0)) AS total_tokens
+    FROM ev
+    CROSS JOIN LATERAL (
+      SELECT value AS kb_id
+      FROM jsonb_array_elements_text(
+        CASE
+          WHEN jsonb_typeof(ev.kb_ids::jsonb)='array' AND jsonb_array_length(ev.kb_ids::jsonb)>0 THEN ev.kb_ids::jsonb
+          ELSE '["(none)"]'::jsonb
+        END
+      )
+    ) AS k
+    GROUP BY ev.app_id, k.kb_id
+    ORDER BY requests DESC
+    LIMIT 500
+    """
+).bindparams(bindparam("ws", type_=String))
+
 @router.get("/workspaces/{workspace_id}/observability/summary")
 def observability_summary(
     workspace_id: str,
+    request: Request,
     date_range: str | None = "24h",
     settings: Settings = Depends(get_settings),
     principal: AdminPrincipal = Depends(require_admin),
@@ -3095,229 +4324,65 @@ def observability_summary(
     """
     质量/可观测聚合指标（内部运维看板用）：
     - 按 app/kb 聚合请求量、错误率、命中率、topK、延迟分解、token 与成本估算
+    - 结果按 (workspace, date_range) 进程内短缓存：24h 内窗口 30s，更长窗口 5min
     """
 
     _require_workspace_access(principal, workspace_id)
     start, end = _parse_date_range(date_range)
+    ttl_s = 30.0 if (end - start) <= dt.timedelta(hours=24) else 300.0
+    key = ("observability", workspace_id, (date_range or "").strip().lower(), settings.observability_rollup_enabled)
+    return _dashboard_cached(
+        key,
+        lambda: _observability_summary(request, db, settings, workspace_id, start, end),
+        ttl_s=ttl_s,
+    )
 
-    # overall 聚合
-    overall = db.execute(
-        text(
-            """
-            SELECT
-              COUNT(*)::bigint AS requests,
-              SUM(CASE WHEN error <> '' THEN 1 ELSE 0 END)::bigint AS errors,
-              SUM(CASE WHEN json_typeof(sources->'items')='array' AND json_array_length(sources->'items')>0 THEN 1 ELSE 0 END)::bigint AS hits,
-              AVG(NULLIF((timings_ms->>'total_prepare')::double precision, 0)) AS avg_prepare_ms,
-              percentile_cont(0.5) WITHIN GROUP (ORDER BY (timings_ms->>'total_prepare')::double precision) AS p50_prepare_ms,
-              percentile_cont(0.95) WITHIN GROUP (ORDER BY (timings_ms->>'total_prepare')::double precision) AS p95_prepare_ms,
-              AVG((timings_ms->>'embed')::double precision) AS avg_embed_ms,
-              AVG((timings_ms->>'retrieve')::double precision) AS avg_retrieve_ms,
-              AVG((timings_ms->>'rerank')::double precision) AS avg_rerank_ms,
-              AVG((timings_ms->>'context')::double precision) AS avg_context_ms,
-              AVG((timings_ms->>'chat')::double precision) AS avg_chat_ms,
-              AVG((timings_ms->>'total')::double precision) AS avg_total_ms,
-              AVG(COALESCE((retrieval->>'retrieved')::double precision, 0)) AS avg_retrieved,
-              AVG(
-                CASE
-                  WHEN json_typeof(retrieval->'top_chunk_ids')='array' THEN json_array_length(retrieval->'top_chunk_ids')
-                  ELSE 0
-                END
-              )::double precision AS avg_topn,
-              SUM(COALESCE((token_usage->>'prompt_tokens')::bigint, 0)) AS prompt_tokens,
-              SUM(COALESCE((token_usage->>'completion_tokens')::bigint, 0)) AS completion_tokens,
-              SUM(COALESCE((token_usage->>'total_tokens')::bigint, 0)) AS total_tokens
-            FROM retrieval_events
-            WHERE workspace_id = :ws
-              AND created_at >= :start
-              AND created_at < :end
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).mappings().first() or {}
-
-    # 按 app 聚合
-    by_app = db.execute(
-        text(
-            """
-            SELECT
-              app_id,
-              COUNT(*)::bigint AS requests,
-              SUM(CASE WHEN error <> '' THEN 1 ELSE 0 END)::bigint AS errors,
-              SUM(CASE WHEN json_typeof(sources->'items')='array' AND json_array_length(sources->'items')>0 THEN 1 ELSE 0 END)::bigint AS hits,
-              percentile_cont(0.95) WITHIN GROUP (ORDER BY (timings_ms->>'total_prepare')::double precision) AS p95_prepare_ms,
-              AVG((timings_ms->>'total_prepare')::double precision) AS avg_prepare_ms,
-              AVG((timings_ms->>'retrieve')::double precision) AS avg_retrieve_ms,
-              AVG(COALESCE((retrieval->>'retrieved')::double precision, 0)) AS avg_retrieved,
-              SUM(COALESCE((token_usage->>'total_tokens')::bigint, 0)) AS total_tokens
-            FROM retrieval_events
-            WHERE workspace_id = :ws
-              AND created_at >= :start
-              AND created_at < :end
-            GROUP BY app_id
-            ORDER BY requests DESC
-            LIMIT 200
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).mappings().all()
-
-    # 按 app + kb 聚合（kb_ids 可能为空，兜底填 (none)）
-    by_app_kb = db.execute(
-        text(
-            """
-            WITH ev AS (
-              SELECT
-                app_id,
-                kb_ids,
-                error,
-                timings_ms,
-                retrieval,
-                sources,
-                token_usage
-              FROM retrieval_events
-              WHERE workspace_id = :ws
-                AND created_at >= :start
-                AND created_at < :end
-            )
-            SELECT
-              ev.app_id,
-              k.kb_id,
-              COUNT(*)::bigint AS requests,
-              SUM(CASE WHEN ev.error <> '' THEN 1 ELSE 0 END)::bigint AS errors,
-              SUM(CASE WHEN json_typeof(ev.sources->'items')='array' AND json_array_length(ev.sources->'items')>0 THEN 1 ELSE 0 END)::bigint AS hits,
-              AVG((ev.timings_ms->>'total_prepare')::double precision) AS avg_prepare_ms,
-              AVG((ev.timings_ms->>'retrieve')::double precision) AS avg_retrieve_ms,
-              AVG(COALESCE((ev.retrieval->>'retrieved')::double precision, 0)) AS avg_retrieved,
-              SUM(COALESCE((ev.token_usage->>'total_tokens')::bigint, 0)) AS total_tokens
-            FROM ev
-            CROSS JOIN LATERAL (
-              SELECT value AS kb_id
-              FROM jsonb_array_elements_text(
-                CASE
-                  WHEN jsonb_typeof(ev.kb_ids::jsonb)='array' AND jsonb_array_length(ev.kb_ids::jsonb)>0 THEN ev.kb_ids::jsonb
-                  ELSE '["(none)"]'::jsonb
-                END
-              )
-            ) AS k
-            GROUP BY ev.app_id, k.kb_id
-            ORDER BY requests DESC
-            LIMIT 500
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).mappings().all()
-
-    # 错误码聚合（只看 error 前缀）
-    errors = db.execute(
-        text(
-            """
-            SELECT
-              CASE
-                WHEN error = '' THEN 'ok'
-                WHEN position(':' in error) > 0 THEN split_part(error, ':', 1)
-                ELSE error
-              END AS code,
-              COUNT(*)::bigint AS cnt
-            FROM retrieval_events
-            WHERE workspace_id = :ws
-              AND created_at >= :start
-              AND created_at < :end
-            GROUP BY code
-            ORDER BY cnt DESC
-            LIMIT 50
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).mappings().all()
-
-    # topK（retrieved）分布（前 30 个 bucket）
-    topk = db.execute(
-        text(
-            """
-            SELECT
-              COALESCE((retrieval->>'retrieved')::int, 0) AS retrieved,
-              COUNT(*)::bigint AS cnt
-            FROM retrieval_events
-            WHERE workspace_id = :ws
-              AND created_at >= :start
-              AND created_at < :end
-            GROUP BY retrieved
-            ORDER BY retrieved ASC
-            LIMIT 30
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).mappings().all()
-
-    # token/cost：按上游模型聚合（依赖 meta 注入 upstream_chat_model）
-    pricing = settings.model_pricing()
-    tokens_by_model_rows = db.execute(
-        text(
-            """
-            SELECT
-              COALESCE(retrieval->>'upstream_chat_model', '') AS model,
-              COUNT(*)::bigint AS requests,
-              SUM(COALESCE((token_usage->>'prompt_tokens')::bigint, 0)) AS prompt_tokens,
-              SUM(COALESCE((token_usage->>'completion_tokens')::bigint, 0)) AS completion_tokens,
-              SUM(COALESCE((token_usage->>'total_tokens')::bigint, 0)) AS total_tokens
-            FROM retrieval_events
-            WHERE workspace_id = :ws
-              AND created_at >= :start
-              AND created_at < :end
-            GROUP BY model
-            ORDER BY total_tokens DESC
-            LIMIT 50
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).mappings().all()
-
-    tokens_by_model: list[dict[str, Any]] = []
-    for r in tokens_by_model_rows:
-        m = str(r.get("model") or "")
-        pt = int(r.get("prompt_tokens") or 0)
-        ct = int(r.get("completion_tokens") or 0)
-        tokens_by_model.append(
+
+def _observability_summary(
+    request: Request,
+    db: Session,
+    settings: Settings,
+    workspace_id: str,
+    start: dt.datetime,
+    end: dt.datetime,
+) -> dict[str, Any]:
+
+    # 计价随聚合在 SQL 中算出（tokens_by_model 每行自带 cost_usd_estimate）
+    pricing, pricing_params = _pricing_tables(settings)
+
+    # 开启汇总表时按小时桶聚合（起点向下对齐到整点，实际窗口可能比请求的多出不到 1 小时，
+    # 通过 window_start 返回）；汇总表不可用时回退逐行聚合，窗口与请求一致
+    rolled = None
+    window_start = start
+    if settings.observability_rollup_enabled:
+        hour_start = start.replace(minute=0, second=0, microsecond=0)
+        rolled = _read_observability_rollup(db, workspace_id, hour_start, end, pricing_params)
+        if rolled is not None:
+            window_start = hour_start
+    if rolled is not None:
+        overall, by_app, by_app_kb, errors, topk, tokens_by_model_rows = rolled
+        # rerank 抽样仍逐行查询：用请求的原始起点，与未开汇总时口径一致
+        rerank_row = db.execute(_RERANK_EFFECT_SQL, {"ws": workspace_id, "start": start, "end": end}).mappings().one()
+    else:
+        td = _pg_has_tdigest(db)
+        # 三条查询互不依赖：各用独立 Session（独立连接）在线程池中并发执行
+        params = {"ws": workspace_id, "start": start, "end": end}
+        res = _run_concurrently(
+            request.app.state.SessionLocal,
             {
-                **dict(r),
-                "cost_usd_estimate": _estimate_cost_usd(pricing, model=m, prompt_tokens=pt, completion_tokens=ct),
-            }
+                "grouped": lambda s: _obs_grouped_rows(s, td, {**params, **pricing_params}),
+                "by_app_kb": lambda s: s.execute(_OBS_BY_APP_KB_SQL, params).mappings().all(),
+                "rerank": lambda s: s.execute(_RERANK_EFFECT_SQL, params).mappings().one(),
+            },
         )
+        overall, by_app, errors, topk, tokens_by_model_rows = _split_obs_grouped(res["grouped"])
+        by_app_kb = res["by_app_kb"]
+        rerank_row = res["rerank"]
 
-    # rerank 效果（抽样）：top_scores（可能为 rerank 后）与 top_scores_pre_rerank（召回原始分）差值
-    rerank_rows = db.execute(
-        text(
-            """
-            SELECT
-              retrieval->'top_scores_pre_rerank' AS pre,
-              retrieval->'top_scores' AS post
-            FROM retrieval_events
-            WHERE workspace_id = :ws
-              AND created_at >= :start
-              AND created_at < :end
-              AND COALESCE(retrieval->>'rerank_used','false') = 'true'
-            ORDER BY id DESC
-            LIMIT 500
-            """
-        ),
-        {"ws": workspace_id, "start": start, "end": end},
-    ).all()
-
-    deltas: list[float] = []
-    for pre, post in rerank_rows or []:
-        if not isinstance(pre, list) or not isinstance(post, list):
-            continue
-        n = min(len(pre), len(post))
-        for i in range(n):
-            a = pre[i]
-            b = post[i]
-            if isinstance(a, (int, float)) and isinstance(b, (int, float)):
-                deltas.append(float(b) - float(a))
     rerank_effect = {
-        "sample_events": int(len(rerank_rows or [])),
-        "sample_pairs": int(len(deltas)),
-        "avg_delta": (sum(deltas) / len(deltas)) if deltas else None,
+        "sample_events": int(rerank_row["sample_events"] or 0),
+        "sample_pairs": int(rerank_row["sample_pairs"] or 0),
+        "avg_delta": float(rerank_row["avg_delta"]) if rerank_row["avg_delta"] is not None else None,
     }
 
     def _ratio(n: int, d: int) -> float:
@@ -3338,6 +4403,8 @@ def observability_summary(
     return {
         "from": start.isoformat(),
         "to": end.isoformat(),
+        # 聚合指标实际覆盖的起点：走汇总表时为 from 向下取整点，否则等于 from
+        "window_start": window_start.isoformat(),
         "overall": {
             **dict(overall),
             "error_ratio": _ratio(overall_errors, overall_requests),
@@ -3365,12 +4432,38 @@ def observability_summary(
         ],
         "errors": [dict(r) for r in errors],
         "topk": [dict(r) for r in topk],
-        "tokens_by_model": tokens_by_model,
+        "tokens_by_model": [dict(r) for r in tokens_by_model_rows],
         "rerank_effect": rerank_effect,
         "pricing_configured": bool(pricing),
     }
 
 
+_ALERT_COUNTS_SQL = text(
+    """
+    SELECT
+      (
+        SELECT COUNT(*) FROM jobs
+        WHERE workspace_id = :ws AND status = 'failed' AND started_at >= :start AND started_at < :end
+      ) AS failed_jobs,
+      ev.events_total,
+      ev.events_error,
+      ck.chunks_total,
+      ck.chunks_with_embedding
+    FROM (
+      SELECT COUNT(*) AS events_total, COUNT(*) FILTER (WHERE error <> '') AS events_error
+      FROM retrieval_events
+      WHERE workspace_id = :ws AND created_at >= :start AND created_at < :end
+    ) AS ev
+    CROSS JOIN (
+      SELECT COUNT(*) AS chunks_total, COUNT(*) FILTER (WHERE c.embedding IS NOT NULL) AS chunks_with_embedding
+      FROM chunks c
+      JOIN pages p ON p.id = c.page_id
+      WHERE p.workspace_id = :ws
+    ) AS ck
+    """
+).bindparams(bindparam("ws", type_=String))
+
+
 @router.get("/workspaces/{workspace_id}/alerts")
 def list_alerts(
     workspace_id: str,
@@ -3379,25 +4472,27 @@ def list_alerts(
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
     """
-    轻量级告警：按规则实时计算（不做持久化）。
+    轻量级告警：按规则实时计算（不做持久化），结果进程内缓存 10s。
     """
 
     _require_workspace_access(principal, workspace_id)
     start, end = _parse_date_range(date_range)
+    key = ("alerts", workspace_id, (date_range or "").strip().lower())
+    return _dashboard_cached(key, lambda: _list_alerts(db, workspace_id, start, end), ttl_s=10.0)
+
+
+def _list_alerts(db: Session, workspace_id: str, start: dt.datetime, end: dt.datetime) -> dict[str, Any]:
     alerts: list[dict[str, Any]] = []
 
+    # 所有告警计数一条语句取回（各子查询按自己的索引扫描，一次往返）
+    counts = db.execute(_ALERT_COUNTS_SQL, {"ws": workspace_id, "start": start, "end": end}).mappings().one()
+    failed_jobs = int(counts["failed_jobs"] or 0)
+    total_ev = int(counts["events_total"] or 0)
+    error_ev = int(counts["events_error"] or 0)
+    chunks_total = int(counts["chunks_total"] or 0)
+    chunks_with_embedding = int(counts["chunks_with_embedding"] or 0)
+
     # 任务失败
-    failed_jobs = int(
-        db.scalar(
-            select(func.count())
-            .select_from(Job)
-            .where(Job.workspace_id == workspace_id)
-            .where(Job.status == "failed")
-            .where(Job.started_at >= start)
-            .where(Job.started_at < end)
-        )
-        or 0
-    )
     if failed_jobs > 0:
         alerts.append(
             {
@@ -3410,27 +4505,6 @@ def list_alerts(
         )
 
     # 检索错误率
-    total_ev = int(
-        db.scalar(
-            select(func.count())
-            .select_from(RetrievalEvent)
-            .where(RetrievalEvent.workspace_id == workspace_id)
-            .where(RetrievalEvent.created_at >= start)
-            .where(RetrievalEvent.created_at < end)
-        )
-        or 0
-    )
-    error_ev = int(
-        db.scalar(
-            select(func.count())
-            .select_from(RetrievalEvent)
-            .where(RetrievalEvent.workspace_id == workspace_id)
-            .where(RetrievalEvent.created_at >= start)
-            .where(RetrievalEvent.created_at < end)
-            .where(RetrievalEvent.error != "")
-        )
-        or 0
-    )
     if total_ev > 0:
         ratio = float(error_ev) / float(total_ev)
         if ratio >= 0.1:
@@ -3451,35 +4525,6 @@ def list_alerts(
             )
 
     # embedding 覆盖率（全 workspace 粗略）
-    chunks_total = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM chunks c
-                JOIN pages p ON p.id = c.page_id
-                WHERE p.workspace_id = :ws
-                """
-            ),
-            {"ws": workspace_id},
-        ).scalar()
-        or 0
-    )
-    chunks_with_embedding = int(
-        db.execute(
-            text(
-                """
-                SELECT COUNT(*)
-                FROM chunks c
-                JOIN pages p ON p.id = c.page_id
-                WHERE p.workspace_id = :ws
-                  AND c.embedding IS NOT NULL
-                """
-            ),
-            {"ws": workspace_id},
-        ).scalar()
-        or 0
-    )
     if chunks_total > 0:
         cov = chunks_with_embedding / chunks_total
         if cov < 0.6:
@@ -4,18 +4,23 @@ import asyncio
 import datetime as dt
 import logging
 import uuid
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Any
 
 from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+import orjson
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from onekey_rag_service.api.deps import get_db
 from onekey_rag_service.api.admin import router as admin_router
+from onekey_rag_service.api.admin import start_cpu_sampler, stop_cpu_sampler
 from onekey_rag_service.config import Settings, get_settings
+from onekey_rag_service.admin.auth import describe_hmac_backend
 from onekey_rag_service.admin.bootstrap import ensure_default_entities
 from onekey_rag_service.db import (
     create_all_safe,
@@ -23,15 +28,18 @@ from onekey_rag_service.db import (
     create_session_factory,
     ensure_admin_schema,
     ensure_indexes,
+    ensure_observability_rollup,
     ensure_pgvector_extension,
+    ensure_summary_views,
 )
 from onekey_rag_service.logging import configure_logging
 from onekey_rag_service.models import Base, Feedback, Job, KnowledgeBase, RagApp, RagAppKnowledgeBase, RetrievalEvent
 from onekey_rag_service.observability.langfuse import build_langfuse_callback
+from onekey_rag_service.rag.answer_cache import AnswerCache
 from onekey_rag_service.rag.chat_provider import build_chat_provider, now_unix
 from onekey_rag_service.rag.embeddings import build_embeddings_provider
-from onekey_rag_service.rag.kb_allocation import KbBinding, allocate_top_k
-from onekey_rag_service.rag.pipeline import answer_with_rag, prepare_rag
+from onekey_rag_service.rag.kb_allocation import KbAllocation, KbBinding, allocate_top_k
+from onekey_rag_service.rag.pipeline import RagAnswer, answer_with_rag, prepare_rag
 from onekey_rag_service.rag.reranker import build_reranker
 from onekey_rag_service.utils import sha256_text
 from onekey_rag_service.schemas import (
@@ -47,6 +55,15 @@ from onekey_rag_service.schemas import (
 
 logger = logging.getLogger(__name__)
 
+# SSE 帧的固定前后缀（预编码一次）
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+_SSE_DONE = b"data: [DONE]\n\n"
+
+# 检索事件后台写入：每批最多条数、退出时等待写完的上限
+_RETRIEVAL_EVENT_BATCH_SIZE = 100
+_RETRIEVAL_EVENT_DRAIN_TIMEOUT_S = 5.0
+
 app = FastAPI(title="OneKey RAG Service", version="0.1.0")
 
 # 前端 Widget（/widget/widget.js + /widget/）
@@ -126,6 +143,8 @@ def _startup() -> None:
     create_all_safe(engine, Base.metadata)
     ensure_admin_schema(engine)
     ensure_indexes(engine, settings)
+    ensure_summary_views(engine, settings)
+    ensure_observability_rollup(engine, settings)
 
     app.state.settings = settings
     app.state.engine = engine
@@ -141,9 +160,67 @@ def _startup() -> None:
     app.state.chat = build_chat_provider(settings)
     app.state.reranker = build_reranker(settings)
     app.state.chat_model_map = settings.chat_model_map()
+    app.state.settings_meta = {
+        "chat_model_provider": settings.chat_model_provider,
+        "chat_base_url": str(settings.chat_base_url),
+        "embeddings_provider": settings.embeddings_provider,
+        "rerank_provider": settings.rerank_provider,
+        "retrieval_mode": settings.retrieval_mode,
+    }
     app.state.chat_semaphore = asyncio.Semaphore(max(1, int(settings.max_concurrent_chat_requests or 1)))
+    app.state.answer_cache = (
+        AnswerCache(max_size=settings.answer_cache_size, ttl_s=settings.answer_cache_ttl_s)
+        if settings.answer_cache_size > 0
+        else None
+    )
+
+    logger.info("启动完成 env=%s hmac=%s", settings.app_env, describe_hmac_backend())
+
+
+@app.on_event("startup")
+async def _start_background_samplers() -> None:
+    # Admin 系统指标：CPU 使用率由后台任务按固定频率采样
+    start_cpu_sampler()
 
-    logger.info("启动完成 env=%s", settings.app_env)
+
+@app.on_event("shutdown")
+async def _stop_background_samplers() -> None:
+    stop_cpu_sampler()
+
+
+@app.on_event("shutdown")
+async def _close_chat_provider() -> None:
+    chat = getattr(app.state, "chat", None)
+    if chat is not None:
+        await chat.aclose()
+
+
+@app.on_event("startup")
+async def _start_retrieval_event_writer() -> None:
+    # 检索事件异步批量写入：请求路径只入队，省掉每次请求一次 INSERT + COMMIT 往返
+    settings: Settings = app.state.settings
+    size = int(settings.retrieval_events_queue_size or 0)
+    if not settings.retrieval_events_enabled or size <= 0:
+        app.state.retrieval_event_queue = None
+        return
+    queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+    app.state.retrieval_event_queue = queue
+    app.state.retrieval_event_writer = asyncio.get_running_loop().create_task(_retrieval_event_writer_loop(queue))
+
+
+@app.on_event("shutdown")
+async def _stop_retrieval_event_writer() -> None:
+    queue: asyncio.Queue | None = getattr(app.state, "retrieval_event_queue", None)
+    task: asyncio.Task | None = getattr(app.state, "retrieval_event_writer", None)
+    app.state.retrieval_event_queue = None
+    if queue is not None:
+        # 尽量写完已入队事件；超时则放弃剩余部分
+        try:
+            await asyncio.wait_for(queue.join(), timeout=_RETRIEVAL_EVENT_DRAIN_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            logger.warning("检索事件队列未写完即退出 remaining=%s", queue.qsize())
+    if task is not None:
+        task.cancel()
 
 
 @app.get("/healthz", response_model=HealthResponse)
@@ -198,10 +275,7 @@ def openai_list_models(db: Session = Depends(get_db)):
 
 
 @app.post("/v1/chat/completions")
-async def openai_chat_completions(
-    req: OpenAIChatCompletionsRequest,
-    db: Session = Depends(get_db),
-):
+async def openai_chat_completions(req: OpenAIChatCompletionsRequest):
     if req.stream and req.response_format:
         raise HTTPException(status_code=400, detail="stream 模式不支持 response_format")
     request_messages = [{"role": m.role, "content": m.content} for m in req.messages]
@@ -218,51 +292,26 @@ async def openai_chat_completions(
     chat = app.state.chat
     reranker = app.state.reranker
     model_map: dict[str, str] = app.state.chat_model_map
+    session_factory = app.state.SessionLocal
 
-    workspace_id = "default"
-    app_id = ""
-    kb_allocations = None
-
-    app_row = db.scalar(select(RagApp).where(RagApp.public_model_id == req.model))
-    if app_row:
-        if (app_row.status or "").lower() != "published":
-            raise HTTPException(status_code=404, detail="model not found")
-        workspace_id = str(app_row.workspace_id or "default")
-        app_id = str(app_row.id or "")
-
-        binding_rows = db.scalars(
-            select(RagAppKnowledgeBase)
-            .where(RagAppKnowledgeBase.workspace_id == workspace_id)
-            .where(RagAppKnowledgeBase.app_id == app_id)
-            .where(RagAppKnowledgeBase.enabled.is_(True))
-            .order_by(RagAppKnowledgeBase.priority.asc(), RagAppKnowledgeBase.id.asc())
-        ).all()
-        bindings = [
-            KbBinding(kb_id=b.kb_id, weight=float(b.weight or 0.0), priority=int(b.priority or 0))
-            for b in binding_rows
-            if (b.kb_id or "").strip() and float(b.weight or 0.0) > 0.0
-        ]
-        if not bindings:
-            bindings = [KbBinding(kb_id="default", weight=1.0, priority=0)]
-        kb_allocations = allocate_top_k(bindings, total_k=int(settings.rag_top_k))
-
-        chat_cfg = dict((app_row.config or {}).get("chat") or {})
-        upstream_model = str(chat_cfg.get("model") or settings.chat_model)
-    else:
-        if req.model in model_map:
-            upstream_model = model_map[req.model]
-        elif settings.chat_model_passthrough:
-            upstream_model = req.model
-        else:
-            upstream_model = settings.chat_model
+    # 应用/KB 绑定/模板的查询是同步 psycopg2 I/O：放到线程池，避免阻塞事件循环里的并发请求
+    # 线程内各自建 Session（见 _resolve_chat_target / _retrieve_candidates），不共用请求作用域的 Session
+    workspace_id, app_id, kb_allocations, upstream_model, prompt_templates = await asyncio.to_thread(
+        _resolve_chat_target, session_factory, settings=settings, model_map=model_map, model=req.model
+    )
 
     temperature = req.temperature if req.temperature is not None else settings.chat_default_temperature
     top_p = req.top_p if req.top_p is not None else settings.chat_default_top_p
     max_tokens = req.max_tokens if req.max_tokens is not None else settings.chat_default_max_tokens
-    prompt_templates = _load_kb_prompt_templates(db, workspace_id, kb_allocations)
 
     chat_id = f"chatcmpl_{uuid.uuid4().hex}"
     created = now_unix()
+    # 观测用链路信息：配置部分启动时算好，请求内只补模型两项
+    route_meta = {
+        **app.state.settings_meta,
+        "requested_model": req.model,
+        "upstream_chat_model": upstream_model,
+    }
     sem = getattr(app.state, "chat_semaphore", None)
 
     user_id = None
@@ -285,12 +334,45 @@ async def openai_chat_completions(
         callbacks = [langfuse_cb]
 
     if not req.stream:
-        if sem:
-            await sem.acquire()
+        # 精确匹配答案缓存：命中则跳过检索 + LLM（debug 请求不走缓存）
+        answer_cache: AnswerCache | None = getattr(app.state, "answer_cache", None)
+        cache_key = ""
+        rag = None
+        if answer_cache is not None and not req.debug:
+            cache_key = AnswerCache.make_key(
+                workspace_id=workspace_id,
+                app_id=app_id,
+                upstream_model=upstream_model,
+                messages=request_messages,
+                kb_allocations=kb_allocations,
+                prompt_templates=prompt_templates,
+                temperature=temperature,
+                top_p=top_p,
+                max_tokens=max_tokens,
+                response_format=req.response_format,
+            )
+            rag = answer_cache.get(cache_key)
+
+        if rag is not None:
+            # AnswerCache.get 返回的命中结果已去掉 usage 与 timings_ms（见 AnswerCache.get），事件与响应口径一致
+            await _save_retrieval_event(
+                settings=settings,
+                workspace_id=workspace_id,
+                app_id=app_id,
+                request_id=chat_id,
+                question=question,
+                meta={**(rag.meta or {}), **route_meta, "answer_cache": "hit"},
+                sources=rag.sources,
+                usage=rag.usage,
+                req_metadata=req.metadata,
+                error="",
+            )
+            return _chat_completion_response(chat_id=chat_id, created=created, model=req.model, rag=rag)
+
         try:
             rag = await asyncio.wait_for(
                 answer_with_rag(
-                    db,
+                    session_factory,
                     settings=settings,
                     embeddings=embeddings,
                     chat=chat,
@@ -307,6 +389,7 @@ async def openai_chat_completions(
                     response_format=req.response_format,
                     debug=req.debug,
                     callbacks=callbacks,
+                    prepare_semaphore=sem,
                 ),
                 timeout=settings.rag_total_timeout_s,
             )
@@ -314,8 +397,7 @@ async def openai_chat_completions(
             raise HTTPException(status_code=504, detail="请求超时，请稍后重试或缩短问题/上下文")
         except Exception as e:
             # 观测：非流式也应记录失败，便于 admin 聚合错误码与延迟
-            _save_retrieval_event(
-                db,
+            await _save_retrieval_event(
                 settings=settings,
                 workspace_id=workspace_id,
                 app_id=app_id,
@@ -332,21 +414,10 @@ async def openai_chat_completions(
                 error=f"chat_error:{str(e)}",
             )
             raise
-        finally:
-            if sem:
-                sem.release()
-
-        meta = dict(rag.meta or {})
-        meta["requested_model"] = req.model
-        meta["upstream_chat_model"] = upstream_model
-        meta["chat_model_provider"] = settings.chat_model_provider
-        meta["chat_base_url"] = str(settings.chat_base_url)
-        meta["embeddings_provider"] = settings.embeddings_provider
-        meta["rerank_provider"] = settings.rerank_provider
-        meta["retrieval_mode"] = settings.retrieval_mode
-
-        _save_retrieval_event(
-            db,
+
+        meta = {**(rag.meta or {}), **route_meta}
+
+        await _save_retrieval_event(
             settings=settings,
             workspace_id=workspace_id,
             app_id=app_id,
@@ -359,36 +430,47 @@ async def openai_chat_completions(
             error="",
         )
 
-        resp = OpenAIChatCompletionsResponse(
-            id=chat_id,
-            created=created,
-            model=req.model,
-            choices=[
-                OpenAIChatCompletionsResponseChoice(
-                    index=0,
-                    message=OpenAIChatCompletionsResponseChoiceMessage(role="assistant", content=rag.answer),
-                    finish_reason="stop",
-                )
-            ],
-            usage=OpenAIUsage(**(rag.usage or {})),
-            sources=rag.sources,  # type: ignore[arg-type]
-            debug=rag.debug,
-        )
-        return JSONResponse(resp.model_dump())
+        if cache_key:
+            answer_cache.put(cache_key, rag)
+
+        return _chat_completion_response(chat_id=chat_id, created=created, model=req.model, rag=rag)
+
+    # 内容 chunk 的外层结构每帧都相同：预先构建一次，逐帧只替换 delta.content（随即序列化，原地修改安全）
+    content_delta = {"content": ""}
+    content_frame = {
+        "id": chat_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": req.model,
+        "choices": [{"index": 0, "delta": content_delta, "finish_reason": None}],
+    }
+
+    def _content_sse(part: str) -> bytes:
+        content_delta["content"] = part
+        return _sse(content_frame)
 
     async def event_stream():
-        if sem:
-            await sem.acquire()
-        try:
-            # 首包声明 assistant 角色（部分 OpenAI 客户端依赖）
-            yield f"data: {json_dumps({'id': chat_id,'object':'chat.completion.chunk','created': created,'model': req.model,'choices':[{'index':0,'delta':{'role':'assistant'},'finish_reason':None}]})}\n\n"
+        # 首包声明 assistant 角色（部分 OpenAI 客户端依赖）
+        yield _sse(
+            {
+                "id": chat_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": req.model,
+                "choices": [{"index": 0, "delta": {"role": "assistant"}, "finish_reason": None}],
+            }
+        )
 
-            prepared = None
-            prepare_err = ""
+        prepared = None
+        prepare_err = ""
+        try:
+            # 并发上限只约束检索/上下文准备；拿到上下文即释放，流式生成阶段不占名额
+            if sem:
+                await sem.acquire()
             try:
                 prepared = await asyncio.wait_for(
                     prepare_rag(
-                        db,
+                        session_factory,
                         settings=settings,
                         embeddings=embeddings,
                         chat=chat,
@@ -404,147 +486,103 @@ async def openai_chat_completions(
                     ),
                     timeout=settings.rag_prepare_timeout_s,
                 )
-            except asyncio.TimeoutError:
-                prepare_err = "prepare_timeout"
-                err_text = "\n\n[错误] 检索/上下文准备超时：请缩短问题或稍后重试"
-                for part in _chunk_text(err_text, chunk_size=80):
-                    data = {
-                        "id": chat_id,
-                        "object": "chat.completion.chunk",
-                        "created": created,
-                        "model": req.model,
-                        "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
-                    }
-                    yield f"data: {json_dumps(data)}\n\n"
-            except Exception as e:
-                prepare_err = f"prepare_error:{str(e)}"
-                err_text = f"\n\n[错误] 检索/上下文准备失败：{str(e)}"
-                for part in _chunk_text(err_text, chunk_size=80):
-                    data = {
-                        "id": chat_id,
-                        "object": "chat.completion.chunk",
-                        "created": created,
-                        "model": req.model,
-                        "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
-                    }
-                    yield f"data: {json_dumps(data)}\n\n"
-
-            sources = (prepared.sources if prepared else []) or []
-            if prepared and isinstance(prepared.meta, dict):
-                event_meta = dict(prepared.meta)
+            finally:
+                if sem:
+                    sem.release()
+        except asyncio.TimeoutError:
+            prepare_err = "prepare_timeout"
+            err_text = "\n\n[错误] 检索/上下文准备超时：请缩短问题或稍后重试"
+            for part in _chunk_text(err_text, chunk_size=80):
+                yield _content_sse(part)
+        except Exception as e:
+            prepare_err = f"prepare_error:{str(e)}"
+            err_text = f"\n\n[错误] 检索/上下文准备失败：{str(e)}"
+            for part in _chunk_text(err_text, chunk_size=80):
+                yield _content_sse(part)
+
+        sources = (prepared.sources if prepared else []) or []
+        prepared_meta = prepared.meta if prepared and isinstance(prepared.meta, dict) else {}
+        event_meta = {**prepared_meta, **route_meta}
+
+        await _save_retrieval_event(
+            settings=settings,
+            workspace_id=workspace_id,
+            app_id=app_id,
+            request_id=chat_id,
+            question=question,
+            meta=event_meta or None,
+            sources=sources,
+            usage=None,
+            req_metadata=req.metadata,
+            error=prepare_err,
+        )
+
+        # 可选：把 sources 以“参考/来源”形式附在最终文本里（便于只认 content 的客户端）
+        sources_tail = ""
+        if sources and settings.answer_append_sources:
+            if settings.inline_citations_enabled:
+                lines = ["\n\n参考："]
+                for i, s in enumerate(sources, start=1):
+                    ref = int(s.get("ref") or i)
+                    title = (s.get("title") or "").strip()
+                    url = (s.get("url") or "").strip()
+                    if title:
+                        lines.append(f"[{ref}] {title} - {url}")
+                    else:
+                        lines.append(f"[{ref}] {url}")
+                sources_tail = "\n".join(lines).rstrip()
             else:
-                event_meta = {}
-            event_meta.setdefault("requested_model", req.model)
-            event_meta.setdefault("upstream_chat_model", upstream_model)
-            event_meta.setdefault("chat_model_provider", settings.chat_model_provider)
-            event_meta.setdefault("chat_base_url", str(settings.chat_base_url))
-            event_meta.setdefault("embeddings_provider", settings.embeddings_provider)
-            event_meta.setdefault("rerank_provider", settings.rerank_provider)
-            event_meta.setdefault("retrieval_mode", settings.retrieval_mode)
-
-            _save_retrieval_event(
-                db,
-                settings=settings,
-                workspace_id=workspace_id,
-                app_id=app_id,
-                request_id=chat_id,
-                question=question,
-                meta=event_meta or None,
-                sources=sources,
-                usage=None,
-                req_metadata=req.metadata,
-                error=prepare_err,
+                sources_tail = "\n\n来源：\n" + "\n".join([f"- {s['url']}" for s in sources if s.get("url")])
+
+        no_chat_text = ""
+        if (not chat) and prepared and prepared.direct_answer is None and sources:
+            no_chat_text = (
+                "当前服务未配置上游 ChatModel（CHAT_API_KEY），因此无法生成高质量自然语言回答。\n\n"
+                "下面是检索到的相关文档片段（请优先查看来源链接）：\n"
+                + "\n".join([f"- {s.get('title') or s.get('url')}（{s.get('url')}）" for s in sources[:5]])
             )
 
-            # 可选：把 sources 以“参考/来源”形式附在最终文本里（便于只认 content 的客户端）
-            sources_tail = ""
-            if sources and settings.answer_append_sources:
-                if settings.inline_citations_enabled:
-                    lines = ["\n\n参考："]
-                    for i, s in enumerate(sources, start=1):
-                        ref = int(s.get("ref") or i)
-                        title = (s.get("title") or "").strip()
-                        url = (s.get("url") or "").strip()
-                        if title:
-                            lines.append(f"[{ref}] {title} - {url}")
-                        else:
-                            lines.append(f"[{ref}] {url}")
-                    sources_tail = "\n".join(lines).rstrip()
-                else:
-                    sources_tail = "\n\n来源：\n" + "\n".join([f"- {s['url']}" for s in sources if s.get("url")])
-
-            no_chat_text = ""
-            if (not chat) and prepared and prepared.direct_answer is None and sources:
-                no_chat_text = (
-                    "当前服务未配置上游 ChatModel（CHAT_API_KEY），因此无法生成高质量自然语言回答。\n\n"
-                    "下面是检索到的相关文档片段（请优先查看来源链接）：\n"
-                    + "\n".join([f"- {s.get('title') or s.get('url')}（{s.get('url')}）" for s in sources[:5]])
-                )
+        if (not prepared) or prepared.direct_answer is not None or not prepared.messages or not chat:
+            base_text = (prepared.direct_answer if prepared else "") or no_chat_text or ""
+            tail = sources_tail if (prepared and prepared.direct_answer is not None) else ""
+            for part in _chunk_text(base_text + tail, chunk_size=60):
+                yield _content_sse(part)
+        else:
+            try:
+                async for part in chat.stream(
+                    model=upstream_model,
+                    messages=prepared.messages,
+                    temperature=temperature,
+                    top_p=top_p,
+                    max_tokens=max_tokens,
+                    callbacks=callbacks,
+                ):
+                    if not part:
+                        continue
+                    yield _content_sse(part)
 
-            if (not prepared) or prepared.direct_answer is not None or not prepared.messages or not chat:
-                base_text = (prepared.direct_answer if prepared else "") or no_chat_text or ""
-                tail = sources_tail if (prepared and prepared.direct_answer is not None) else ""
-                for part in _chunk_text(base_text + tail, chunk_size=60):
-                    data = {
-                        "id": chat_id,
-                        "object": "chat.completion.chunk",
-                        "created": created,
-                        "model": req.model,
-                        "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
-                    }
-                    yield f"data: {json_dumps(data)}\n\n"
-            else:
-                try:
-                    async for part in chat.stream(
-                        model=upstream_model,
-                        messages=prepared.messages,
-                        temperature=temperature,
-                        top_p=top_p,
-                        max_tokens=max_tokens,
-                        callbacks=callbacks,
-                    ):
-                        if not part:
-                            continue
-                        data = {
-                            "id": chat_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": req.model,
-                            "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
-                        }
-                        yield f"data: {json_dumps(data)}\n\n"
-
-                    if sources_tail:
-                        data = {
-                            "id": chat_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": req.model,
-                            "choices": [{"index": 0, "delta": {"content": sources_tail}, "finish_reason": None}],
-                        }
-                        yield f"data: {json_dumps(data)}\n\n"
-                except Exception as e:
-                    # 流式过程中无法再改 HTTP 状态码，采用“内容内报错 + 结束事件”兜底
-                    err_text = f"\n\n[错误] 上游模型流式输出失败：{str(e)}"
-                    for part in _chunk_text(err_text, chunk_size=80):
-                        data = {
-                            "id": chat_id,
-                            "object": "chat.completion.chunk",
-                            "created": created,
-                            "model": req.model,
-                            "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
-                        }
-                        yield f"data: {json_dumps(data)}\n\n"
-
-            # 正常结束 chunk（OpenAI 习惯在最后给 finish_reason）
-            yield f"data: {json_dumps({'id': chat_id,'object':'chat.completion.chunk','created': created,'model': req.model,'choices':[{'index':0,'delta':{},'finish_reason':'stop'}]})}\n\n"
-
-            sources_event = {"id": chat_id, "object": "chat.completion.sources", "sources": sources}
-            yield f"data: {json_dumps(sources_event)}\n\n"
-            yield "data: [DONE]\n\n"
-        finally:
-            if sem:
-                sem.release()
+                if sources_tail:
+                    yield _content_sse(sources_tail)
+            except Exception as e:
+                # 流式过程中无法再改 HTTP 状态码，采用“内容内报错 + 结束事件”兜底
+                err_text = f"\n\n[错误] 上游模型流式输出失败：{str(e)}"
+                for part in _chunk_text(err_text, chunk_size=80):
+                    yield _content_sse(part)
+
+        # 正常结束 chunk（OpenAI 习惯在最后给 finish_reason）
+        yield _sse(
+            {
+                "id": chat_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": req.model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+        )
+
+        sources_event = {"id": chat_id, "object": "chat.completion.sources", "sources": sources}
+        yield _sse(sources_event)
+        yield _SSE_DONE
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
@@ -595,8 +633,7 @@ def feedback(req: FeedbackRequest, db: Session = Depends(get_db)) -> FeedbackRes
     return FeedbackResponse()
 
 
-def _save_retrieval_event(
-    db: Session,
+def _build_retrieval_event(
     *,
     settings: Settings,
     workspace_id: str,
@@ -608,9 +645,9 @@ def _save_retrieval_event(
     usage: dict | None,
     req_metadata: dict | None,
     error: str,
-) -> None:
+) -> RetrievalEvent | None:
     if not settings.retrieval_events_enabled:
-        return
+        return None
 
     try:
         metadata = dict(req_metadata or {})
@@ -642,6 +679,7 @@ def _save_retrieval_event(
             "embeddings_provider",
             "rerank_provider",
             "retrieval_mode",
+            "answer_cache",
         ]:
             if meta and k in meta:
                 retrieval[k] = meta[k]
@@ -678,26 +716,148 @@ def _save_retrieval_event(
             error=str(error or ""),
             created_at=dt.datetime.utcnow(),
         )
-        db.add(ev)
-        db.commit()
     except Exception as e:
-        logger.warning("写入检索事件失败 request_id=%s err=%s", request_id, e)
+        logger.warning("构造检索事件失败 request_id=%s err=%s", request_id, e)
+        return None
+    return ev
+
+
+def _write_retrieval_events(session_factory, events: list[RetrievalEvent]) -> None:
+    # 独立 Session：请求 Session 可能仍被超时后未结束的检索线程占用，不与其共用
+    with session_factory() as session:
         try:
-            db.rollback()
-        except Exception:
-            pass
+            session.add_all(events)
+            session.commit()
+        except Exception as e:
+            logger.warning("写入检索事件失败 count=%s err=%s", len(events), e)
+            try:
+                session.rollback()
+            except Exception:
+                pass
+
+
+async def _save_retrieval_event(**kwargs: Any) -> None:
+    """
+    记录检索事件：开启队列时只入队（后台任务批量写入，请求路径不等待 DB）；
+    队列已满则丢弃并告警（观测数据允许有损，不反压请求）。未开启队列时在线程池中同步写入。
+    """
+
+    ev = _build_retrieval_event(**kwargs)
+    if ev is None:
+        return
+    queue: asyncio.Queue | None = getattr(app.state, "retrieval_event_queue", None)
+    if queue is not None:
+        try:
+            queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            logger.warning("检索事件队列已满，丢弃 request_id=%s", ev.request_id)
+        return
+    await asyncio.to_thread(_write_retrieval_events, app.state.SessionLocal, [ev])
 
 
-def _chunk_text(text: str, *, chunk_size: int) -> list[str]:
+async def _retrieval_event_writer_loop(queue: asyncio.Queue) -> None:
+    while True:
+        batch = [await queue.get()]
+        while len(batch) < _RETRIEVAL_EVENT_BATCH_SIZE:
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            await asyncio.to_thread(_write_retrieval_events, app.state.SessionLocal, batch)
+        except Exception as e:
+            # 后台任务不能因单批失败退出
+            logger.warning("写入检索事件失败 count=%s err=%s", len(batch), e)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+def _chat_completion_response(*, chat_id: str, created: int, model: str, rag: RagAnswer) -> JSONResponse:
+    resp = OpenAIChatCompletionsResponse(
+        id=chat_id,
+        created=created,
+        model=model,
+        choices=[
+            OpenAIChatCompletionsResponseChoice(
+                index=0,
+                message=OpenAIChatCompletionsResponseChoiceMessage(role="assistant", content=rag.answer),
+                finish_reason="stop",
+            )
+        ],
+        usage=OpenAIUsage(**(rag.usage or {})),
+        sources=rag.sources,  # type: ignore[arg-type]
+        debug=rag.debug,
+    )
+    return JSONResponse(resp.model_dump())
+
+
+def _chunk_text(text: str, *, chunk_size: int) -> Iterator[str]:
+    # 惰性切分：边切边发，不预先物化整个分片列表
     if chunk_size <= 0:
-        return [text]
-    return [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        yield text
+        return
+    for i in range(0, len(text), chunk_size):
+        yield text[i : i + chunk_size]
+
 
+def _sse(obj: Any) -> bytes:
+    # orjson 直接产出 UTF-8 bytes（等价 ensure_ascii=False + 紧凑分隔符），流式每个 chunk 少一次 str 编码
+    return _SSE_PREFIX + orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS) + _SSE_SUFFIX
 
-def json_dumps(obj) -> str:
-    import json
 
-    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+def _resolve_chat_target(
+    session_factory: sessionmaker,
+    *,
+    settings: Settings,
+    model_map: dict[str, str],
+    model: str,
+) -> tuple[str, str, list[KbAllocation] | None, str, dict[str, str]]:
+    """
+    按请求的 model 解析 (workspace_id, app_id, kb_allocations, upstream_model, prompt_templates)。
+    同步 DB 查询，由调用方放到线程池执行；Session 在线程内创建并关闭。
+    """
+
+    with session_factory() as db:
+        workspace_id = "default"
+        app_id = ""
+        kb_allocations = None
+
+        app_row = db.scalar(select(RagApp).where(RagApp.public_model_id == model))
+        if app_row:
+            if (app_row.status or "").lower() != "published":
+                raise HTTPException(status_code=404, detail="model not found")
+            workspace_id = str(app_row.workspace_id or "default")
+            app_id = str(app_row.id or "")
+
+            binding_rows = db.scalars(
+                select(RagAppKnowledgeBase)
+                .where(RagAppKnowledgeBase.workspace_id == workspace_id)
+                .where(RagAppKnowledgeBase.app_id == app_id)
+                .where(RagAppKnowledgeBase.enabled.is_(True))
+                .order_by(RagAppKnowledgeBase.priority.asc(), RagAppKnowledgeBase.id.asc())
+            ).all()
+            bindings = [
+                KbBinding(kb_id=b.kb_id, weight=float(b.weight or 0.0), priority=int(b.priority or 0))
+                for b in binding_rows
+                if (b.kb_id or "").strip() and float(b.weight or 0.0) > 0.0
+            ]
+            if not bindings:
+                bindings = [KbBinding(kb_id="default", weight=1.0, priority=0)]
+            kb_allocations = allocate_top_k(bindings, total_k=int(settings.rag_top_k))
+
+            chat_cfg = dict((app_row.config or {}).get("chat") or {})
+            upstream_model = str(chat_cfg.get("model") or settings.chat_model)
+        else:
+            if model in model_map:
+                upstream_model = model_map[model]
+            elif settings.chat_model_passthrough:
+                upstream_model = model
+            else:
+                upstream_model = settings.chat_model
+
+        prompt_templates = _load_kb_prompt_templates(db, workspace_id, kb_allocations)
+        return workspace_id, app_id, kb_allocations, upstream_model, prompt_templates
 
 
 def _load_kb_prompt_templates(db: Session, workspace_id: str, kb_allocations: list[KbAllocation] | None) -> dict[str, str]:
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+from functools import lru_cache
+from typing import Literal
 
 from pydantic import AnyUrl, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -13,6 +15,14 @@ class Settings(BaseSettings):
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
 
     database_url: str = Field(alias="DATABASE_URL")
+    # SQLAlchemy 连接池（每个进程一份）；前置 PgBouncer（transaction 模式）时 DATABASE_URL 指向 PgBouncer 即可
+    db_pool_size: int = Field(default=20, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout_s: float = Field(default=30.0, alias="DB_POOL_TIMEOUT_S")
+    db_pool_recycle_s: int = Field(default=3600, alias="DB_POOL_RECYCLE_S")
+    # 连接池模式：queue（默认，进程内 QueuePool）/ pgbouncer（NullPool，连接复用交给 PgBouncer，上面四项不生效）
+    # Literal 约束：拼错（如 pgbouncr）时启动即报错，而不是静默退回 QueuePool
+    db_pool_mode: Literal["queue", "pgbouncer"] = Field(default="queue", alias="DB_POOL_MODE")
     pgvector_embedding_dim: int = Field(default=768, alias="PGVECTOR_EMBEDDING_DIM")
 
     crawl_base_url: AnyUrl = Field(default="https://developer.onekey.so/", alias="CRAWL_BASE_URL")
@@ -30,11 +40,19 @@ class Settings(BaseSettings):
     rag_snippet_max_chars: int = Field(default=360, alias="RAG_SNIPPET_MAX_CHARS")
     rag_prepare_timeout_s: float = Field(default=25.0, alias="RAG_PREPARE_TIMEOUT_S")
     rag_total_timeout_s: float = Field(default=120.0, alias="RAG_TOTAL_TIMEOUT_S")
+    # 检索/上下文准备阶段的并发上限（LLM 生成阶段不占名额）
     max_concurrent_chat_requests: int = Field(default=12, alias="MAX_CONCURRENT_CHAT_REQUESTS")
 
     # Query embedding 缓存（提高 QPS/降低 CPU；多实例下为“每实例缓存”）
     query_embed_cache_size: int = Field(default=512, alias="QUERY_EMBED_CACHE_SIZE")
     query_embed_cache_ttl_s: float = Field(default=600.0, alias="QUERY_EMBED_CACHE_TTL_S")
+    # 并发 query 向量化合并批处理：窗口内（毫秒）最多攒 N 条合并为一次 embedding 调用；默认关闭
+    embed_batching_enabled: bool = Field(default=False, alias="EMBED_BATCHING_ENABLED")
+    embed_batch_window_ms: float = Field(default=20.0, alias="EMBED_BATCH_WINDOW_MS")
+    embed_batch_max_size: int = Field(default=32, alias="EMBED_BATCH_MAX_SIZE")
+    # 非流式问答结果精确匹配缓存（同一对话/模型/KB/采样参数直接复用答案，跳过检索与 LLM）；0 表示关闭
+    answer_cache_size: int = Field(default=0, alias="ANSWER_CACHE_SIZE")
+    answer_cache_ttl_s: float = Field(default=300.0, alias="ANSWER_CACHE_TTL_S")
 
     # 检索策略：vector / hybrid（BM25+向量）
     retrieval_mode: str = Field(default="hybrid", alias="RETRIEVAL_MODE")
@@ -73,6 +91,9 @@ class Settings(BaseSettings):
     chat_model: str = Field(default="gpt-4o-mini", alias="CHAT_MODEL")
     chat_timeout_s: float = Field(default=60.0, alias="CHAT_TIMEOUT_S")
     chat_max_retries: int = Field(default=2, alias="CHAT_MAX_RETRIES")
+    # 上游 Chat 共享 HTTP 连接池（OpenAI/OpenAI-compatible）：总连接上限、保持的空闲 keep-alive 连接数
+    chat_http_max_connections: int = Field(default=256, alias="CHAT_HTTP_MAX_CONNECTIONS")
+    chat_http_max_keepalive: int = Field(default=64, alias="CHAT_HTTP_MAX_KEEPALIVE")
 
     chat_default_temperature: float = Field(default=0.2, alias="CHAT_DEFAULT_TEMPERATURE")
     chat_default_top_p: float = Field(default=1.0, alias="CHAT_DEFAULT_TOP_P")
@@ -106,9 +127,18 @@ class Settings(BaseSettings):
     admin_password: str = Field(default="", alias="ADMIN_PASSWORD")
     admin_jwt_secret: str = Field(default="replace-me", alias="ADMIN_JWT_SECRET")
     admin_jwt_expires_s: int = Field(default=3600, alias="ADMIN_JWT_EXPIRES_S")
+    # 签名算法：HS256（标准 JWT，默认）/ BLAKE2b（keyed BLAKE2b MAC，更快，仅限本服务内部校验）
+    # Literal 约束：取值错误时 get_settings() 启动即报错，而不是等到首次登录/验签才失败
+    admin_jwt_alg: Literal["HS256", "BLAKE2b"] = Field(default="HS256", alias="ADMIN_JWT_ALG")
+    # workspace 概览统计的物化视图刷新间隔（秒）；0 表示关闭，概览始终实时聚合
+    summary_mv_refresh_s: float = Field(default=0.0, alias="SUMMARY_MV_REFRESH_S")
 
     # ========== Observability（仅存检索元数据）==========
     retrieval_events_enabled: bool = Field(default=True, alias="RETRIEVAL_EVENTS_ENABLED")
+    # 检索事件异步写入队列长度（后台批量 INSERT，请求路径不等待 DB）；0 表示关闭，每次请求直接写入
+    retrieval_events_queue_size: int = Field(default=10000, alias="RETRIEVAL_EVENTS_QUEUE_SIZE")
+    # 检索事件小时级汇总表（触发器增量维护）；开启后可观测看板读汇总桶而不是逐行扫描 retrieval_events
+    observability_rollup_enabled: bool = Field(default=False, alias="OBSERVABILITY_ROLLUP_ENABLED")
     node_exporter_base_url: str | None = Field(default=None, alias="NODE_EXPORTER_BASE_URL")
 
     # ========== Langfuse（可选：上报 LangChain 回调）==========
@@ -173,5 +203,7 @@ class Settings(BaseSettings):
         return result
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
+    # 配置只在进程启动时加载一次；避免每个请求依赖注入时重复解析环境变量与 .env
     return Settings()
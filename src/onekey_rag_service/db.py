@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import datetime as dt
 import logging
 
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from onekey_rag_service.config import Settings
 
@@ -13,7 +15,17 @@ logger = logging.getLogger(__name__)
 
 
 def create_db_engine(settings: Settings) -> Engine:
-    return create_engine(settings.database_url, pool_pre_ping=True)
+    # PgBouncer（transaction 模式）已在外部做连接池：进程内不再常驻连接，用完即还给 PgBouncer
+    if settings.db_pool_mode == "pgbouncer":
+        return create_engine(settings.database_url, poolclass=NullPool)
+    return create_engine(
+        settings.database_url,
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_s,
+        pool_recycle=settings.db_pool_recycle_s,
+    )
 
 
 def create_session_factory(engine: Engine) -> sessionmaker:
@@ -32,6 +44,373 @@ def ensure_indexes(engine: Engine, settings: Settings) -> None:
     _ensure_embedding_dimension(engine, settings)
     _ensure_pgvector_index(engine, settings)
     _ensure_fts_index(engine, settings)
+    _ensure_trgm_indexes(engine)
+    _ensure_tdigest_extension(engine)
+
+
+_WORKSPACE_SUMMARY_MV_SQL = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_workspace_summary AS
+WITH pg AS (
+  SELECT
+    workspace_id,
+    COUNT(*) AS pages_total,
+    COUNT(*) FILTER (WHERE http_status <> 200) AS pages_failed,
+    COUNT(*) FILTER (WHERE last_crawled_at >= now() - interval '24 hours') AS pages_24h,
+    MAX(last_crawled_at) AS last_crawled_at
+  FROM pages
+  GROUP BY workspace_id
+),
+ck AS (
+  SELECT
+    p.workspace_id,
+    COUNT(*) AS chunks_total,
+    COUNT(*) FILTER (WHERE c.embedding IS NOT NULL) AS chunks_with_embedding
+  FROM chunks c
+  JOIN pages p ON p.id = c.page_id
+  GROUP BY p.workspace_id
+),
+em AS (
+  SELECT workspace_id, json_object_agg(model, cnt ORDER BY cnt DESC) AS embedding_models
+  FROM (
+    SELECT p.workspace_id, c.embedding_model AS model, COUNT(*) AS cnt
+    FROM chunks c
+    JOIN pages p ON p.id = c.page_id
+    WHERE btrim(COALESCE(c.embedding_model, '')) <> ''
+    GROUP BY p.workspace_id, c.embedding_model
+  ) t
+  GROUP BY workspace_id
+),
+fb AS (
+  SELECT
+    workspace_id,
+    COUNT(*) AS feedback_total,
+    COUNT(*) FILTER (WHERE rating = 'up') AS feedback_up,
+    COUNT(*) FILTER (WHERE rating = 'down') AS feedback_down
+  FROM feedback
+  GROUP BY workspace_id
+),
+ws AS (
+  SELECT workspace_id FROM pg
+  UNION
+  SELECT workspace_id FROM fb
+)
+SELECT
+  ws.workspace_id,
+  COALESCE(pg.pages_total, 0) AS pages_total,
+  COALESCE(pg.pages_failed, 0) AS pages_failed,
+  COALESCE(pg.pages_24h, 0) AS pages_24h,
+  pg.last_crawled_at,
+  COALESCE(ck.chunks_total, 0) AS chunks_total,
+  COALESCE(ck.chunks_with_embedding, 0) AS chunks_with_embedding,
+  COALESCE(em.embedding_models, '{}'::json) AS embedding_models,
+  COALESCE(fb.feedback_total, 0) AS feedback_total,
+  COALESCE(fb.feedback_up, 0) AS feedback_up,
+  COALESCE(fb.feedback_down, 0) AS feedback_down,
+  now() AS refreshed_at
+FROM ws
+LEFT JOIN pg ON pg.workspace_id = ws.workspace_id
+LEFT JOIN ck ON ck.workspace_id = ws.workspace_id
+LEFT JOIN em ON em.workspace_id = ws.workspace_id
+LEFT JOIN fb ON fb.workspace_id = ws.workspace_id
+WITH NO DATA
+"""
+
+
+def ensure_summary_views(engine: Engine, settings: Settings) -> None:
+    """
+    创建 workspace 概览统计的物化视图（仅 SUMMARY_MV_REFRESH_S > 0 时）。
+
+    说明：
+    - 以 WITH NO DATA 创建，避免启动时阻塞在全表聚合；首次数据由 refresh_summary_views 填充。
+    - workspace_id 唯一索引是 REFRESH ... CONCURRENTLY 的前提。
+    """
+
+    if float(settings.summary_mv_refresh_s or 0) <= 0:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(_WORKSPACE_SUMMARY_MV_SQL))
+            conn.execute(
+                text("CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_workspace_summary_ws ON mv_workspace_summary (workspace_id)")
+            )
+    except Exception as e:
+        logger.warning("确保 mv_workspace_summary 失败：%s", e)
+
+
+def refresh_summary_views(engine: Engine) -> None:
+    """
+    刷新概览物化视图：已有数据时用 CONCURRENTLY（不阻塞读），首次（未填充）时只能普通刷新。
+    """
+
+    with engine.begin() as conn:
+        populated = conn.execute(
+            text("SELECT relispopulated FROM pg_class WHERE oid = to_regclass('mv_workspace_summary')")
+        ).scalar()
+        if populated is None:
+            return
+        if populated:
+            conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_workspace_summary"))
+        else:
+            conn.execute(text("REFRESH MATERIALIZED VIEW mv_workspace_summary"))
+
+
+# ========== 检索事件小时级汇总（observability_summary 读汇总桶，不再逐行解析 JSON）==========
+
+def _json_num_sql(col: str, key: str, typ: str = "double precision") -> str:
+    """
+    JSON 数值字段的安全取值：只有 JSON number 才转型，其它（缺失/字符串/null）为 NULL。
+    写入路径（触发器、生成列）上不能用裸 ::cast，否则一条脏数据会让整条 INSERT 失败。
+    """
+
+    raw = f"({col}->>'{key}')"
+    # bigint 先经 numeric：JSON 里的 12.0 也能转型
+    num = f"{raw}::numeric::bigint" if typ == "bigint" else f"{raw}::{typ}"
+    return f"CASE WHEN json_typeof({col}->'{key}') = 'number' THEN {num} END"
+
+
+# 从 retrieval_events（或触发器的 transition table）抽取聚合所需的标量列；JSON 解析只在写入时做一次
+_ROLLUP_EV_SQL = f"""
+ev AS (
+  SELECT
+    workspace_id,
+    date_trunc('hour', COALESCE(created_at, now())) AS bucket_hour,
+    app_id,
+    ARRAY(
+      SELECT json_array_elements_text(CASE WHEN json_typeof(kb_ids)='array' THEN kb_ids ELSE '[]'::json END)
+    ) AS kb_ids,
+    COALESCE(retrieval->>'upstream_chat_model', '') AS model,
+    error,
+    CASE WHEN json_typeof(sources->'items')='array' THEN json_array_length(sources->'items') > 0 ELSE false END AS hit,
+    {_json_num_sql("timings_ms", "total_prepare")} AS prepare_ms,
+    {_json_num_sql("timings_ms", "embed")} AS embed_ms,
+    {_json_num_sql("timings_ms", "retrieve")} AS retrieve_ms,
+    {_json_num_sql("timings_ms", "rerank")} AS rerank_ms,
+    {_json_num_sql("timings_ms", "context")} AS context_ms,
+    {_json_num_sql("timings_ms", "chat")} AS chat_ms,
+    {_json_num_sql("timings_ms", "total")} AS total_ms,
+    COALESCE({_json_num_sql("retrieval", "retrieved")}, 0) AS retrieved,
+    CASE WHEN json_typeof(retrieval->'top_chunk_ids')='array' THEN json_array_length(retrieval->'top_chunk_ids') ELSE 0 END AS topn,
+    COALESCE({_json_num_sql("token_usage", "prompt_tokens", "bigint")}, 0) AS prompt_tokens,
+    COALESCE({_json_num_sql("token_usage", "completion_tokens", "bigint")}, 0) AS completion_tokens,
+    COALESCE({_json_num_sql("token_usage", "total_tokens", "bigint")}, 0) AS total_tokens
+  FROM {{src}}
+)
+"""
+
+# 可累加的计数/求和列（均值 = sum / n，在查询端按桶合并后再算）
+_ROLLUP_MEASURES = (
+    "requests",
+    "errors",
+    "hits",
+    "prepare_sum",
+    "prepare_n",
+    "prepare_nz_n",
+    "embed_sum",
+    "embed_n",
+    "retrieve_sum",
+    "retrieve_n",
+    "rerank_sum",
+    "rerank_n",
+    "context_sum",
+    "context_n",
+    "chat_sum",
+    "chat_n",
+    "total_sum",
+    "total_n",
+    "retrieved_sum",
+    "topn_sum",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+)
+
+_ROLLUP_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS retrieval_events_rollup_1h (
+  workspace_id varchar(64) NOT NULL,
+  bucket_hour timestamptz NOT NULL,
+  app_id varchar(64) NOT NULL,
+  kb_ids text[] NOT NULL,
+  model text NOT NULL,
+  {", ".join(f"{m} {'double precision' if m.endswith('_sum') else 'bigint'} NOT NULL DEFAULT 0" for m in _ROLLUP_MEASURES)},
+  PRIMARY KEY (workspace_id, bucket_hour, app_id, kb_ids, model)
+)
+"""
+
+# 分布类指标（错误码 / topK / total_prepare 延迟对数桶）按 (dim, bucket) 计数，p50/p95 由直方图估算，免去 percentile 排序
+_ROLLUP_HIST_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS retrieval_events_hist_1h (
+  workspace_id varchar(64) NOT NULL,
+  bucket_hour timestamptz NOT NULL,
+  app_id varchar(64) NOT NULL,
+  dim varchar(16) NOT NULL,
+  bucket text NOT NULL,
+  cnt bigint NOT NULL DEFAULT 0,
+  PRIMARY KEY (workspace_id, bucket_hour, app_id, dim, bucket)
+)
+"""
+
+# total_prepare 延迟直方图的对数桶底数：桶 i 覆盖 [1.1^i - 1, 1.1^(i+1) - 1) ms，相对误差约 5%
+ROLLUP_LATENCY_LOG_BASE = 1.1
+
+
+# 直方图各维度的分桶表达式；返回 NULL 的行不计入（例如没有 total_prepare 的缓存命中/失败事件，
+# 与逐行聚合 percentile_cont 忽略 NULL 的口径一致）。注意 GREATEST 会忽略 NULL，必须先判空
+_ROLLUP_HIST_DIMS = {
+    "error": (
+        "left(CASE WHEN ev.error = '' THEN 'ok' WHEN position(':' in ev.error) > 0 "
+        "THEN split_part(ev.error, ':', 1) ELSE ev.error END, 200)"
+    ),
+    "retrieved": "round(ev.retrieved)::bigint::text",
+    "prepare_ms": (
+        "CASE WHEN ev.prepare_ms IS NULL THEN NULL "
+        f"ELSE floor(ln(1 + GREATEST(ev.prepare_ms, 0)) / ln({ROLLUP_LATENCY_LOG_BASE}))::bigint::text END"
+    ),
+}
+
+
+def _rollup_upsert_sql(src: str) -> tuple[str, str]:
+    ev = _ROLLUP_EV_SQL.format(src=src)
+    dim_values = ",\n    ".join(f"('{d}', {expr})" for d, expr in _ROLLUP_HIST_DIMS.items())
+    measures = ", ".join(_ROLLUP_MEASURES)
+    updates = ", ".join(f"{m} = r.{m} + EXCLUDED.{m}" for m in _ROLLUP_MEASURES)
+    rollup = f"""
+WITH {ev}
+INSERT INTO retrieval_events_rollup_1h AS r (workspace_id, bucket_hour, app_id, kb_ids, model, {measures})
+SELECT
+  workspace_id, bucket_hour, app_id, kb_ids, model,
+  COUNT(*),
+  COUNT(*) FILTER (WHERE error <> ''),
+  COUNT(*) FILTER (WHERE hit),
+  COALESCE(SUM(prepare_ms), 0), COUNT(prepare_ms), COUNT(NULLIF(prepare_ms, 0)),
+  COALESCE(SUM(embed_ms), 0), COUNT(embed_ms),
+  COALESCE(SUM(retrieve_ms), 0), COUNT(retrieve_ms),
+  COALESCE(SUM(rerank_ms), 0), COUNT(rerank_ms),
+  COALESCE(SUM(context_ms), 0), COUNT(context_ms),
+  COALESCE(SUM(chat_ms), 0), COUNT(chat_ms),
+  COALESCE(SUM(total_ms), 0), COUNT(total_ms),
+  SUM(retrieved), SUM(topn),
+  SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens)
+FROM ev
+GROUP BY workspace_id, bucket_hour, app_id, kb_ids, model
+ON CONFLICT (workspace_id, bucket_hour, app_id, kb_ids, model) DO UPDATE SET {updates}
+"""
+    hist = f"""
+WITH {ev}
+INSERT INTO retrieval_events_hist_1h AS h (workspace_id, bucket_hour, app_id, dim, bucket, cnt)
+SELECT ev.workspace_id, ev.bucket_hour, ev.app_id, d.dim, d.bucket, COUNT(*)
+FROM ev
+CROSS JOIN LATERAL (
+  VALUES
+    {dim_values}
+) AS d(dim, bucket)
+WHERE d.bucket IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT (workspace_id, bucket_hour, app_id, dim, bucket) DO UPDATE SET cnt = h.cnt + EXCLUDED.cnt
+"""
+    return rollup, hist
+
+
+def ensure_observability_rollup(engine: Engine, settings: Settings) -> None:
+    """
+    创建检索事件小时级汇总表与增量维护触发器（仅 OBSERVABILITY_ROLLUP_ENABLED=true 时）。
+
+    说明：
+    - 语句级 AFTER INSERT 触发器（transition table）按批聚合后 upsert，写入路径每条 INSERT 只多两次 upsert。
+    - 汇总表首次创建时从历史 retrieval_events 回填；与建触发器同一事务（CREATE TRIGGER 持锁阻塞写入），不丢不重。
+    - 只维护 INSERT：retrieval_events 的删除/清理不回写汇总（汇总保留历史趋势）。
+    """
+
+    if not settings.observability_rollup_enabled:
+        return
+    rollup_live, hist_live = _rollup_upsert_sql("new_rows")
+    rollup_backfill, hist_backfill = _rollup_upsert_sql("retrieval_events")
+    try:
+        with engine.begin() as conn:
+            existed = conn.execute(text("SELECT to_regclass('retrieval_events_rollup_1h') IS NOT NULL")).scalar()
+            conn.execute(text(_ROLLUP_TABLE_SQL))
+            conn.execute(text(_ROLLUP_HIST_TABLE_SQL))
+            conn.execute(
+                text(
+                    f"""
+                    CREATE OR REPLACE FUNCTION retrieval_events_rollup_fn() RETURNS trigger
+                    LANGUAGE plpgsql AS $fn$
+                    BEGIN
+                      {rollup_live};
+                      {hist_live};
+                      RETURN NULL;
+                    END
+                    $fn$
+                    """
+                )
+            )
+            conn.execute(text("DROP TRIGGER IF EXISTS trg_retrieval_events_rollup ON retrieval_events"))
+            conn.execute(
+                text(
+                    """
+                    CREATE TRIGGER trg_retrieval_events_rollup
+                    AFTER INSERT ON retrieval_events
+                    REFERENCING NEW TABLE AS new_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION retrieval_events_rollup_fn()
+                    """
+                )
+            )
+            if not existed:
+                conn.execute(text(rollup_backfill))
+                conn.execute(text(hist_backfill))
+    except Exception as e:
+        logger.warning("确保 retrieval_events 汇总表失败：%s", e)
+
+
+_RECENT_EVENTS_INDEX_PREFIX = "idx_retrieval_events_recent_"
+_RECENT_EVENTS_INDEX_DAYS = 2
+
+
+def rotate_recent_events_index(engine: Engine) -> None:
+    """
+    维护 retrieval_events 的"近期"部分索引（可观测看板默认看 24h）。
+
+    说明：
+    - 部分索引谓词不能用 now()（非 IMMUTABLE），因此按天用字面量 cutoff 建索引 idx_retrieval_events_recent_YYYYMMDD，
+      覆盖 UTC 当天 0 点往前 2 天之后的行；新索引就绪后删除旧的。
+    - psycopg2 在客户端绑参，查询里的 created_at >= :start 以字面量下发，planner 能推出命中该部分索引。
+    - CONCURRENTLY 不阻塞写入；多个 worker 用 advisory lock 保证同一时刻只有一个在重建。
+    """
+
+    cutoff = dt.datetime.now(dt.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - dt.timedelta(
+        days=_RECENT_EVENTS_INDEX_DAYS
+    )
+    name = f"{_RECENT_EVENTS_INDEX_PREFIX}{cutoff:%Y%m%d}"
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not conn.execute(text("SELECT pg_try_advisory_lock(hashtext('rotate_recent_events_index'))")).scalar():
+            return
+        try:
+            rows = conn.execute(
+                text(
+                    """
+                    SELECT c.relname, i.indisvalid
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE i.indrelid = to_regclass('retrieval_events')
+                    """
+                )
+            ).all()
+            existing = {str(n): bool(valid) for n, valid in rows if str(n).startswith(_RECENT_EVENTS_INDEX_PREFIX)}
+            # 上次 CONCURRENTLY 构建中断会留下无效索引，先删掉再建
+            if name in existing and not existing[name]:
+                conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                existing.pop(name)
+            if name not in existing:
+                conn.exec_driver_sql(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON retrieval_events (workspace_id, created_at) "
+                    "INCLUDE (app_id, prepare_ms, retrieve_ms, retrieved_n, total_tokens_n, has_items, has_error) "
+                    f"WHERE created_at >= '{cutoff.isoformat()}'"
+                )
+            for old in existing:
+                if old != name:
+                    conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {old}")
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext('rotate_recent_events_index'))"))
 
 
 def _is_safe_ident(name: str) -> bool:
@@ -124,52 +503,169 @@ def ensure_admin_schema(engine: Engine) -> None:
     约束：
     - 只做“加字段/加索引”，不做破坏性变更（不删列、不改约束）。
     - 使用 IF NOT EXISTS，保证多次启动幂等。
+    - 每段 DDL 在各自的 savepoint 里执行：某段失败只回滚该段并记日志，不连带回滚其它已成功的变更。
     """
 
     with engine.begin() as conn:
         # pages：workspace/kb/source 维度（当前阶段以 workspace 为隔离边界）
         try:
-            conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS workspace_id varchar(64) NOT NULL DEFAULT 'default'"))
-            conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS kb_id varchar(64) NOT NULL DEFAULT 'default'"))
-            conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS source_id varchar(64) NOT NULL DEFAULT ''"))
-
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pages_workspace_id ON pages (workspace_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pages_kb_id ON pages (kb_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pages_source_id ON pages (source_id)"))
+            with conn.begin_nested():
+                conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS workspace_id varchar(64) NOT NULL DEFAULT 'default'"))
+                conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS kb_id varchar(64) NOT NULL DEFAULT 'default'"))
+                conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS source_id varchar(64) NOT NULL DEFAULT ''"))
+                conn.execute(text("ALTER TABLE pages ADD COLUMN IF NOT EXISTS chunk_stats json"))
+
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pages_workspace_id ON pages (workspace_id)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pages_kb_id ON pages (kb_id)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_pages_source_id ON pages (source_id)"))
         except Exception as e:
             logger.warning("确保 pages 多租户字段失败：%s", e)
 
         # jobs：增加 scope 字段用于筛选与审计
         try:
-            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS workspace_id varchar(64) NOT NULL DEFAULT 'default'"))
-            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS kb_id varchar(64) NOT NULL DEFAULT 'default'"))
-            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS app_id varchar(64) NOT NULL DEFAULT ''"))
-            conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS source_id varchar(64) NOT NULL DEFAULT ''"))
-            # 若历史库已存在列，确保默认值符合当前约定
-            conn.execute(text("ALTER TABLE jobs ALTER COLUMN kb_id SET DEFAULT 'default'"))
-
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_workspace_id ON jobs (workspace_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_type_status ON jobs (type, status)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_kb_id ON jobs (kb_id)"))
+            with conn.begin_nested():
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS workspace_id varchar(64) NOT NULL DEFAULT 'default'"))
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS kb_id varchar(64) NOT NULL DEFAULT 'default'"))
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS app_id varchar(64) NOT NULL DEFAULT ''"))
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN IF NOT EXISTS source_id varchar(64) NOT NULL DEFAULT ''"))
+                # 若历史库已存在列，确保默认值符合当前约定
+                conn.execute(text("ALTER TABLE jobs ALTER COLUMN kb_id SET DEFAULT 'default'"))
+
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_workspace_id ON jobs (workspace_id)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_type_status ON jobs (type, status)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_jobs_kb_id ON jobs (kb_id)"))
         except Exception as e:
             logger.warning("确保 jobs 多租户字段失败：%s", e)
 
         # feedback：增加 workspace/app 维度
         try:
-            conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS workspace_id varchar(64) NOT NULL DEFAULT 'default'"))
-            conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS app_id varchar(64) NOT NULL DEFAULT ''"))
-            conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS status varchar(16) NOT NULL DEFAULT 'new'"))
-            conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS attribution varchar(32) NOT NULL DEFAULT ''"))
-            conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS tags json NOT NULL DEFAULT '[]'::json"))
-            conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now()"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_workspace_id ON feedback (workspace_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_app_id ON feedback (app_id)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_status ON feedback (status)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_attribution ON feedback (attribution)"))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_updated_at ON feedback (updated_at)"))
+            with conn.begin_nested():
+                conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS workspace_id varchar(64) NOT NULL DEFAULT 'default'"))
+                conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS app_id varchar(64) NOT NULL DEFAULT ''"))
+                conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS status varchar(16) NOT NULL DEFAULT 'new'"))
+                conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS attribution varchar(32) NOT NULL DEFAULT ''"))
+                conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS tags json NOT NULL DEFAULT '[]'::json"))
+                conn.execute(text("ALTER TABLE feedback ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now()"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_workspace_id ON feedback (workspace_id)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_app_id ON feedback (app_id)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_status ON feedback (status)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_attribution ON feedback (attribution)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS idx_feedback_updated_at ON feedback (updated_at)"))
         except Exception as e:
             logger.warning("确保 feedback 多租户字段失败：%s", e)
 
+        # pages：列表页 changed/indexed 过滤是跨列比较/常量比较，普通 btree 用不上；
+        # 部分索引与过滤条件完全一致，同时覆盖 workspace 过滤与 last_crawled_at 倒序
+        try:
+            with conn.begin_nested():
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_pages_ws_changed ON pages (workspace_id, last_crawled_at DESC) "
+                        "WHERE content_hash <> indexed_content_hash"
+                    )
+                )
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_pages_ws_unindexed ON pages (workspace_id, last_crawled_at DESC) "
+                        "WHERE indexed_content_hash = ''"
+                    )
+                )
+        except Exception as e:
+            logger.warning("确保 pages 过滤部分索引失败：%s", e)
+
+        # jobs：列表页按 workspace 过滤 + started_at 倒序分页；INCLUDE 常用过滤列，筛选时无需回表判断
+        # error/payload/progress 可能很长，不放进索引（btree 元组有大小上限）
+        try:
+            with conn.begin_nested():
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_jobs_ws_started_desc ON jobs (workspace_id, started_at DESC) "
+                        "INCLUDE (status, type, kb_id, app_id, source_id)"
+                    )
+                )
+        except Exception as e:
+            logger.warning("确保 jobs 列表索引失败：%s", e)
+
+        # feedback / retrieval_events 列表：按 (created_at, id) 倒序 keyset 翻页，索引定位起点后顺序读 page_size 行
+        for table in ("feedback", "retrieval_events"):
+            try:
+                with conn.begin_nested():
+                    conn.execute(
+                        text(
+                            f"CREATE INDEX IF NOT EXISTS idx_{table}_ws_created_id "
+                            f"ON {table} (workspace_id, created_at DESC, id DESC)"
+                        )
+                    )
+            except Exception as e:
+                logger.warning("确保 %s keyset 分页索引失败：%s", table, e)
+
+        # retrieval_events：可观测聚合的热点 JSON 标量投影为 STORED 生成列（写入时解析一次，聚合读定长列）
+        # 多个 ADD COLUMN 合并为一条 ALTER，只重写一次表；列不进 ORM 模型，仅供原生 SQL 聚合使用
+        # 生成表达式必须是安全转型：表达式在每次 INSERT 时求值，裸 ::cast 遇到脏值会让写入失败
+        # 大表注意：ADD COLUMN ... STORED 在 ACCESS EXCLUSIVE 锁下重写整表；大库应在维护窗口手动执行同样的 DDL
+        # （索引用 CREATE INDEX CONCURRENTLY），之后启动时这里因 IF NOT EXISTS 成为空操作
+        try:
+            with conn.begin_nested():
+                # 拿不到锁就放弃（下次启动再试），不在锁队列里堵住后续的检索事件写入
+                conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                conn.execute(
+                    text(
+                        f"""
+                        ALTER TABLE retrieval_events
+                          ADD COLUMN IF NOT EXISTS prepare_ms double precision
+                            GENERATED ALWAYS AS ({_json_num_sql("timings_ms", "total_prepare")}) STORED,
+                          ADD COLUMN IF NOT EXISTS retrieve_ms double precision
+                            GENERATED ALWAYS AS ({_json_num_sql("timings_ms", "retrieve")}) STORED,
+                          ADD COLUMN IF NOT EXISTS retrieved_n double precision
+                            GENERATED ALWAYS AS ({_json_num_sql("retrieval", "retrieved")}) STORED,
+                          ADD COLUMN IF NOT EXISTS total_tokens_n bigint
+                            GENERATED ALWAYS AS ({_json_num_sql("token_usage", "total_tokens", "bigint")}) STORED,
+                          ADD COLUMN IF NOT EXISTS has_items boolean
+                            GENERATED ALWAYS AS (
+                              CASE WHEN json_typeof(sources->'items')='array' THEN json_array_length(sources->'items') > 0 ELSE false END
+                            ) STORED,
+                          ADD COLUMN IF NOT EXISTS has_error boolean
+                            GENERATED ALWAYS AS (error <> '') STORED
+                        """
+                    )
+                )
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_retrieval_events_ws_created_cov ON retrieval_events (workspace_id, created_at) "
+                        "INCLUDE (app_id, prepare_ms, retrieve_ms, retrieved_n, total_tokens_n, has_items, has_error)"
+                    )
+                )
+                # SET LOCAL 在 savepoint 释放后仍对整个事务生效：恢复默认，不影响后面的 DDL
+                conn.execute(text("SET LOCAL lock_timeout = DEFAULT"))
+        except Exception as e:
+            logger.warning("确保 retrieval_events 生成列失败：%s", e)
+
+        # retrieval_events：kb_ids 为 JSON 列，按表达式 (kb_ids::jsonb) 建 jsonb_path_ops GIN，配合 @> 包含查询
+        # 不整表改 JSONB：ALTER TYPE 会重写大表，且可观测/汇总 SQL 依赖 json_* 函数
+        try:
+            with conn.begin_nested():
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_retrieval_events_kb_ids_gin "
+                        "ON retrieval_events USING gin ((kb_ids::jsonb) jsonb_path_ops)"
+                    )
+                )
+        except Exception as e:
+            logger.warning("确保 retrieval_events.kb_ids GIN 索引失败：%s", e)
+
+        # rerank 效果抽样（最新 500 条 rerank_used=true）：部分索引按 id 倒序直接取，不扫窗口内全部事件
+        try:
+            with conn.begin_nested():
+                conn.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS idx_retrieval_events_ws_rerank "
+                        "ON retrieval_events (workspace_id, id DESC) WHERE (retrieval->>'rerank_used') = 'true'"
+                    )
+                )
+        except Exception as e:
+            logger.warning("确保 retrieval_events rerank 部分索引失败：%s", e)
+
+
 def _ensure_embedding_dimension(engine: Engine, settings: Settings) -> None:
     """
     兼容历史库：早期 embedding 列可能是 vector（无维度）。
@@ -291,3 +787,46 @@ def _ensure_fts_index(engine: Engine, settings: Settings) -> None:
             )
         except Exception as e:
             logger.warning("创建 FTS(GIN) 索引失败：%s", e)
+
+
+_TRGM_INDEXES = (
+    ("idx_jobs_id_trgm", "jobs", "id"),
+    ("idx_jobs_error_trgm", "jobs", "error"),
+    ("idx_pages_url_trgm", "pages", "url"),
+    ("idx_pages_title_trgm", "pages", "title"),
+)
+
+
+def _ensure_tdigest_extension(engine: Engine) -> None:
+    """
+    可观测看板的延迟分位数优先用 tdigest 扩展（流式 sketch，免排序）；扩展未安装时跳过，查询回退 percentile_cont。
+    """
+
+    with engine.begin() as conn:
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS tdigest"))
+        except Exception as e:
+            logger.info("tdigest 扩展不可用（分位数使用 percentile_cont）：%s", e)
+
+
+def _ensure_trgm_indexes(engine: Engine) -> None:
+    """
+    Admin 列表的关键词搜索（ILIKE '%q%'）走 pg_trgm GIN 索引，避免大表全表扫描。
+    jobs.id 也要建：OR 条件两侧都有索引时 planner 才能走 BitmapOr。
+    """
+
+    with engine.begin() as conn:
+        try:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        except Exception as e:
+            logger.warning("创建 pg_trgm 扩展失败（跳过 trigram 索引）：%s", e)
+            return
+
+    for idx_name, table, column in _TRGM_INDEXES:
+        with engine.begin() as conn:
+            try:
+                conn.execute(
+                    text(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table} USING gin ({column} gin_trgm_ops)")
+                )
+            except Exception as e:
+                logger.warning("创建 trigram 索引 %s 失败：%s", idx_name, e)
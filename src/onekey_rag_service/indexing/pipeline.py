@@ -74,12 +74,14 @@ def _rebuild_page_chunks(
         overlap_chars=chunk_overlap_chars,
     )
     if not chunk_items:
+        page.chunk_stats = {"total": 0, "with_embedding": 0, "embedding_models": {}}
         return 0
 
     texts = [ci.text for ci in chunk_items]
     vectors = embeddings.embed_documents(texts)
 
     inserted = 0
+    with_embedding = 0
     for idx, (ci, vec) in enumerate(zip(chunk_items, vectors, strict=False)):
         chunk = Chunk(
             page_id=page.id,
@@ -93,7 +95,15 @@ def _rebuild_page_chunks(
         )
         session.add(chunk)
         inserted += 1
-
+        if vec is not None:
+            with_embedding += 1
+
+    # 与 chunks 同事务写入，Admin 页面详情直接读取，无需再聚合 chunks
+    page.chunk_stats = {
+        "total": inserted,
+        "with_embedding": with_embedding,
+        "embedding_models": ({embedding_model_name: inserted} if (embedding_model_name or "").strip() else {}),
+    }
     return inserted
 
 
@@ -144,6 +144,8 @@ class Page(Base):
     http_status: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     last_crawled_at: Mapped[dt.datetime] = mapped_column(DateTime(timezone=True), default=dt.datetime.utcnow)
     meta: Mapped[dict] = mapped_column(JSON, default=dict, nullable=False)
+    # 索引时写入的分块统计：{total, with_embedding, embedding_models}；NULL 表示历史数据尚未回填
+    chunk_stats: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 
     chunks: Mapped[list["Chunk"]] = relationship(back_populates="page", cascade="all, delete-orphan")
 
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import hashlib
+import threading
+import time
+from typing import Any
+
+import orjson
+
+from onekey_rag_service.rag.pipeline import RagAnswer
+
+
+class AnswerCache:
+    """
+    非流式问答结果的精确匹配缓存（进程内 LRU + TTL；多实例下为“每实例缓存”）。
+
+    key 覆盖所有影响回答的输入（workspace/app/上游模型/完整对话/KB 分配/模板/采样参数），
+    任一不同即视为不同请求。
+    """
+
+    def __init__(self, *, max_size: int = 256, ttl_s: float = 300.0) -> None:
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self._cache: collections.OrderedDict[str, tuple[float, RagAnswer]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        # OPT_SORT_KEYS：dict 字段顺序不影响 key；dataclass（KbAllocation）由 orjson 原生序列化
+        return hashlib.sha256(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def get(self, key: str) -> RagAnswer | None:
+        """
+        命中时返回去掉 usage 与 meta.timings_ms 的副本：命中没有调用上游、也没有检索耗时，
+        沿用原请求的 token/耗时会让计费重复计入、污染延迟统计。
+        """
+
+        answer = self._get(key)
+        if answer is None:
+            return None
+        meta = {k: v for k, v in (answer.meta or {}).items() if k != "timings_ms"}
+        return dataclasses.replace(answer, usage=None, meta=meta)
+
+    def _get(self, key: str) -> RagAnswer | None:
+        now = time.time()
+        with self._lock:
+            item = self._cache.get(key)
+            if not item:
+                return None
+            ts, answer = item
+            if self.ttl_s > 0 and (now - ts) > self.ttl_s:
+                self._cache.pop(key, None)
+                return None
+            self._cache.move_to_end(key)
+            return answer
+
+    def put(self, key: str, answer: RagAnswer) -> None:
+        with self._lock:
+            self._cache[key] = (time.time(), answer)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
@@ -5,6 +5,8 @@ from dataclasses import dataclass
 from typing import Any, AsyncIterator
 from urllib.parse import urlparse, urlunparse
 
+import httpx
+
 from onekey_rag_service.config import Settings
 
 
@@ -26,6 +28,9 @@ class ChatProvider:
         result = await self.complete(model=model, messages=messages, callbacks=callbacks, **kwargs)
         yield result.content
 
+    async def aclose(self) -> None:
+        return None
+
 
 @dataclass(frozen=True)
 class LangChainInitChatProvider(ChatProvider):
@@ -34,6 +39,22 @@ class LangChainInitChatProvider(ChatProvider):
     api_key: str
     timeout_s: float = 60.0
     max_retries: int = 2
+    max_connections: int = 256
+    max_keepalive_connections: int = 64
+
+    def __post_init__(self) -> None:
+        # 每次请求都会新建 ChatModel；不共享 HTTP 客户端时每次都新建连接池（新 TCP + TLS 握手）。
+        # OpenAI（含 OpenAI-compatible）provider 共享一个进程级 AsyncClient，复用 keep-alive 连接。
+        client = None
+        if (self.model_provider or "openai").lower() == "openai":
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                timeout=self.timeout_s,
+            )
+        object.__setattr__(self, "_http_async_client", client)
 
     def _build_model(
         self,
@@ -67,6 +88,8 @@ class LangChainInitChatProvider(ChatProvider):
         }
         if callbacks:
             kwargs["callbacks"] = callbacks
+        if self._http_async_client is not None:
+            kwargs["http_async_client"] = self._http_async_client
 
         if self.model_provider:
             kwargs["model_provider"] = self.model_provider
@@ -146,6 +169,10 @@ class LangChainInitChatProvider(ChatProvider):
             if text:
                 yield text
 
+    async def aclose(self) -> None:
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+
 
 def _extract_usage(msg: Any) -> dict[str, int] | None:
     usage_meta = getattr(msg, "usage_metadata", None)
@@ -235,6 +262,8 @@ def build_chat_provider(settings: Settings) -> ChatProvider | None:
             api_key=settings.chat_api_key,
             timeout_s=settings.chat_timeout_s,
             max_retries=settings.chat_max_retries,
+            max_connections=settings.chat_http_max_connections,
+            max_keepalive_connections=settings.chat_http_max_keepalive,
         )
 
     raise RuntimeError(f"未知 CHAT_PROVIDER: {settings.chat_provider}")
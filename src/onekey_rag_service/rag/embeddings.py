@@ -3,8 +3,10 @@ from __future__ import annotations
 import collections
 import hashlib
 import math
+import queue
 import threading
 import time
+from concurrent.futures import Future
 from dataclasses import dataclass
 from typing import Callable
 
@@ -80,6 +82,68 @@ class CachedEmbeddingsProvider(EmbeddingsProvider):
         return vec
 
 
+class BatchingEmbeddingsProvider(EmbeddingsProvider):
+    """
+    合并并发的单条 query 向量化：embed_query 把 (text, future) 放入队列，后台线程在 window_s 窗口内
+    最多攒 max_batch 条，合并成一次 embed_documents 调用后按序回填结果。
+    embed_query 本身是阻塞调用（由调用方放到线程池），语义与逐条调用一致。
+    """
+
+    # 同时在途的批次数（每个后台线程各攒各的批，上一批请求上游期间下一批继续攒）
+    _WORKERS = 2
+
+    def __init__(self, inner: EmbeddingsProvider, *, window_s: float = 0.02, max_batch: int = 32) -> None:
+        self._inner = inner
+        self._window_s = max(0.0, float(window_s))
+        self._max_batch = max(1, int(max_batch))
+        self._queue: queue.Queue[tuple[str, Future]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self._ensure_workers()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut.result()
+
+    def _ensure_workers(self) -> None:
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self._WORKERS):
+                threading.Thread(target=self._worker_loop, name=f"embed-batcher-{i}", daemon=True).start()
+            self._started = True
+
+    def _worker_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._window_s
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                vectors = self._inner.embed_documents([t for t, _ in batch])
+                if len(vectors) != len(batch):
+                    raise RuntimeError(f"embedding 返回条数不匹配：期望 {len(batch)}，实际 {len(vectors)}")
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(batch, vectors, strict=True):
+                fut.set_result(vec)
+
+
 @dataclass(frozen=True)
 class FakeEmbeddings(EmbeddingsProvider):
     dim: int
@@ -236,6 +300,13 @@ def _resolve_embeddings_name(settings: Settings) -> str:
 
 
 def _wrap_with_cache(base: EmbeddingsProvider, name: str, *, settings: Settings) -> tuple[EmbeddingsProvider, str]:
+    # 合并批处理在缓存之内：缓存命中直接返回，不必等待攒批窗口
+    if settings.embed_batching_enabled:
+        base = BatchingEmbeddingsProvider(
+            base,
+            window_s=settings.embed_batch_window_ms / 1000.0,
+            max_batch=settings.embed_batch_max_size,
+        )
     if settings.query_embed_cache_size <= 0:
         return base, name
     cached = CachedEmbeddingsProvider(
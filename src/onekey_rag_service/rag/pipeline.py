@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import logging
 import re
 import time
@@ -7,7 +9,7 @@ import json
 from dataclasses import dataclass
 from typing import Any
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import sessionmaker
 
 from onekey_rag_service.config import Settings
 from onekey_rag_service.rag.chat_provider import ChatProvider
@@ -231,8 +233,81 @@ def _safe_render(template: str, variables: dict[str, Any]) -> str:
         return template or ""
 
 
+def _retrieve_candidates(
+    session_factory: sessionmaker,
+    *,
+    settings: Settings,
+    retrieval_query: str,
+    qvec: list[float],
+    workspace_id: str,
+    kb_allocations: list[KbAllocation] | None,
+) -> list[RetrievedChunk]:
+    """
+    同步检索（在线程池中执行）：按 KB 分配分别召回后合并；无分配时全 workspace 召回。
+
+    在线程内自建并关闭 Session：调用方 wait_for 超时放弃后线程仍可能在跑，
+    不能与请求作用域的 Session 共用（Session 非线程安全，请求结束时会被并发 close）。
+    """
+
+    with session_factory() as session:
+        mode = (settings.retrieval_mode or "vector").lower()
+        allocations = [a for a in (kb_allocations or []) if int(a.top_k or 0) > 0]
+        if allocations:
+            groups: list[list[RetrievedChunk]] = []
+            for a in allocations:
+                per_k = max(1, int(a.top_k))
+                if mode == "hybrid":
+                    groups.append(
+                        hybrid_search(
+                            session,
+                            query_text=retrieval_query,
+                            query_embedding=qvec,
+                            workspace_id=workspace_id,
+                            kb_id=a.kb_id,
+                            k=per_k,
+                            vector_k=min(settings.hybrid_vector_k, per_k),
+                            bm25_k=min(settings.hybrid_bm25_k, per_k),
+                            vector_weight=settings.hybrid_vector_weight,
+                            bm25_weight=settings.hybrid_bm25_weight,
+                            fts_config=settings.bm25_fts_config,
+                        )
+                    )
+                else:
+                    groups.append(
+                        similarity_search(
+                            session,
+                            query_embedding=qvec,
+                            workspace_id=workspace_id,
+                            kb_id=a.kb_id,
+                            k=per_k,
+                        )
+                    )
+            return _merge_candidates(groups, k=settings.rag_top_k)
+        if mode == "hybrid":
+            return hybrid_search(
+                session,
+                query_text=retrieval_query,
+                query_embedding=qvec,
+                workspace_id=workspace_id,
+                kb_id=None,
+                k=settings.rag_top_k,
+                vector_k=settings.hybrid_vector_k,
+                bm25_k=settings.hybrid_bm25_k,
+                vector_weight=settings.hybrid_vector_weight,
+                bm25_weight=settings.hybrid_bm25_weight,
+                fts_config=settings.bm25_fts_config,
+            )
+        return similarity_search(
+            session,
+            query_embedding=qvec,
+            workspace_id=workspace_id,
+            kb_id=None,
+            k=settings.rag_top_k,
+        )
+
+
 async def prepare_rag(
-    session: Session,
+    session_factory: sessionmaker,
     *,
     settings: Settings,
     embeddings: EmbeddingsProvider,
@@ -293,65 +368,19 @@ async def prepare_rag(
             t_compaction_ms = int((time.perf_counter() - t0) * 1000)
 
     t0 = time.perf_counter()
-    qvec = embeddings.embed_query(retrieval_query)
+    # 向量化与检索都是阻塞 I/O（HTTP / psycopg2），放到线程池执行，避免阻塞事件循环里的其它请求
+    qvec = await asyncio.to_thread(embeddings.embed_query, retrieval_query)
     t_embed_ms = int((time.perf_counter() - t0) * 1000)
-    mode = (settings.retrieval_mode or "vector").lower()
     t0 = time.perf_counter()
-    allocations = [a for a in (kb_allocations or []) if int(a.top_k or 0) > 0]
-    if allocations:
-        groups: list[list[RetrievedChunk]] = []
-        for a in allocations:
-            per_k = max(1, int(a.top_k))
-            if mode == "hybrid":
-                groups.append(
-                    hybrid_search(
-                        session,
-                        query_text=retrieval_query,
-                        query_embedding=qvec,
-                        workspace_id=workspace_id,
-                        kb_id=a.kb_id,
-                        k=per_k,
-                        vector_k=min(settings.hybrid_vector_k, per_k),
-                        bm25_k=min(settings.hybrid_bm25_k, per_k),
-                        vector_weight=settings.hybrid_vector_weight,
-                        bm25_weight=settings.hybrid_bm25_weight,
-                        fts_config=settings.bm25_fts_config,
-                    )
-                )
-            else:
-                groups.append(
-                    similarity_search(
-                        session,
-                        query_embedding=qvec,
-                        workspace_id=workspace_id,
-                        kb_id=a.kb_id,
-                        k=per_k,
-                    )
-                )
-        retrieved = _merge_candidates(groups, k=settings.rag_top_k)
-    else:
-        if mode == "hybrid":
-            retrieved = hybrid_search(
-                session,
-                query_text=retrieval_query,
-                query_embedding=qvec,
-                workspace_id=workspace_id,
-                kb_id=None,
-                k=settings.rag_top_k,
-                vector_k=settings.hybrid_vector_k,
-                bm25_k=settings.hybrid_bm25_k,
-                vector_weight=settings.hybrid_vector_weight,
-                bm25_weight=settings.hybrid_bm25_weight,
-                fts_config=settings.bm25_fts_config,
-            )
-        else:
-            retrieved = similarity_search(
-                session,
-                query_embedding=qvec,
-                workspace_id=workspace_id,
-                kb_id=None,
-                k=settings.rag_top_k,
-            )
+    retrieved = await asyncio.to_thread(
+        _retrieve_candidates,
+        session_factory,
+        settings=settings,
+        retrieval_query=retrieval_query,
+        qvec=qvec,
+        workspace_id=workspace_id,
+        kb_allocations=kb_allocations,
+    )
     t_retrieve_ms = int((time.perf_counter() - t0) * 1000)
     ranked = retrieved
     rerank_used = bool(reranker)
@@ -514,7 +543,7 @@ async def prepare_rag(
 
 
 async def answer_with_rag(
-    session: Session,
+    session_factory: sessionmaker,
     *,
     settings: Settings,
     embeddings: EmbeddingsProvider,
@@ -532,22 +561,25 @@ async def answer_with_rag(
     response_format: dict[str, Any] | None = None,
     debug: bool = False,
     callbacks: list | None = None,
+    prepare_semaphore: asyncio.Semaphore | None = None,
 ) -> RagAnswer:
-    prepared = await prepare_rag(
-        session,
-        settings=settings,
-        embeddings=embeddings,
-        chat=chat,
-        reranker=reranker,
-        chat_model=chat_model,
-        request_messages=request_messages,
-        question=question,
-        workspace_id=workspace_id,
-        kb_allocations=kb_allocations,
-        prompt_templates=prompt_templates,
-        debug=debug,
-        callbacks=callbacks,
-    )
+    # 并发上限只约束检索/上下文准备（DB、embedding、rerank）；LLM 生成阶段等待上游，不占名额
+    async with prepare_semaphore or contextlib.nullcontext():
+        prepared = await prepare_rag(
+            session_factory,
+            settings=settings,
+            embeddings=embeddings,
+            chat=chat,
+            reranker=reranker,
+            chat_model=chat_model,
+            request_messages=request_messages,
+            question=question,
+            workspace_id=workspace_id,
+            kb_allocations=kb_allocations,
+            prompt_templates=prompt_templates,
+            debug=debug,
+            callbacks=callbacks,
+        )
 
     if prepared.direct_answer is not None:
         return RagAnswer(answer=prepared.direct_answer, sources=prepared.sources, debug=prepared.debug, meta=prepared.meta)
@@ -4,6 +4,7 @@ import asyncio
 import datetime as dt
 import logging
 import os
+import time
 import uuid
 from typing import Any
 
@@ -20,6 +21,9 @@ from onekey_rag_service.db import (
     ensure_admin_schema,
     ensure_indexes,
     ensure_pgvector_extension,
+    ensure_summary_views,
+    refresh_summary_views,
+    rotate_recent_events_index,
 )
 from onekey_rag_service.indexing.pipeline import index_pages_to_chunks
 from onekey_rag_service.logging import configure_logging
@@ -399,6 +403,7 @@ async def main() -> None:
     create_all_safe(engine, Base.metadata)
     ensure_admin_schema(engine)
     ensure_indexes(engine, settings)
+    ensure_summary_views(engine, settings)
     session_factory = create_session_factory(engine)
 
     with session_factory() as session:
@@ -420,7 +425,26 @@ async def main() -> None:
         max_attempts,
     )
 
+    summary_mv_refresh_s = float(settings.summary_mv_refresh_s or 0)
+    summary_mv_next_at = 0.0
+    # retrieval_events 近期部分索引按天轮换；每小时检查一次（当天已建好时只是一条系统表查询）
+    recent_index_next_at = 0.0
+
     while True:
+        if summary_mv_refresh_s > 0 and time.monotonic() >= summary_mv_next_at:
+            summary_mv_next_at = time.monotonic() + summary_mv_refresh_s
+            try:
+                await asyncio.to_thread(refresh_summary_views, engine)
+            except Exception as e:
+                logger.warning("refresh mv_workspace_summary failed err=%s", e)
+
+        if settings.auto_create_indexes and time.monotonic() >= recent_index_next_at:
+            recent_index_next_at = time.monotonic() + 3600
+            try:
+                await asyncio.to_thread(rotate_recent_events_index, engine)
+            except Exception as e:
+                logger.warning("rotate retrieval_events recent index failed err=%s", e)
+
         job_id: str | None = None
         job_type: str | None = None
         with session_factory() as session:
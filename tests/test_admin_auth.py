@@ -0,0 +1,105 @@
+"""
+Admin JWT 验签与已验签 token 缓存（_verified_cache）的单元测试；不需要数据库。
+"""
+
+from __future__ import annotations
+
+import base64
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+
+from fastapi import HTTPException  # noqa: E402
+
+from onekey_rag_service.admin import auth  # noqa: E402
+
+ISSUER = "onekey-rag-admin"
+SECRET = "test-secret"
+_B64URL_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+@pytest.fixture(autouse=True)
+def _clear_verified_cache():
+    auth._verified_cache.clear()
+    yield
+    auth._verified_cache.clear()
+
+
+def _token(*, exp_in: int = 600, secret: str = SECRET, alg: str = "HS256") -> str:
+    now = auth._utcnow_ts()
+    return auth.create_jwt({"sub": "admin", "role": "owner", "iss": ISSUER, "exp": now + exp_in}, secret=secret, alg=alg)
+
+
+def _b64decode(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _assert_rejected(token: str, **kwargs) -> None:
+    params = {"secret": SECRET, "issuer": ISSUER, "alg": "HS256", **kwargs}
+    with pytest.raises(HTTPException) as ei:
+        auth.verify_jwt(token, **params)
+    assert ei.value.status_code == 401
+
+
+def test_cache_hit_still_rejects_expired_token(monkeypatch):
+    token = _token(exp_in=60)
+    assert auth.verify_jwt(token, secret=SECRET, issuer=ISSUER)["sub"] == "admin"
+    assert len(auth._verified_cache) == 1
+
+    # 缓存项本身未过期（按 monotonic 计时），但 token 的 exp 已过：命中后复核 claims 必须拒绝
+    now = auth._utcnow_ts()
+    monkeypatch.setattr(auth, "_utcnow_ts", lambda: now + 120)
+    _assert_rejected(token)
+
+
+@pytest.mark.parametrize("alg", ["HS256", "BLAKE2b"])
+def test_secret_change_invalidates_cached_entry(alg):
+    token = _token(alg=alg)
+    auth.verify_jwt(token, secret=SECRET, issuer=ISSUER, alg=alg)
+    _assert_rejected(token, secret="rotated-secret", alg=alg)
+
+
+def test_algorithm_change_invalidates_cached_entry():
+    token = _token(alg="HS256")
+    auth.verify_jwt(token, secret=SECRET, issuer=ISSUER, alg="HS256")
+    _assert_rejected(token, alg="BLAKE2b")
+
+
+def test_tampered_signature_is_never_served_from_cache():
+    token = _token()
+    auth.verify_jwt(token, secret=SECRET, issuer=ISSUER)
+
+    signing_input, _, sig = token.rpartition(".")
+    # 改签名首字符：不同的 MAC
+    flipped = "A" if sig[0] != "A" else "B"
+    _assert_rejected(f"{signing_input}.{flipped}{sig[1:]}")
+
+    # 改签名末字符的填充位：解码出同一个 MAC，但不是规范写法，也必须拒绝
+    pad_bits = (1 << (len(sig) * 6 % 8)) - 1
+    assert pad_bits > 0
+    alt_sig = sig[:-1] + _B64URL_ALPHABET[_B64URL_ALPHABET.index(sig[-1]) ^ pad_bits]
+    assert _b64decode(alt_sig) == _b64decode(sig)
+    _assert_rejected(f"{signing_input}.{alt_sig}")
+
+    # 标准 base64 字母表（+/）写法同样拒绝
+    if "-" in sig or "_" in sig:
+        _assert_rejected(f"{signing_input}.{sig.replace('-', '+').replace('_', '/')}")
+
+    # 拒绝的 token 不进缓存：只有最初验签成功的那一项
+    assert len(auth._verified_cache) == 1
+
+
+def test_returned_payload_is_read_only():
+    token = _token()
+    first = auth.verify_jwt(token, secret=SECRET, issuer=ISSUER)
+    with pytest.raises(TypeError):
+        first["role"] = "viewer"  # type: ignore[index]
+
+    second = auth.verify_jwt(token, secret=SECRET, issuer=ISSUER)
+    with pytest.raises(TypeError):
+        second["sub"] = "someone-else"  # type: ignore[index]
+    assert second["role"] == "owner"
+    assert second["sub"] == "admin"
@@ -0,0 +1,114 @@
+"""
+非流式答案缓存（AnswerCache）的单元测试：TTL/LRU、key 覆盖的输入、命中结果的 usage/耗时口径。
+"""
+
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("sqlalchemy")
+
+from onekey_rag_service.rag import answer_cache as answer_cache_mod  # noqa: E402
+from onekey_rag_service.rag.answer_cache import AnswerCache  # noqa: E402
+from onekey_rag_service.rag.kb_allocation import KbAllocation  # noqa: E402
+from onekey_rag_service.rag.pipeline import RagAnswer  # noqa: E402
+
+
+def _answer(text: str = "答案") -> RagAnswer:
+    return RagAnswer(
+        answer=text,
+        sources=[{"url": "https://developer.onekey.so/"}],
+        usage={"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        meta={"timings_ms": {"total_prepare": 35, "chat": 800}, "retrieved": 8},
+    )
+
+
+def _key_parts(**overrides):
+    parts = {
+        "workspace_id": "default",
+        "app_id": "app_1",
+        "upstream_model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": "如何接入 OneKey SDK？"}],
+        "kb_allocations": [KbAllocation(kb_id="default", top_k=8, weight=1.0, priority=0)],
+        "prompt_templates": {},
+        "temperature": 0.2,
+        "top_p": 1.0,
+        "max_tokens": 1024,
+        "response_format": None,
+    }
+    parts.update(overrides)
+    return parts
+
+
+def test_get_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_mod.time, "time", lambda: now[0])
+    cache = AnswerCache(max_size=8, ttl_s=10.0)
+    cache.put("k", _answer())
+
+    now[0] += 9.0
+    assert cache.get("k") is not None
+    now[0] += 2.0
+    assert cache.get("k") is None
+    # 过期项被移除
+    assert cache.get("k") is None
+
+
+def test_put_evicts_least_recently_used():
+    cache = AnswerCache(max_size=2, ttl_s=0)
+    cache.put("a", _answer("a"))
+    cache.put("b", _answer("b"))
+    assert cache.get("a") is not None  # a 变为最近使用
+
+    cache.put("c", _answer("c"))
+    assert cache.get("b") is None
+    assert cache.get("a").answer == "a"
+    assert cache.get("c").answer == "c"
+
+
+def test_hit_drops_usage_and_timings():
+    cache = AnswerCache()
+    original = _answer()
+    cache.put("k", original)
+
+    hit = cache.get("k")
+    assert hit is not None
+    assert hit.answer == original.answer
+    assert hit.sources == original.sources
+    assert hit.usage is None
+    assert "timings_ms" not in (hit.meta or {})
+    assert hit.meta["retrieved"] == 8
+    # 缓存里的原始结果不受影响：下次命中仍是同样的口径
+    assert original.usage is not None
+    assert cache.get("k").usage is None
+
+
+def test_make_key_is_stable_across_dict_order():
+    parts = _key_parts()
+    assert AnswerCache.make_key(**parts) == AnswerCache.make_key(**dict(reversed(list(parts.items()))))
+    assert AnswerCache.make_key(**_key_parts(prompt_templates={"a": "1", "b": "2"})) == AnswerCache.make_key(
+        **_key_parts(prompt_templates={"b": "2", "a": "1"})
+    )
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"messages": [{"role": "user", "content": "如何接入 OneKey SDK?"}]},
+        {"messages": [{"role": "system", "content": "简短回答"}, {"role": "user", "content": "如何接入 OneKey SDK？"}]},
+        {"upstream_model": "gpt-4o"},
+        {"kb_allocations": [KbAllocation(kb_id="default", top_k=4, weight=1.0, priority=0)]},
+        {"kb_allocations": [KbAllocation(kb_id="kb_2", top_k=8, weight=1.0, priority=0)]},
+        {"kb_allocations": None},
+        {"temperature": 0.7},
+        {"top_p": 0.9},
+        {"max_tokens": 256},
+        {"response_format": {"type": "json_object"}},
+        {"workspace_id": "ws_2"},
+        {"app_id": "app_2"},
+    ],
+)
+def test_make_key_changes_with_any_input(overrides):
+    assert AnswerCache.make_key(**_key_parts(**overrides)) != AnswerCache.make_key(**_key_parts())
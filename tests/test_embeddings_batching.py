@@ -0,0 +1,102 @@
+"""
+BatchingEmbeddingsProvider 的单元测试：用假的 inner provider 验证合并、按序回填、错误传播与 max_batch。
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("pydantic_settings")
+
+from onekey_rag_service.rag.embeddings import BatchingEmbeddingsProvider, EmbeddingsProvider  # noqa: E402
+
+
+class _RecordingEmbeddings(EmbeddingsProvider):
+    """每条文本返回 [序号]；记录每次 embed_documents 收到的批次。"""
+
+    def __init__(self, *, drop_last: bool = False, error: Exception | None = None) -> None:
+        self.calls: list[list[str]] = []
+        self._lock = threading.Lock()
+        self._drop_last = drop_last
+        self._error = error
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.calls.append(list(texts))
+        if self._error is not None:
+            raise self._error
+        vectors = [[float(t.removeprefix("q"))] for t in texts]
+        return vectors[:-1] if self._drop_last else vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        raise AssertionError("批处理模式下不应逐条调用 inner.embed_query")
+
+
+def _batcher(inner: EmbeddingsProvider, *, window_s: float, max_batch: int) -> BatchingEmbeddingsProvider:
+    provider = BatchingEmbeddingsProvider(inner, window_s=window_s, max_batch=max_batch)
+    # 单个后台线程：批次划分可确定（多线程时并发请求可能分到两个批次）
+    provider._WORKERS = 1
+    return provider
+
+
+def _embed_concurrently(provider: BatchingEmbeddingsProvider, n: int) -> list[object]:
+    """n 个线程同时调用 embed_query；返回每个调用的结果或异常（按调用序号）。"""
+
+    barrier = threading.Barrier(n)
+
+    def call(i: int) -> object:
+        barrier.wait()
+        try:
+            return provider.embed_query(f"q{i}")
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(call, range(n)))
+
+
+def test_concurrent_queries_merge_into_one_call_in_order():
+    inner = _RecordingEmbeddings()
+    provider = _batcher(inner, window_s=0.5, max_batch=32)
+
+    results = _embed_concurrently(provider, 6)
+
+    assert results == [[float(i)] for i in range(6)]
+    assert len(inner.calls) == 1
+    assert sorted(inner.calls[0]) == sorted(f"q{i}" for i in range(6))
+
+
+def test_count_mismatch_fails_every_waiter():
+    inner = _RecordingEmbeddings(drop_last=True)
+    provider = _batcher(inner, window_s=0.5, max_batch=32)
+
+    results = _embed_concurrently(provider, 4)
+
+    assert len(inner.calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results), results
+
+
+def test_inner_exception_reaches_every_waiter():
+    error = ValueError("upstream 503")
+    inner = _RecordingEmbeddings(error=error)
+    provider = _batcher(inner, window_s=0.5, max_batch=32)
+
+    results = _embed_concurrently(provider, 4)
+
+    assert all(r is error for r in results), results
+
+
+def test_batches_never_exceed_max_batch():
+    inner = _RecordingEmbeddings()
+    provider = _batcher(inner, window_s=0.3, max_batch=3)
+
+    results = _embed_concurrently(provider, 7)
+
+    assert results == [[float(i)] for i in range(7)]
+    assert all(len(batch) <= 3 for batch in inner.calls), inner.calls
+    assert sum(len(batch) for batch in inner.calls) == 7
+    assert len(inner.calls) >= 3